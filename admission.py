@@ -0,0 +1,138 @@
+import time
+from typing import Hashable, Optional, Tuple
+
+from cache import TTLCache
+
+# --- Rate limiting ---
+CLIENT_BUCKETS = 100000        # скільки клієнтів пам'ятаємо (неактивні витісняються)
+CLIENT_BUCKET_IDLE = 60.0      # секунд: бакет неактивного клієнта вже повний, його можна забути
+
+# --- Адаптивний ліміт конкурентності (AIMD) ---
+LIMIT_INITIAL = 20
+LIMIT_MIN = 2
+LIMIT_MAX = 200                # не більше за розмір пулу з'єднань
+LIMIT_BACKOFF = 0.9            # множник при ознаках перевантаження
+LIMIT_BUSY = 0.8               # зменшуємо ліміт, лише коли в польоті >= 80% ліміту
+LATENCY_TOLERANCE = 2.0        # згладжена латентність > базової * 2 -> бекенд уже стоїть у черзі
+LATENCY_FLOOR = 0.05           # секунд: нижче цього латентність не вважаємо ознакою перевантаження
+RTT_SMOOTHING = 0.1            # вага нової відповіді у згладженій латентності (EWMA)
+BASELINE_WINDOW = 120.0        # секунд: за стільки базова латентність підтягується до згладженої вгору...
+BASELINE_RECOVERY = 10.0       # ...і за стільки - вниз (бекенд знову відповідає швидше)
+LATENCY_WARMUP = 100           # відповідей: до того базова = EWMA, латентність ще не ознака перевантаження
+
+
+class TokenBucket:
+    """`rate` запитів/с у середньому, до `burst` поспіль"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        """Через скільки секунд з'явиться токен"""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Спільний бакет маршруту + окремий бакет на кожного клієнта цього маршруту"""
+
+    def __init__(self, route_limit: Optional[Tuple[float, float]], client_limit: Optional[Tuple[float, float]]):
+        self.route_bucket = TokenBucket(*route_limit) if route_limit else None
+        self.client_limit = client_limit
+        self._clients = TTLCache(CLIENT_BUCKETS, ttl=CLIENT_BUCKET_IDLE)
+        self.rejected = 0
+
+    def check(self, client: Optional[Hashable]) -> Optional[float]:
+        """None - пропускаємо, інакше - Retry-After у секундах; client=None - лише бакет маршруту"""
+        bucket = None
+        if self.client_limit and client is not None:
+            bucket = self._clients.get(client)
+            if bucket is None:
+                bucket = TokenBucket(*self.client_limit)
+            self._clients.set(client, bucket)
+            if not bucket.try_take():
+                self.rejected += 1
+                return bucket.retry_after()
+        if self.route_bucket and not self.route_bucket.try_take():
+            if bucket is not None:
+                bucket.tokens += 1  # не списуємо з клієнта запит, якого не пропустили
+            self.rejected += 1
+            return self.route_bucket.retry_after()
+        return None
+
+
+class AdaptiveLimit:
+    """
+    Ліміт одночасних запитів до upstream-сервісу (AIMD з градієнтом латентності):
+    - відповідь швидка і ліміт реально використовується -> +1 за "вікно" (limit += 1/limit)
+    - таймаут / 503 / згладжена латентність помітно вища за базову -> limit *= LIMIT_BACKOFF,
+      але лише коли ліміт майже вичерпано (інакше не він причина повільності) і не частіше
+      одного разу за латентність, щоб одна хвиля не обвалила ліміт до мінімуму
+    Порівнюються EWMA латентності і базова лінія, що йде за EWMA повільно (хвилини вгору і
+    лише поки ліміт не вичерпано, секунди вниз), а не окрема відповідь з мінімумом окремих
+    відповідей: звичайний розкид латентності здорового бекенду ліміт не зрізає.
+    Що не влізло в ліміт, одразу отримує 503 замість черги в бекенді.
+    """
+
+    def __init__(self, initial: float = LIMIT_INITIAL, minimum: float = LIMIT_MIN, maximum: float = LIMIT_MAX):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.inflight = 0
+        self.rtt: Optional[float] = None       # згладжена латентність
+        self.baseline: Optional[float] = None  # "чиста" латентність бекенду без черги
+        self._samples = 0
+        self._baseline_at = 0.0
+        self._last_decrease = 0.0
+        self.shed = 0
+
+    def try_acquire(self) -> bool:
+        if self.inflight >= int(self.limit):
+            self.shed += 1
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self, latency: float, overloaded: bool = False):
+        busy = self.inflight >= self.limit * LIMIT_BUSY  # у польоті (з цим запитом) майже весь ліміт
+        self.inflight -= 1
+        now = time.monotonic()
+        # перші відповіді - звичайне середнє, щоб EWMA не стартувала з одного випадкового значення
+        self._samples += 1
+        self.rtt = latency if self.rtt is None else self.rtt + max(RTT_SMOOTHING, 1 / self._samples) * (latency - self.rtt)
+        warm = self._samples > LATENCY_WARMUP
+        if not warm:
+            # на старті першими приходять найшвидші відповіді - базову з них не фіксуємо
+            self.baseline = self.rtt
+        elif self.rtt < self.baseline:
+            self.baseline += (self.rtt - self.baseline) * min(1.0, (now - self._baseline_at) / BASELINE_RECOVERY)
+        elif not busy:
+            # під впертим у ліміт навантаженням латентність містить чергу - базову вгору не тягнемо
+            self.baseline += (self.rtt - self.baseline) * min(1.0, (now - self._baseline_at) / BASELINE_WINDOW)
+        self._baseline_at = now
+        if not overloaded and warm:
+            overloaded = self.rtt > max(self.baseline * LATENCY_TOLERANCE, LATENCY_FLOOR)
+        if overloaded:
+            if busy and now - self._last_decrease > self.rtt:
+                self.limit = max(self.minimum, self.limit * LIMIT_BACKOFF)
+                self._last_decrease = now
+        elif self.inflight + 1 >= self.limit / 2:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def snapshot(self) -> dict:
+        return {"limit": round(self.limit, 2), "inflight": self.inflight, "shed": self.shed,
+                "rtt_ms": round(self.rtt * 1000, 2) if self.rtt is not None else None,
+                "baseline_ms": round(self.baseline * 1000, 2) if self.baseline is not None else None}
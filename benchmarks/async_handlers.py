@@ -0,0 +1,136 @@
+"""
+Бенчмарк ендпоінтів class-service: sync `def` (як було - кожен запит іде в thread pool)
+проти `async def` поверх AsyncRepository (як зараз).
+
+    python benchmarks/async_handlers.py --requests 2000 --concurrency 50,200 --storage memory,sqlite
+
+"sync" - справжній class_service з його сховищем і ListCache, але зі старими
+sync-ендпоінтами; "async" - сам class_service.app. Discovery не потрібен: агент
+реєстрації без інстансів. Крім rps і перцентилів (клієнт ділить CPU із сервером, тож
+на одному ядрі вони здебільшого про клієнта) - CPU сервера на запит (cpu_us, з /proc)
+і кількість його потоків після прогону. Сценарії:
+- list: GET /classes?limit=50 (кешована сторінка)
+- item: GET /classes/{id}
+- update: PUT /classes/{id} (скидає кеш сторінок)
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+from typing import List, Optional
+
+from common import free_port, spawn, stop, run_load, print_table
+from topology import cpu_seconds
+
+import uvicorn
+from fastapi import FastAPI, Header, HTTPException, Query
+
+CLASSES = 500
+SCENARIOS = ("list", "item", "update")
+
+
+def legacy_app(module) -> FastAPI:
+    """Копія старих sync-ендпоінтів class_service над тим самим сховищем"""
+    from metrics import MetricsMiddleware
+    db, classes_json = module.db.sync, module.classes_json
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, service=module.SERVICE_NAME)
+
+    @app.get("/classes", response_model=List[module.SchoolClass])
+    def get_all(limit: Optional[int] = Query(None, ge=1), after: Optional[int] = None,
+                fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+        return classes_json.respond((after, limit), lambda: db.page(after=after, limit=limit), fields, if_none_match)
+
+    @app.get("/classes/{id}", response_model=module.SchoolClass)
+    def get_class(id: int):
+        c = db.get(id)
+        if c is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        return c
+
+    @app.put("/classes/{id}", response_model=module.SchoolClass)
+    def update_class(id: int, data: module.SchoolClass):
+        item = data.model_copy(update={"id": id})
+        if not db.update(item):
+            raise HTTPException(status_code=404, detail="Not found")
+        module.changes.publish("updated", id, item.model_dump())
+        return item
+
+    return app
+
+
+def serve(role: str, port: int):
+    import class_service
+    from registration import RegistrationAgent
+    class_service.agent = RegistrationAgent("http://127.0.0.1:9")
+    db = class_service.db.sync
+    if len(db.all()) < CLASSES:
+        db.add_many([class_service.SchoolClass(id=0, name=f"{i}-A", profile="Science") for i in range(CLASSES)])
+    app = class_service.app if role == "async" else legacy_app(class_service)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def make_request(base: str, scenario: str):
+    if scenario == "list":
+        return lambda c, i: c.get(f"{base}/classes", params={"limit": 50})
+    if scenario == "item":
+        return lambda c, i: c.get(f"{base}/classes/{i % CLASSES + 1}")
+    return lambda c, i: c.put(f"{base}/classes/{i % CLASSES + 1}",
+                              json={"id": 0, "name": f"{i}-B", "profile": "Science"})
+
+
+def threads(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("Threads:"))
+    except (OSError, StopIteration):
+        return None
+
+
+async def measure(pid: int, port: int, scenario: str, total: int, concurrency: int) -> dict:
+    request = make_request(f"http://127.0.0.1:{port}", scenario)
+    await run_load(request, 50, 5)  # прогрів
+    cpu_before = cpu_seconds(pid)
+    result = await run_load(request, total, concurrency)
+    cpu_after = cpu_seconds(pid)
+    if cpu_before is not None and cpu_after is not None:
+        result["cpu_us"] = round((cpu_after - cpu_before) / total * 1e6)
+    result["threads"] = threads(pid)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--role", choices=["sync", "async"])
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", default="50,200")
+    parser.add_argument("--storage", default="memory,sqlite")
+    args = parser.parse_args()
+
+    if args.role:
+        serve(args.role, args.port)
+        return
+
+    rows = []
+    for storage in args.storage.split(","):
+        for role in ("sync", "async"):
+            # окремий каталог на кожен процес: обидва режими стартують з однакових даних
+            with tempfile.TemporaryDirectory() as data_dir:
+                os.environ.update(STORAGE_BACKEND=storage, STORAGE_DIR=data_dir)  # успадкує процес сервісу
+                port = free_port()
+                proc = spawn(["benchmarks/async_handlers.py", "--role", role, "--port", str(port)], port)
+                try:
+                    for scenario in SCENARIOS:
+                        for concurrency in (int(c) for c in args.concurrency.split(",")):
+                            result = asyncio.run(measure(proc.pid, port, scenario, args.requests, concurrency))
+                            rows.append({"case": f"{storage}/{scenario}/c{concurrency}/{role}", **result})
+                            print(rows[-1])
+                finally:
+                    stop(proc)
+    print()
+    print_table(rows, key="case")
+
+
+if __name__ == "__main__":
+    main()
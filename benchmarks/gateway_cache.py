@@ -0,0 +1,122 @@
+"""
+Бенчмарк кешу відповідей gateway: GET /classes без кешу і з кешем.
+
+    python benchmarks/gateway_cache.py --requests 2000 --concurrency 20
+
+Stub (Discovery + class-service в одному процесі) відповідає із затримкою --delay мс
+і рахує, скільки запитів до нього дійшло. Режими:
+- nocache:  RESPONSE_CACHE = False - кожен GET іде в бекенд
+- cache:    cache_ttl маршруту - GET віддається з пам'яті gateway
+- burst:    --concurrency одночасних промахів по холодному кешу -> скільки з них дійшло до бекенду
+"""
+import argparse
+import asyncio
+import time
+
+from common import free_port, spawn, stop, run_load, print_table
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+
+def stub_app(port: int, delay: float) -> FastAPI:
+    app = FastAPI()
+    classes = [{"id": i, "name": f"{i}-A", "profile": "Science"} for i in range(1, 51)]
+    hits = {"classes": 0}
+
+    @app.get("/services/{name}")
+    def services(name: str):
+        return [{"name": name, "host": "127.0.0.1", "port": port, "last_heartbeat": 0.0}]
+
+    @app.get("/classes")
+    async def get_classes():
+        hits["classes"] += 1
+        await asyncio.sleep(delay)
+        return classes
+
+    @app.get("/hits")
+    def get_hits():
+        return hits
+
+    return app
+
+
+def serve(role: str, port: int, stub_port: int, delay: float):
+    if role == "stub":
+        app = stub_app(port, delay)
+    else:
+        import gateway
+        gateway.service_cache.discovery_url = f"http://127.0.0.1:{stub_port}"
+        gateway.RESPONSE_CACHE = role == "cache"
+        app = gateway.app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def stub_hits(stub_port: int) -> int:
+    async with httpx.AsyncClient() as client:
+        return (await client.get(f"http://127.0.0.1:{stub_port}/hits")).json()["classes"]
+
+
+async def measure(port: int, stub_port: int, total: int, concurrency: int) -> dict:
+    url = f"http://127.0.0.1:{port}/classes"
+    await run_load(lambda c, i: c.get(url), 20, 1)  # прогрів (з'єднання, знімок Discovery, кеш)
+    before = await stub_hits(stub_port)
+    sequential = await run_load(lambda c, i: c.get(url), min(total, 500), 1)
+    result = await run_load(lambda c, i: c.get(url), total, concurrency)
+    return {
+        "seq_p50_ms": sequential["p50_ms"],
+        "seq_p99_ms": sequential["p99_ms"],
+        "rps": result["rps"],
+        "p50_ms": result["p50_ms"],
+        "p99_ms": result["p99_ms"],
+        "errors": result["errors"],
+        "backend_calls": await stub_hits(stub_port) - before,
+    }
+
+
+async def burst(port: int, stub_port: int, concurrency: int) -> dict:
+    """Одночасні промахи: з Coalescer до бекенду має дійти один запит"""
+    url = f"http://127.0.0.1:{port}/classes?burst={time.time()}"  # новий ключ = холодний кеш
+    before = await stub_hits(stub_port)
+    result = await run_load(lambda c, i: c.get(url), concurrency, concurrency)
+    return {"rps": result["rps"], "p50_ms": result["p50_ms"], "p99_ms": result["p99_ms"],
+            "errors": result["errors"], "backend_calls": await stub_hits(stub_port) - before}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--role", choices=["stub", "nocache", "cache"])
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--stub-port", type=int)
+    parser.add_argument("--delay", type=float, default=5.0, help="затримка бекенду, мс")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.role:
+        serve(args.role, args.port, args.stub_port, args.delay / 1000)
+        return
+
+    stub_port = free_port()
+    stub_proc = spawn(["benchmarks/gateway_cache.py", "--role", "stub", "--port", str(stub_port),
+                       "--stub-port", str(stub_port), "--delay", str(args.delay)], stub_port)
+    rows = []
+    try:
+        for role in ("nocache", "cache"):
+            port = free_port()
+            proc = spawn(["benchmarks/gateway_cache.py", "--role", role,
+                          "--port", str(port), "--stub-port", str(stub_port)], port)
+            try:
+                rows.append({"mode": role, **asyncio.run(measure(port, stub_port, args.requests, args.concurrency))})
+                if role == "cache":
+                    rows.append({"mode": "burst", **asyncio.run(burst(port, stub_port, args.concurrency))})
+            finally:
+                stop(proc)
+    finally:
+        stop(stub_proc)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Бенчмарк відмовостійкості gateway: один з N інстансів class-service "хворіє".
+
+    python benchmarks/gateway_faults.py --instances 3 --fault error --requests 2000
+
+Піднімає Discovery-stub і N stub-бекендів; останній поводиться згідно з --fault:
+- error: завжди 503
+- down:  порт закритий (процес не запущено, але в Discovery він є)
+- slow:  відповідає через --slow мс
+Режими gateway:
+- plain:     без повторів і без circuit breaker-ів
+- resilient: breaker-и + outlier ejection + повтори з бюджетом (поточні налаштування)
+"""
+import argparse
+import asyncio
+import json
+
+from common import free_port, spawn, stop, run_load, print_table
+
+import uvicorn
+from fastapi import FastAPI, Response
+
+
+def discovery_app(ports) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/services/{name}")
+    def services(name: str):
+        return [{"name": name, "host": "127.0.0.1", "port": p, "last_heartbeat": 0.0} for p in ports]
+
+    return app
+
+
+def backend_app(fault: str, slow: float) -> FastAPI:
+    app = FastAPI()
+    classes = [{"id": i, "name": f"{i}-A", "profile": "Science"} for i in range(1, 21)]
+
+    @app.get("/classes")
+    async def get_classes():
+        if fault == "error":
+            return Response(status_code=503)
+        if fault == "slow":
+            await asyncio.sleep(slow)
+        return classes
+
+    return app
+
+
+def serve(args):
+    if args.role == "discovery":
+        app = discovery_app(json.loads(args.ports))
+    elif args.role == "backend":
+        app = backend_app(args.fault, args.slow / 1000)
+    else:
+        import gateway
+        import load_balancer
+        gateway.service_cache.discovery_url = f"http://127.0.0.1:{args.discovery_port}"
+        gateway.RESPONSE_CACHE = False
+        if args.role == "plain":
+            gateway.RETRY_ATTEMPTS = 1
+            load_balancer.InstanceStats.healthy = lambda self: True
+        app = gateway.app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--role", choices=["discovery", "backend", "plain", "resilient"])
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--ports", default="[]")
+    parser.add_argument("--discovery-port", type=int)
+    parser.add_argument("--instances", type=int, default=3)
+    parser.add_argument("--fault", choices=["none", "error", "down", "slow"], default="error")
+    parser.add_argument("--slow", type=float, default=2000.0, help="затримка 'slow' інстансу, мс")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.role:
+        serve(args)
+        return
+
+    ports = [free_port() for _ in range(args.instances)]
+    procs = []
+    try:
+        for i, port in enumerate(ports):
+            fault = args.fault if i == len(ports) - 1 else "none"
+            if fault == "down":
+                continue
+            procs.append(spawn(["benchmarks/gateway_faults.py", "--role", "backend", "--port", str(port),
+                                "--fault", fault, "--slow", str(args.slow)], port))
+        discovery_port = free_port()
+        procs.append(spawn(["benchmarks/gateway_faults.py", "--role", "discovery", "--port", str(discovery_port),
+                            "--ports", json.dumps(ports)], discovery_port))
+        rows = []
+        for role in ("plain", "resilient"):
+            port = free_port()
+            proc = spawn(["benchmarks/gateway_faults.py", "--role", role, "--port", str(port),
+                          "--discovery-port", str(discovery_port)], port)
+            try:
+                url = f"http://127.0.0.1:{port}/classes"
+                result = asyncio.run(run_load(lambda c, i: c.get(url), args.requests, args.concurrency))
+                rows.append({"mode": role, **result})
+            finally:
+                stop(proc)
+    finally:
+        stop(*procs)
+    print(f"{args.instances} instances, fault on one: {args.fault}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
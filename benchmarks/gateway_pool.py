@@ -0,0 +1,110 @@
+"""
+Бенчмарк gateway: нові httpx-клієнти на кожен запит (як було) проти спільного пулу.
+
+    python benchmarks/gateway_pool.py --requests 1000 --concurrency 50
+
+Піднімає локальний stub (Discovery + class-service в одному процесі),
+потім по черзі "legacy" gateway і справжній gateway.py, і ганяє GET /classes.
+"""
+import argparse
+import asyncio
+import random
+
+from common import free_port, spawn, stop, run_load, print_table
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response
+
+
+def stub_app(port: int) -> FastAPI:
+    app = FastAPI()
+    classes = [{"id": i, "name": f"{i}-A", "profile": "Science"} for i in range(1, 51)]
+
+    @app.get("/services/{name}")
+    def services(name: str):
+        return [{"name": name, "host": "127.0.0.1", "port": port, "last_heartbeat": 0.0}]
+
+    @app.get("/classes")
+    def get_classes():
+        return classes
+
+    return app
+
+
+def legacy_app(stub_url: str) -> FastAPI:
+    """Копія старого proxy: Discovery на кожен запит і новий AsyncClient двічі"""
+    app = FastAPI()
+
+    async def get_service_url(service_name: str) -> str:
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(f"{stub_url}/services/{service_name}")
+            if resp.status_code != 200:
+                raise HTTPException(status_code=503)
+            target = random.choice(resp.json())
+            return f"http://{target['host']}:{target['port']}"
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+    async def proxy(path: str, request: Request):
+        base_url = await get_service_url("class-service")
+        async with httpx.AsyncClient() as client:
+            r = await client.request(request.method, f"{base_url}/{path}", headers=request.headers,
+                                     content=await request.body(), params=request.query_params)
+            return Response(content=r.content, status_code=r.status_code, headers=r.headers)
+
+    return app
+
+
+def serve(role: str, port: int, stub_port: int):
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    if role == "stub":
+        app = stub_app(port)
+    elif role == "legacy":
+        app = legacy_app(stub_url)
+    else:
+        import gateway
+        gateway.service_cache.discovery_url = stub_url
+        app = gateway.app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def measure(port: int, total: int, concurrency: int) -> dict:
+    url = f"http://127.0.0.1:{port}/classes"
+    # Прогрів (з'єднання, знімок Discovery)
+    await run_load(lambda c, i: c.get(url), 50, 5)
+    return await run_load(lambda c, i: c.get(url), total, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--role", choices=["stub", "legacy", "gateway"])
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--stub-port", type=int)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.role:
+        serve(args.role, args.port, args.stub_port)
+        return
+
+    stub_port = free_port()
+    stub_proc = spawn(["benchmarks/gateway_pool.py", "--role", "stub",
+                       "--port", str(stub_port), "--stub-port", str(stub_port)], stub_port)
+    rows = []
+    try:
+        for role in ("legacy", "gateway"):
+            port = free_port()
+            proc = spawn(["benchmarks/gateway_pool.py", "--role", role,
+                          "--port", str(port), "--stub-port", str(stub_port)], port)
+            try:
+                rows.append({"mode": role, **asyncio.run(measure(port, args.requests, args.concurrency))})
+            finally:
+                stop(proc)
+    finally:
+        stop(stub_proc)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Навантажувальний тест admission control: gateway під перевантаженням.
+
+    python benchmarks/overload.py --rate 80 --duration 10 --workers 2 --service-ms 50
+
+Stub-бекенд обробляє не більше --workers запитів одночасно по --service-ms мс
+(місткість = workers / service_ms, за замовчуванням 40 rps), решта чекає в черзі.
+Навантаження - "open loop": запити йдуть з фіксованою частотою --rate незалежно від
+відповідей, як справжні користувачі о 8:00. Режими gateway:
+- unlimited: без лімітів - черга в бекенді росте, латентність усіх запитів теж
+- adaptive:  AIMD-ліміт конкурентності - надлишок одразу отримує 503, решта обслуговується швидко
+- ratelimit: лише token bucket маршруту з --route-rate - надлишок отримує 429
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from common import free_port, percentile, spawn, stop, print_table
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+
+def stub_app(port: int, workers: int, service_time: float) -> FastAPI:
+    app = FastAPI()
+    capacity = asyncio.Semaphore(workers)
+    schedules = [{"id": i, "classId": 1, "day": "Monday", "lessons": ["Math"], "className": "10-A"} for i in range(20)]
+
+    @app.get("/services/{name}")
+    def services(name: str):
+        return [{"name": name, "host": "127.0.0.1", "port": port, "last_heartbeat": 0.0}]
+
+    @app.get("/schedules")
+    async def get_schedules():
+        async with capacity:
+            await asyncio.sleep(service_time)
+        return schedules
+
+    return app
+
+
+def serve(args):
+    if args.role == "stub":
+        app = stub_app(args.port, args.workers, args.service_ms / 1000)
+    else:
+        import gateway
+        gateway.service_cache.discovery_url = f"http://127.0.0.1:{args.stub_port}"
+        gateway.RESPONSE_CACHE = False
+        gateway.RETRY_ATTEMPTS = 1
+        gateway.CONCURRENCY_LIMITS = args.role == "adaptive"
+        gateway.RATE_LIMITING = args.role == "ratelimit"
+        gateway.CLIENT_RATE_LIMIT = None
+        for route, cfg in gateway.service_map.items():
+            cfg["rate_limit"] = (args.route_rate, args.route_rate)
+            gateway.rate_limiters[route] = gateway.RateLimiter(cfg["rate_limit"], None)
+        app = gateway.app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+async def open_loop(url: str, rate: float, duration: float) -> dict:
+    ok: List[float] = []
+    shed: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=2000, max_keepalive_connections=200)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        async def one():
+            nonlocal errors
+            t0 = time.perf_counter()
+            try:
+                resp = await client.get(url)
+            except httpx.HTTPError:
+                errors += 1
+                return
+            elapsed = time.perf_counter() - t0
+            if resp.status_code == 200:
+                ok.append(elapsed)
+            elif resp.status_code in (429, 503):
+                shed.append(elapsed)
+            else:
+                errors += 1
+
+        tasks = []
+        started = time.perf_counter()
+        for i in range(int(rate * duration)):
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one()))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "sent": len(tasks),
+        "ok": len(ok),
+        "shed": len(shed),
+        "errors": errors,
+        "goodput_rps": round(len(ok) / elapsed, 1),
+        "ok_p50_ms": round(percentile(ok, 50) * 1000, 1),
+        "ok_p99_ms": round(percentile(ok, 99) * 1000, 1),
+        "shed_p99_ms": round(percentile(shed, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--role", choices=["stub", "unlimited", "adaptive", "ratelimit"])
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--stub-port", type=int)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--service-ms", type=float, default=50.0)
+    parser.add_argument("--rate", type=float, default=80.0, help="запитів/с, що надходять")
+    parser.add_argument("--route-rate", type=float, default=40.0, help="rate limit маршруту для режиму ratelimit")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--modes", default="unlimited,adaptive,ratelimit")
+    args = parser.parse_args()
+
+    if args.role:
+        serve(args)
+        return
+
+    rows = []
+    for mode in args.modes.split(","):
+        # свіжий бекенд на кожен режим, щоб черга попереднього не впливала
+        stub_port = free_port()
+        stub_proc = spawn(["benchmarks/overload.py", "--role", "stub", "--port", str(stub_port),
+                           "--workers", str(args.workers), "--service-ms", str(args.service_ms)], stub_port)
+        port = free_port()
+        proc = spawn(["benchmarks/overload.py", "--role", mode, "--port", str(port), "--stub-port", str(stub_port),
+                      "--route-rate", str(args.route_rate)], port)
+        try:
+            rows.append({"mode": mode, **asyncio.run(open_loop(f"http://127.0.0.1:{port}/schedules",
+                                                               args.rate, args.duration))})
+        finally:
+            stop(proc, stub_proc)
+    capacity = args.workers / (args.service_ms / 1000)
+    print(f"backend capacity ~{capacity:.0f} rps, offered {args.rate:.0f} rps for {args.duration:.0f}s")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Бенчмарк відповіді-списку: response_model (валідація + серіалізація FastAPI на кожен GET)
+проти listing.ListCache (один dump pydantic-core + кеш байтів за версією колекції).
+
+    python benchmarks/serialization.py --sizes 10000,100000,1000000 --repeat 3
+
+Запити йдуть in-process через httpx.ASGITransport (без мережі), тож різниця - це саме
+підготовка тіла. Режими:
+- response_model: як було - повертаємо список моделей, FastAPI валідує і серіалізує
+- dump:           промах кешу (після кожного запису) - лише TypeAdapter.dump_json
+- cached:         повторний GET тієї ж версії - готові байти
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from common import print_table
+
+import httpx
+from fastapi import FastAPI
+
+from listing import ListCache
+from repository import Repository
+from schedule_service import Schedule
+
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+
+
+def make_app(size: int) -> FastAPI:
+    db = Repository(indexes=("classId", "day"))
+    db.add_many([Schedule(id=0, classId=i % 50, day=DAYS[i % 5], lessons=["Math", "History", "Physics"],
+                          className=f"{i % 50}-A") for i in range(size)])
+    schedules_json = ListCache(Schedule, db)
+    app = FastAPI()
+
+    @app.get("/response_model", response_model=List[Schedule])
+    def legacy():
+        return db.all()
+
+    @app.get("/dump")
+    def dump():
+        return schedules_json.respond(None, lambda: (db.all(), None), None)
+
+    @app.get("/cached")
+    def cached():
+        return schedules_json.respond("all", lambda: (db.all(), None), None)
+
+    return app
+
+
+async def measure(app: FastAPI, repeat: int) -> dict:
+    row = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for mode in ("response_model", "dump", "cached"):
+            await client.get(f"/{mode}")  # прогрів (для cached - заповнення кешу)
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                resp = await client.get(f"/{mode}")
+                times.append(time.perf_counter() - t0)
+                resp.raise_for_status()
+            row[f"{mode}_ms"] = round(statistics.median(times) * 1000, 1)
+    row["speedup_dump"] = round(row["response_model_ms"] / row["dump_ms"], 1)
+    row["speedup_cached"] = round(row["response_model_ms"] / row["cached_ms"])
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        rows.append({"records": size, **asyncio.run(measure(make_app(size), args.repeat))})
+        print_table(rows, key="records")
+        print()
+
+
+if __name__ == "__main__":
+    main()
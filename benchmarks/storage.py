@@ -0,0 +1,123 @@
+"""
+Бенчмарк сховищ (storage.py): пропускна здатність вставки і читання списків.
+
+    python benchmarks/storage.py --records 20000 --writers 4
+
+Для кожного бекенду (memory / sqlite / log) у тимчасовому каталозі:
+- insert:  поодинокі add() (окрема транзакція / запис у журнал на кожен)
+- bulk:    add_many() пакетами по --batch
+- page:    сторінки по 100 записів з фільтром по індексованому полю
+- all:     повний список
+- shared:  --writers процесів одночасно пишуть в одне сховище; перевіряємо,
+           що кожен бачить усі записи і ID не повторюються (для memory - не застосовно)
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from typing import List
+
+from common import print_table
+
+from pydantic import BaseModel
+
+from storage import open_repository
+
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+
+
+class Row(BaseModel):
+    id: int
+    classId: int
+    day: str
+    lessons: List[str]
+    className: str = ""
+
+
+def make(i: int) -> Row:
+    return Row(id=0, classId=i % 50, day=DAYS[i % 5], lessons=["Math", "History", "Physics"], className=f"{i % 50}-A")
+
+
+def open_repo(backend: str, directory: str):
+    return open_repository("rows", Row, indexes=("classId", "day"), backend=backend, directory=directory)
+
+
+def rate(count: int, started: float) -> int:
+    return round(count / (time.perf_counter() - started))
+
+
+def bench(backend: str, records: int, batch: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        repo = open_repo(backend, directory)
+        single = max(1, records // 10)
+        started = time.perf_counter()
+        for i in range(single):
+            repo.add(make(i))
+        insert = rate(single, started)
+
+        started = time.perf_counter()
+        for start in range(0, records, batch):
+            repo.add_many([make(i) for i in range(start, min(records, start + batch))])
+        bulk = rate(records, started)
+
+        pages = 0
+        started = time.perf_counter()
+        for class_id in range(50):
+            cursor = None
+            while True:
+                items, cursor = repo.page(after=cursor, limit=100, classId=class_id)
+                pages += 1
+                if cursor is None:
+                    break
+        page = rate(pages, started)
+
+        started = time.perf_counter()
+        for _ in range(3):
+            total = len(repo.all())
+        all_rate = rate(3 * total, started)
+
+    return {"backend": backend, "insert/s": insert, "bulk rows/s": bulk, "pages/s": page, "all rows/s": all_rate}
+
+
+def writer(backend: str, directory: str, count: int) -> None:
+    repo = open_repo(backend, directory)
+    for i in range(count):
+        repo.add(make(i))
+
+
+def shared(backend: str, writers: int, count: int) -> str:
+    """Кілька процесів пишуть одночасно; після цього свіжий процес має бачити все"""
+    if backend == "memory":
+        return "n/a"
+    with tempfile.TemporaryDirectory() as directory:
+        open_repo(backend, directory)  # створює схему / файл до старту писачів
+        procs = [multiprocessing.Process(target=writer, args=(backend, directory, count)) for _ in range(writers)]
+        started = time.perf_counter()
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - started
+        ids = [row.id for row in open_repo(backend, directory).all()]
+    ok = len(ids) == writers * count and len(set(ids)) == len(ids)
+    return f"{'ok' if ok else 'FAIL'} {round(writers * count / elapsed)}/s"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--backends", default="memory,sqlite,log")
+    args = parser.parse_args()
+
+    rows = []
+    for backend in args.backends.split(","):
+        row = bench(backend, args.records, args.batch)
+        row["shared writes"] = shared(backend, args.writers, max(1, args.records // 20))
+        rows.append(row)
+    print_table(rows, key="backend")
+
+
+if __name__ == "__main__":
+    main()
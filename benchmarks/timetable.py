@@ -0,0 +1,107 @@
+"""
+Бенчмарк Timetable: перевірка конфліктів і запити по інвертованих індексах
+проти повного перебору розкладів (як це довелося б робити клієнту).
+
+    python benchmarks/timetable.py --classes 200,1000,4000 --repeat 200
+
+Набір - "район": N класів x 5 днів x MAX_SLOTS уроків, вчителів у півтора раза більше
+за класи, без конфліктів. Вимірюється in-process, без HTTP:
+- conflict: перевірка нового розкладу (8 уроків) перед вставкою
+- subject_day: "які класи мають History у понеділок"
+- free_slots: вільні слоти одного класу на тиждень
+"""
+import argparse
+import statistics
+import time
+
+from common import print_table
+
+from repository import Repository
+from schedule_service import Schedule
+from timetable import MAX_SLOTS, SCHOOL_DAYS, Timetable
+
+SUBJECTS = ["Math", "History", "Physics", "Biology", "English", "Art", "Chemistry", "Music", "Geography"]
+
+
+def make_schedules(classes: int):
+    teachers = classes * 3 // 2
+    return [
+        Schedule(id=0, classId=c, day=day, className=f"{c}-A", lessons=[
+            # для фіксованого (day, slot) вчителі різних класів різні -> конфліктів немає
+            {"slot": s, "subject": SUBJECTS[(c + s + d) % len(SUBJECTS)], "teacherId": (c + s + d) % teachers}
+            for s in range(1, MAX_SLOTS + 1)
+        ])
+        for c in range(classes) for d, day in enumerate(SCHOOL_DAYS)
+    ]
+
+
+def scan_conflicts(items, candidate):
+    busy = {("class", candidate.classId, candidate.day, l.slot) for l in candidate.lessons}
+    busy |= {("teacher", l.teacherId, candidate.day, l.slot) for l in candidate.lessons}
+    return [
+        item.id for item in items if item.day == candidate.day
+        for l in item.lessons
+        if ("class", item.classId, item.day, l.slot) in busy or ("teacher", l.teacherId, item.day, l.slot) in busy
+    ]
+
+
+def scan_subject_day(items, subject, day):
+    return [(item.id, l.slot) for item in items if item.day == day for l in item.lessons if l.subject == subject]
+
+
+def scan_free_slots(items, class_id):
+    busy = {(item.day, l.slot) for item in items if item.classId == class_id for l in item.lessons}
+    return {day: [s for s in range(1, MAX_SLOTS + 1) if (day, s) not in busy] for day in SCHOOL_DAYS}
+
+
+def median_us(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1e6
+
+
+def measure(classes: int, repeat: int) -> dict:
+    db = Repository(indexes=("classId", "day"))
+    db.add_many(make_schedules(classes))
+    timetable = Timetable(db)
+    t0 = time.perf_counter()
+    timetable.lessons(classId=0)  # перша побудова індексів
+    build_ms = (time.perf_counter() - t0) * 1000
+    items = db.all()
+    # новий клас у вівторок з вчителем, що вже зайнятий у 3-му слоті
+    busy_teacher = items[1].lessons[2].teacherId
+    candidate = Schedule(id=0, classId=classes, day="Tuesday", lessons=[
+        {"slot": s, "subject": "Math", "teacherId": busy_teacher if s == 3 else None} for s in range(1, MAX_SLOTS + 1)])
+    assert timetable.conflicts([candidate])[0] and scan_conflicts(items, candidate)
+    scan_repeat = max(1, repeat // 20)  # повний перебір повільний - менше повторів
+    return {
+        "schedules": len(items),
+        "lessons": len(items) * MAX_SLOTS,
+        "build_ms": round(build_ms, 1),
+        "conflict_us": round(median_us(lambda: timetable.conflicts([candidate]), repeat), 1),
+        "conflict_scan_us": round(median_us(lambda: scan_conflicts(items, candidate), scan_repeat)),
+        "subject_day_us": round(median_us(lambda: timetable.lessons(subject="History", day="Monday"), repeat)),
+        "subject_day_scan_us": round(median_us(lambda: scan_subject_day(items, "History", "Monday"), scan_repeat)),
+        "free_slots_us": round(median_us(lambda: timetable.free_slots(classId=7), repeat), 1),
+        "free_slots_scan_us": round(median_us(lambda: scan_free_slots(items, 7), scan_repeat)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--classes", default="200,1000,4000")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = []
+    for classes in (int(c) for c in args.classes.split(",")):
+        rows.append({"classes": classes, **measure(classes, args.repeat)})
+        print_table(rows, key="classes")
+        print()
+
+
+if __name__ == "__main__":
+    main()
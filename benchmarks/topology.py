@@ -0,0 +1,298 @@
+"""
+Наскрізний бенчмарк усієї топології: Discovery + gateway + N інстансів кожного сервісу.
+
+    python benchmarks/topology.py --instances 2 --requests 3000 --concurrency 20 \\
+        --mix get=80,post=15,delete=5 --output topology.json
+    python benchmarks/topology.py ... --baseline topology.json --threshold 10
+
+Усі процеси - справжні застосунки на вільних портах; інстанси одного сервісу ділять
+SQLite-сховище в тимчасовому каталозі (--storage), тож POST на одному видно на іншому.
+Навантаження йде лише через gateway: суміш GET (сторінка списку) / POST / DELETE
+(видаляються записи, створені цим же прогоном) по /classes, /teachers, /schedules;
+послідовність операцій задається --seed. Кожен воркер - окремий X-Client-Id
+(gateway запускається з GATEWAY_TRUST_CLIENT_ID=1), щоб rate limit на клієнта
+не різав один IP бенчмарку.
+
+Звіт (JSON): пропускна здатність, перцентилі, частка помилок - загалом і по операціях,
+CPU і RSS кожного процесу (з /proc, лише Linux). З --baseline прогін порівнюється
+з попереднім звітом і завершується з кодом 1, якщо rps упав або p99 виріс більше ніж
+на --threshold відсотків, чи частка помилок зросла більше ніж на 1 п.п.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from common import free_port, percentile, spawn, stop, print_table
+
+import httpx
+import uvicorn
+
+SERVICES = {
+    # модуль -> (маршрут gateway, тіло POST)
+    "class_service": ("classes", lambda i: {"id": 0, "name": f"bench-{i}", "profile": "Science"}),
+    "teacher_service": ("teachers", lambda i: {"id": 0, "fullName": f"Teacher {i}", "subject": "Math"}),
+    # свій "день" на кожен POST прогону (i наскрізний для прогріву і заміру):
+    # однаковий клас у тому ж слоті - конфлікт (409)
+    "schedule_service": ("schedules", lambda i: {"classId": 1 + i % 2, "day": f"Day {i}", "lessons": ["Math"]}),
+}
+LIST_LIMIT = 50
+READY_TIMEOUT = 30.0
+ERROR_RATE_SLACK = 0.01     # на скільки може зрости частка помилок відносно baseline
+
+
+def serve(args):
+    if args.role == "discovery":
+        import discovery
+        app = discovery.app
+    elif args.role == "gateway":
+        import gateway
+        gateway.service_cache.discovery_url = args.discovery
+        app = gateway.app
+    else:
+        import importlib
+        from registration import RegistrationAgent
+        module = importlib.import_module(args.role)
+        # Конфіг сервісів - константи модуля; переналаштовуємо до старту
+        module.agent = RegistrationAgent(args.discovery)
+        module.agent.add(module.SERVICE_NAME, "127.0.0.1", args.port)
+        if hasattr(module, "service_cache"):
+            module.service_cache.discovery_url = args.discovery
+        app = module.app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# --- CPU / RSS процесів ---
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    result = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    result["rss_mb" if key == "VmRSS" else "peak_rss_mb"] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return result
+
+
+# --- Навантаження ---
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        op, _, weight = part.partition("=")
+        op = op.strip().upper()
+        if op not in ("GET", "POST", "DELETE"):
+            raise argparse.ArgumentTypeError(f"unknown operation '{op}' in --mix")
+        mix[op] = float(weight)
+    return mix
+
+
+def plan(total: int, mix: Dict[str, float], seed: int) -> List[tuple]:
+    """Відтворювана послідовність (метод, модуль сервісу)"""
+    rnd = random.Random(seed)
+    ops, weights = list(mix), list(mix.values())
+    modules = list(SERVICES)
+    return [(rnd.choices(ops, weights)[0], rnd.choice(modules)) for _ in range(total)]
+
+
+async def drive(gateway_url: str, ops: List[tuple], concurrency: int, first: int = 0) -> dict:
+    """first - номер першої операції: від нього тіла POST, тож фази прогону не повторюють "день" розкладу"""
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    codes: Dict[str, int] = defaultdict(int)  # статус (або тип винятку) -> кількість помилок
+    created: Dict[str, List[int]] = defaultdict(list)  # id, які можна видаляти
+    queue = iter(enumerate(ops, first))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=gateway_url, limits=limits, timeout=30.0) as client:
+        async def worker(n: int):
+            headers = {"X-Client-Id": f"bench-{n}"}
+            for i, (method, module) in queue:
+                route, body = SERVICES[module]
+                if method == "DELETE" and not created[route]:
+                    method = "GET"  # ще нічого видаляти
+                name = f"{method} /{route}"
+                t0 = time.perf_counter()
+                try:
+                    if method == "GET":
+                        resp = await client.get(f"/{route}", params={"limit": LIST_LIMIT}, headers=headers)
+                    elif method == "POST":
+                        resp = await client.post(f"/{route}", json=body(i), headers=headers)
+                        if resp.status_code == 200:
+                            created[route].append(resp.json()["id"])
+                    else:
+                        resp = await client.delete(f"/{route}/{created[route].pop()}", headers=headers)
+                except httpx.HTTPError as e:
+                    errors[name] += 1
+                    codes[type(e).__name__] += 1
+                    continue
+                if resp.status_code < 400:
+                    latencies[name].append(time.perf_counter() - t0)
+                else:
+                    errors[name] += 1
+                    codes[str(resp.status_code)] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    def stats(lat: List[float], err: int) -> dict:
+        count = len(lat) + err
+        return {
+            "requests": count,
+            "errors": err,
+            "error_rate": round(err / count, 4) if count else 0.0,
+            "rps": round(count / elapsed, 1),
+            "p50_ms": round(percentile(lat, 50) * 1000, 2),
+            "p90_ms": round(percentile(lat, 90) * 1000, 2),
+            "p99_ms": round(percentile(lat, 99) * 1000, 2),
+        }
+
+    names = sorted(set(latencies) | set(errors))
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "total": stats([x for lat in latencies.values() for x in lat], sum(errors.values())),
+        "operations": {name: stats(latencies[name], errors[name]) for name in names},
+        "error_codes": dict(codes),
+    }
+
+
+async def wait_ready(discovery_url: str, gateway_url: str, instances: int):
+    """Усі інстанси зареєстровані, а gateway уже бачить кожен сервіс"""
+    deadline = time.monotonic() + READY_TIMEOUT
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        pending = {module: route for module, (route, _) in SERVICES.items()}
+        while pending:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"services not ready: {', '.join(pending)}")
+            for module, route in list(pending.items()):
+                name = module.replace("_", "-")
+                try:
+                    listed = (await client.get(f"{discovery_url}/services/{name}")).json()
+                    ready = isinstance(listed, list) and len(listed) >= instances \
+                        and (await client.get(f"{gateway_url}/{route}", params={"limit": 1})).status_code == 200
+                except httpx.HTTPError:
+                    ready = False
+                if ready:
+                    del pending[module]
+            await asyncio.sleep(0.2)
+
+
+# --- Порівняння з baseline ---
+def regressions(report: dict, baseline: dict, threshold: float) -> List[str]:
+    cur, base = report["total"], baseline["total"]
+    found = []
+    if base["rps"] and cur["rps"] < base["rps"] * (1 - threshold / 100):
+        found.append(f"throughput {cur['rps']} rps < baseline {base['rps']} rps - {threshold}%")
+    if base["p99_ms"] and cur["p99_ms"] > base["p99_ms"] * (1 + threshold / 100):
+        found.append(f"p99 {cur['p99_ms']} ms > baseline {base['p99_ms']} ms + {threshold}%")
+    if cur["error_rate"] > base["error_rate"] + ERROR_RATE_SLACK:
+        found.append(f"error rate {cur['error_rate']} > baseline {base['error_rate']} + {ERROR_RATE_SLACK}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--role", choices=["discovery", "gateway", *SERVICES])
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--discovery")
+    parser.add_argument("--instances", type=int, default=2, help="інстансів кожного сервісу")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--warmup", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("get=80,post=15,delete=5"))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--storage", choices=["sqlite", "log"], default="sqlite")
+    parser.add_argument("--output", default="topology.json")
+    parser.add_argument("--baseline", help="попередній JSON-звіт для порівняння")
+    parser.add_argument("--threshold", type=float, default=10.0, help="допустима регресія, %%")
+    args = parser.parse_args()
+
+    if args.role:
+        serve(args)
+        return
+
+    data_dir = tempfile.mkdtemp(prefix="pzschool-bench-")
+    # успадкують усі процеси
+    os.environ.update(STORAGE_BACKEND=args.storage, STORAGE_DIR=data_dir, GATEWAY_TRUST_CLIENT_ID="1")
+    procs: Dict[str, object] = {}
+    try:
+        discovery_port = free_port()
+        discovery_url = f"http://127.0.0.1:{discovery_port}"
+        procs["discovery"] = spawn(["benchmarks/topology.py", "--role", "discovery", "--port", str(discovery_port)],
+                                   discovery_port)
+        for module in SERVICES:
+            for n in range(args.instances):
+                port = free_port()
+                procs[f"{module}#{n + 1}"] = spawn(["benchmarks/topology.py", "--role", module, "--port", str(port),
+                                                    "--discovery", discovery_url], port)
+        gateway_port = free_port()
+        gateway_url = f"http://127.0.0.1:{gateway_port}"
+        procs["gateway"] = spawn(["benchmarks/topology.py", "--role", "gateway", "--port", str(gateway_port),
+                                  "--discovery", discovery_url], gateway_port)
+        asyncio.run(wait_ready(discovery_url, gateway_url, args.instances))
+
+        if args.warmup:
+            asyncio.run(drive(gateway_url, plan(args.warmup, args.mix, args.seed + 1), args.concurrency))
+        cpu_before = {name: cpu_seconds(p.pid) for name, p in procs.items()}
+        result = asyncio.run(drive(gateway_url, plan(args.requests, args.mix, args.seed), args.concurrency,
+                                   first=args.warmup))
+        processes = {}
+        for name, p in procs.items():
+            before, after = cpu_before[name], cpu_seconds(p.pid)
+            usage = {}
+            if before is not None and after is not None:
+                usage = {"cpu_seconds": round(after - before, 2),
+                         "cpu_percent": round((after - before) / result["elapsed_s"] * 100, 1)}
+            processes[name] = {**usage, **memory_mb(p.pid)}
+    finally:
+        stop(*procs.values())
+
+    report = {
+        "config": {k: getattr(args, k) for k in ("instances", "requests", "warmup", "concurrency", "mix", "seed", "storage")},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **result,
+        "processes": processes,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_table([{"operation": "total", **result["total"]}]
+                + [{"operation": k, **v} for k, v in result["operations"].items()], key="operation")
+    print()
+    print_table([{"process": k, **v} for k, v in processes.items()], key="process")
+    if result["error_codes"]:
+        print(f"\nerrors by status: {result['error_codes']}")
+    print(f"\nreport: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.threshold)
+        for line in found:
+            print(f"REGRESSION: {line}")
+        if found:
+            sys.exit(1)
+        print(f"no regressions vs {args.baseline} (threshold {args.threshold}%)")
+
+
+if __name__ == "__main__":
+    main()
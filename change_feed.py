@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from discovery_client import ServiceCache, ServiceUnavailable
+from load_balancer import instance_key
+
+CHANGE_LOG_SIZE = 1000   # скільки останніх подій тримаємо для споживачів
+FEED_MAX_WAIT = 60.0     # максимальний long-poll
+FOLLOW_WAIT = 30.0       # long-poll споживача
+FOLLOW_MAX_BACKOFF = 10.0
+INSTANCES_REFRESH = 5.0  # як часто споживач звіряє список інстансів джерела
+
+
+def _wake(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class ChangeFeed:
+    """
+    Журнал змін колекції для інших сервісів (long-poll, як watch у Discovery):
+    - кожна подія (created / updated / deleted) отримує наступний `seq`
+    - `epoch` - ID журналу цього процесу: після перезапуску нумерація починається
+      знову, і споживач за новим epoch розуміє, що міг щось пропустити
+    - read(after) -> events=None, якщо таких старих подій уже немає
+    Публікують і чекають async-ендпоінти в event loop. threading.Lock і call_soon_threadsafe
+    лишаються, щоб publish() можна було викликати і з потоку - зі складеної операції
+    в db.run, яка для sqlite/log-сховища йде через asyncio.to_thread.
+    """
+
+    def __init__(self, size: int = CHANGE_LOG_SIZE):
+        self.epoch = uuid.uuid4().hex
+        self.seq = 0
+        self._events: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._waiters: Dict[asyncio.Future, asyncio.AbstractEventLoop] = {}
+
+    def publish(self, type: str, id: int, data: Optional[dict] = None):
+        with self._lock:
+            self.seq += 1
+            self._events.append({"seq": self.seq, "type": type, "id": id, "data": data})
+            waiters, self._waiters = self._waiters, {}
+        for fut, loop in waiters.items():
+            loop.call_soon_threadsafe(_wake, fut)
+
+    def read(self, after: int) -> dict:
+        """Події після `after`; events=None - треба перечитати стан повністю"""
+        with self._lock:
+            seq, events = self.seq, list(self._events)
+        if after > seq or (events and after < events[0]["seq"] - 1):
+            return {"epoch": self.epoch, "seq": seq, "events": None}
+        return {"epoch": self.epoch, "seq": seq, "events": [e for e in events if e["seq"] > after]}
+
+    async def wait(self, after: int, timeout: float = FEED_MAX_WAIT) -> bool:
+        """Чекає подію після `after` (не довше timeout)"""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            if self.seq != after:
+                return True
+            self._waiters[fut] = loop
+        try:
+            await asyncio.wait_for(fut, min(timeout, FEED_MAX_WAIT))
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            # таймаут або скасований запит (споживач відвалився) - прибираємо за собою
+            with self._lock:
+                self._waiters.pop(fut, None)
+
+
+class ChangeFollower:
+    """
+    Споживач ChangeFeed іншого сервісу: long-poll `path` на кожному його інстансі
+    (сховище в них спільне, але кожен публікує лише свої записи).
+    - on_events(events) - нові події одного інстансу, по порядку
+    - on_reset() - щось могли пропустити (новий інстанс, перезапуск, переповнений журнал):
+      споживач сам перечитує потрібний стан
+    Обробник кинув виняток -> та сама позиція пробується знову з паузою.
+    """
+
+    def __init__(self, service_cache: ServiceCache, service: str, path: str,
+                 on_events: Callable[[List[dict]], Awaitable[None]], on_reset: Callable[[], Awaitable[None]],
+                 wait: float = FOLLOW_WAIT):
+        self.service_cache = service_cache
+        self.service = service
+        self.path = path
+        self.on_events = on_events
+        self.on_reset = on_reset
+        self.wait = wait
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._followers: Dict[str, asyncio.Task] = {}
+
+    async def start(self):
+        self._client = httpx.AsyncClient(timeout=self.wait + 5.0)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = list(self._followers.values()) + ([self._task] if self._task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._followers.clear()
+        self._task = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        while True:
+            try:
+                instances = {instance_key(i): i for i in await self.service_cache.get_instances(self.service)}
+            except ServiceUnavailable:
+                instances = None  # Discovery недоступний -> слідкуємо за тими, що вже знаємо
+            if instances is not None:
+                for key, instance in instances.items():
+                    if key not in self._followers:
+                        self._followers[key] = asyncio.create_task(self._follow(instance))
+                for key in [k for k in self._followers if k not in instances]:
+                    self._followers.pop(key).cancel()
+            await asyncio.sleep(INSTANCES_REFRESH)
+
+    async def _follow(self, instance: dict):
+        url = f"http://{instance['host']}:{instance['port']}{self.path}"
+        epoch, seq, backoff = None, 0, 1.0
+        while True:
+            try:
+                # поки epoch невідомий - без очікування: спершу треба синхронізуватись
+                resp = await self._client.get(url, params={"after": seq, "wait": self.wait if epoch else 0})
+                resp.raise_for_status()
+                data = resp.json()
+                if data["epoch"] != epoch or data["events"] is None:
+                    await self.on_reset()
+                elif data["events"]:
+                    await self.on_events(data["events"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, FOLLOW_MAX_BACKOFF)
+                continue
+            backoff = 1.0
+            epoch, seq = data["epoch"], data["seq"]
@@ -0,0 +1,150 @@
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from cache import TTLCache
+from discovery_client import ServiceCache, ServiceUnavailable
+from load_balancer import LoadBalancer, StatsRegistry
+from metrics import UPSTREAM_DURATION, trace_headers
+
+CLASS_SERVICE = "class-service"
+NAME_TTL = 60.0          # секунд, скільки вважаємо назву класу свіжою
+NEGATIVE_TTL = 5.0       # "класу немає" кешуємо коротко: його можуть створити
+STALE_TTL = 3600.0       # скільки ще віддаємо стару назву, якщо class-service лежить
+MAX_ENTRIES = 50000
+MAX_BATCH = 500          # ID в одному запиті /classes?ids=...
+
+UNKNOWN_CLASS = "Unknown Class"
+
+
+class _FetchError(Exception):
+    pass
+
+
+class ClassServiceUnavailable(Exception):
+    """class-service не відповів, свіжих назв немає"""
+
+
+class ClassNameResolver:
+    """
+    classId -> назва класу для schedule-service.
+    - локальний TTL + LRU кеш
+    - усі промахи, що прийшли за один прохід event loop, йдуть одним запитом
+      GET /classes?ids=...; повторні запити того ж ID чекають на той самий future
+    - class-service недоступний -> стара назва з кешу, якщо вона є
+    """
+
+    def __init__(self, service_cache: ServiceCache, balancer: LoadBalancer, stats: StatsRegistry):
+        self.service_cache = service_cache
+        self.balancer = balancer
+        self.stats = stats
+        self.cache = TTLCache(maxsize=MAX_ENTRIES, ttl=NAME_TTL, stale_ttl=STALE_TTL)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self._pending: List[int] = []
+
+    async def start(self):
+        self._client = httpx.AsyncClient(timeout=5.0)
+
+    async def stop(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def invalidate(self, class_id: int):
+        self.cache.pop(class_id)
+
+    async def refresh(self, class_ids: Iterable[int]) -> Dict[int, str]:
+        """
+        Свіжі назви з class-service в обхід кешу (кеш теж оновлюється).
+        На відміну від resolve, при недоступності кидає виняток, а не віддає заглушку.
+        """
+        ids = list(set(class_ids))
+        result: Dict[int, str] = {}
+        for i in range(0, len(ids), MAX_BATCH):
+            batch = ids[i:i + MAX_BATCH]
+            try:
+                result.update(self._remember(batch, await self._fetch(batch)))
+            except _FetchError as e:
+                raise ClassServiceUnavailable(str(e))
+        return result
+
+    def _remember(self, class_ids: List[int], names: Dict[int, str]) -> Dict[int, str]:
+        """Відповідь class-service -> кеш; відсутні класи кешуємо коротко як UNKNOWN_CLASS"""
+        for class_id in class_ids:
+            if class_id in names:
+                self.cache.set(class_id, names[class_id])
+            else:
+                self.cache.set(class_id, UNKNOWN_CLASS, ttl=NEGATIVE_TTL)
+        return {cid: names.get(cid, UNKNOWN_CLASS) for cid in class_ids}
+
+    async def resolve(self, class_id: int) -> str:
+        return (await self.resolve_many([class_id]))[class_id]
+
+    async def resolve_many(self, class_ids: Iterable[int]) -> Dict[int, str]:
+        result: Dict[int, str] = {}
+        waiting: Dict[int, asyncio.Future] = {}
+        for class_id in set(class_ids):
+            name = self.cache.get(class_id)
+            if name is not None:
+                result[class_id] = name
+                continue
+            fut = self._inflight.get(class_id)
+            if fut is None:
+                fut = self._inflight[class_id] = asyncio.get_running_loop().create_future()
+                if not self._pending:
+                    asyncio.get_running_loop().call_soon(self._schedule_flush)
+                self._pending.append(class_id)
+            waiting[class_id] = fut
+        for class_id, fut in waiting.items():
+            result[class_id] = await asyncio.shield(fut)
+        return result
+
+    def _schedule_flush(self):
+        pending, self._pending = self._pending, []
+        for i in range(0, len(pending), MAX_BATCH):
+            asyncio.create_task(self._flush(pending[i:i + MAX_BATCH]))
+
+    async def _flush(self, class_ids: List[int]):
+        try:
+            resolved = self._remember(class_ids, await self._fetch(class_ids))
+        except _FetchError as e:
+            resolved = {cid: self.cache.get_stale(cid, str(e)) for cid in class_ids}
+        except Exception:
+            resolved = {cid: self.cache.get_stale(cid, "Error Connecting") for cid in class_ids}
+        for class_id in class_ids:
+            fut = self._inflight.pop(class_id)
+            if not fut.done():
+                fut.set_result(resolved[class_id])
+
+    async def _fetch(self, class_ids: List[int]) -> Dict[int, str]:
+        try:
+            instances = await self.service_cache.get_instances(CLASS_SERVICE)
+        except ServiceUnavailable:
+            raise _FetchError("Unknown (Service Down)")
+        if not instances:
+            raise _FetchError("Unknown (No Instances)")
+
+        target = self.balancer.choose(instances)
+        call = self.stats.begin(target)
+        try:
+            # trace ID того запиту, що першим промахнувся і запустив цей пакет
+            resp = await self._client.get(
+                f"http://{target['host']}:{target['port']}/classes",
+                params={"ids": ",".join(map(str, class_ids))},
+                headers=trace_headers(),
+            )
+            call.record(ok=resp.status_code < 500)
+            UPSTREAM_DURATION.observe(time.perf_counter() - call.started, CLASS_SERVICE, str(resp.status_code))
+        except httpx.RequestError:
+            UPSTREAM_DURATION.observe(time.perf_counter() - call.started, CLASS_SERVICE, "error")
+            call.record(ok=False)
+            self.service_cache.invalidate(CLASS_SERVICE, target["host"], target["port"])
+            raise _FetchError("Error Connecting")
+        finally:
+            call.end()
+        if resp.status_code != 200:
+            raise _FetchError(UNKNOWN_CLASS)
+        return {c["id"]: c["name"] for c in resp.json()}
@@ -1,62 +1,111 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 from typing import List, Optional
 import uvicorn
-import httpx
-import threading
-import time
+import os
 
-app = FastAPI(title="Class Service")
+from change_feed import ChangeFeed
+from registration import RegistrationAgent
+from listing import MAX_PAGE_SIZE, ListCache
+from metrics import MetricsMiddleware, watch_cache
+from storage import open_async_repository
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # heartbeat-и в Discovery - asyncio-задача в тому ж event loop, що живе рівно стільки, скільки app
+    await agent.start()
+    yield
+    await agent.stop()
+
+app = FastAPI(title="Class Service", lifespan=lifespan)
 
 # --- Config ---
 SERVICE_NAME = "class-service"
-SERVICE_PORT = 8001
-DISCOVERY_URL = "http://127.0.0.1:8000"
+# Адреса - з оточення: launcher.py піднімає кілька інстансів на різних портах
+SERVICE_HOST = os.environ.get("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("SERVICE_PORT", 8001))
+DISCOVERY_URL = os.environ.get("DISCOVERY_URL", "http://127.0.0.1:8000")
 
-def register_in_discovery():
-    while True:
-        try:
-            with httpx.Client() as client:
-                client.post(f"{DISCOVERY_URL}/register", json={
-                    "name": SERVICE_NAME, "host": "127.0.0.1", "port": SERVICE_PORT
-                })
-        except: pass
-        time.sleep(10)
+agent = RegistrationAgent(DISCOVERY_URL)
+agent.add(SERVICE_NAME, SERVICE_HOST, SERVICE_PORT)
 
-@app.on_event("startup")
-async def startup_event():
-    threading.Thread(target=register_in_discovery, daemon=True).start()
+app.add_middleware(MetricsMiddleware, service=SERVICE_NAME)
 
 class SchoolClass(BaseModel):
     id: int
     name: str
     profile: Optional[str] = None
 
+# Ендпоінти - async: з memory-сховищем запит не йде через thread pool взагалі
 # Початкові дані
-db = [
+db = open_async_repository("classes", SchoolClass, seed=[
     SchoolClass(id=1, name="10-A", profile="Science"),
     SchoolClass(id=2, name="11-B", profile="Humanities")
-]
+])
+classes_json = ListCache(SchoolClass, db.sync)
+# Зміни класів для schedule-service (денормалізований className у розкладах)
+changes = ChangeFeed()
+watch_cache("class_list", classes_json.stats)
 
 @app.get("/classes", response_model=List[SchoolClass])
-def get_all(): return db
+async def get_all(
+    ids: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    # ?ids=1,2,3 -> лише потрібні класи (пакетний запит від schedule-service)
+    if ids is not None:
+        try:
+            wanted = dict.fromkeys(int(i) for i in ids.split(",") if i.strip())
+        except ValueError:
+            raise HTTPException(status_code=422, detail="ids must be comma-separated integers")
+        # довільні набори ids не кешуємо, щоб не витісняли звичайні сторінки
+        return await db.run(classes_json.respond, None,
+                            lambda: ([c for c in map(db.sync.get, wanted) if c is not None], None), fields, if_none_match)
+    return await db.run(classes_json.respond, (after, limit), lambda: db.sync.page(after=after, limit=limit),
+                        fields, if_none_match)
+
+@app.get("/classes/changes")
+async def class_changes(after: int = 0, wait: float = Query(30.0, ge=0)):
+    """
+    Long-poll: події після `after` (created / updated / deleted з порядковим seq),
+    щойно вони з'являться, або порожній список через `wait` секунд.
+    events=null -> журнал уже не містить потрібних подій (чи змінився epoch): перечитайте стан.
+    """
+    await changes.wait(after, wait)
+    return changes.read(after)
+
+@app.get("/classes/{id}", response_model=SchoolClass)
+async def get_class(id: int):
+    c = await db.get(id)
+    if c is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return c
 
 @app.post("/classes", response_model=SchoolClass)
-def create(data: SchoolClass):
-    # FIX: Правильний автоінкремент
-    new_id = max([c.id for c in db], default=0) + 1
-    data.id = new_id
-    db.append(data)
-    return data
+async def create(data: SchoolClass):
+    # ID видає репозиторій (монотонний лічильник)
+    item = await db.add(data)
+    changes.publish("created", item.id, item.model_dump())
+    return item
+
+@app.put("/classes/{id}", response_model=SchoolClass)
+async def update_class(id: int, data: SchoolClass):
+    item = data.model_copy(update={"id": id})
+    if not await db.update(item):
+        raise HTTPException(status_code=404, detail="Not found")
+    changes.publish("updated", id, item.model_dump())
+    return item
 
 @app.delete("/classes/{id}")
-def delete_class(id: int):
-    global db
-    initial_len = len(db)
-    db = [c for c in db if c.id != id]
-    if len(db) == initial_len:
+async def delete_class(id: int):
+    if not await db.delete(id):
         raise HTTPException(status_code=404, detail="Not found")
+    changes.publish("deleted", id)
     return {"status": "deleted"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=SERVICE_PORT)
\ No newline at end of file
+    uvicorn.run(app, host=SERVICE_HOST, port=SERVICE_PORT)
\ No newline at end of file
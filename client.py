@@ -4,20 +4,55 @@ import sys
 
 # Адрес API Gateway
 GATEWAY_URL = "http://127.0.0.1:8080"
+PAGE_SIZE = 20
 
 def print_json(data):
     print(json.dumps(data, indent=2, ensure_ascii=False))
 
-def get_request(endpoint):
+# Копії списків за URL: повторний запит іде з If-None-Match, і на 304 сервер тіла не шле
+session = requests.Session()
+etag_cache = {}
+
+def conditional_get(endpoint, params=None):
+    """GET з If-None-Match -> (відповідь, дані, курсор); на 304 дані беруться з локальної копії"""
+    key = (endpoint, tuple(sorted((params or {}).items())))
+    cached = etag_cache.get(key)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    res = session.get(f"{GATEWAY_URL}{endpoint}", params=params, headers=headers)
+    if res.status_code == 304 and cached:
+        return res, cached[1], cached[2]
+    if res.status_code != 200:
+        return res, None, None
+    data, cursor = res.json(), res.headers.get("X-Next-Cursor")
+    if "ETag" in res.headers:
+        etag_cache[key] = (res.headers["ETag"], data, cursor)
+    return res, data, cursor
+
+def get_request(endpoint, params=None):
+    # Посторінково: сервер віддає курсор наступної сторінки в X-Next-Cursor
+    params = dict(params or {}, limit=PAGE_SIZE)
     try:
-        res = requests.get(f"{GATEWAY_URL}{endpoint}")
-        if res.status_code == 200:
-            print_json(res.json())
-        else:
-            print(f"Error {res.status_code}: {res.text}")
+        while True:
+            res, data, cursor = conditional_get(endpoint, params)
+            if data is None:
+                print(f"Error {res.status_code}: {res.text}")
+                return
+            print_json(data)
+            if not cursor or input("Enter - next page, q - stop: ").strip().lower() == "q":
+                return
+            params["after"] = cursor
     except Exception as e:
         print(f"Connection Error: {e}")
 
+def list_schedules():
+    # Необов'язкові фільтри (по індексах на сервері)
+    class_id = input("Filter by Class ID (Enter - all): ").strip()
+    day = input("Filter by Day (Enter - all): ").strip()
+    params = {}
+    if class_id.isdigit(): params["classId"] = int(class_id)
+    if day: params["day"] = day
+    get_request('/schedules', params)
+
 # --- NEW FUNCTION: CREATE CLASS ---
 def create_class():
     print("\n--- Create Class (via Gateway) ---")
@@ -173,7 +208,7 @@ def main():
         
         if choice == '1': get_request('/classes')
         elif choice == '2': get_request('/teachers')
-        elif choice == '3': get_request('/schedules')
+        elif choice == '3': list_schedules()
         elif choice == '4': create_schedule()
         elif choice == '5': create_teacher()
         elif choice == '6': create_class() # <--- Вызов
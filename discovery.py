@@ -1,54 +1,389 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
+from contextlib import asynccontextmanager
+from collections import OrderedDict, deque
+from typing import Callable, List, Dict, Tuple, Optional
+import argparse
+import asyncio
+import json
+import threading
 import time
+import uuid
 
-app = FastAPI(title="Discovery Service")
+from metrics import MetricsMiddleware
+from registry_store import RegistryLog, PeerReplicator
+
+INSTANCE_TTL = 30.0   # секунд без heartbeat -> інстанс вважається мертвим
+REAP_INTERVAL = 1.0   # як часто прибираємо прострочені інстанси
+EVENT_LOG_SIZE = 1000 # скільки останніх змін тримаємо для watch-клієнтів
+WATCH_MAX_WAIT = 60.0 # максимальний long-poll
+SSE_KEEPALIVE = 15.0  # коментар-пінг у SSE, щоб проксі не рвали з'єднання
+
+# Опційно (задаються аргументами командного рядка, див. __main__):
+DATA_DIR: Optional[str] = None  # каталог для журналу і знімків реєстру
+PEERS: List[str] = []           # інші вузли Discovery для реплікації
 
 # Модель даних для реєстрації
 class ServiceInstance(BaseModel):
     name: str
     host: str
     port: int
+    instance_id: Optional[str] = None  # унікальний для процесу; старі клієнти можуть не передавати
     last_heartbeat: float = 0.0
 
-# Реєстр: { "service_name": [ServiceInstance, ServiceInstance] }
-registry: Dict[str, List[ServiceInstance]] = {}
+InstanceKey = Tuple[str, str, int]  # (name, host, port)
+
+class Registry:
+    """
+    Реєстр інстансів:
+    - словник по (name, host, port) -> upsert/heartbeat за O(1)
+    - OrderedDict у порядку останнього heartbeat: TTL однаковий для всіх,
+      тож найстаріші завжди на початку і reaper не сканує весь реєстр
+    - для кожного сервісу готовий список живих інстансів, який
+      перебудовується лише при зміні складу (новий інстанс / виселення)
+    Усі виклики - з async-ендпоінтів і reaper-а в одному event loop, тож операції короткі
+    і без I/O (журнал на диску - лише дописування рядка без fsync, знімок пишеться в потоці).
+    Пишуть під threading.Lock (у loop він без конкуренції): wait() будить futures через
+    call_soon_threadsafe, і реєстр лишається коректним, якщо його викличуть з потоку.
+    Читають без локу: списки ніколи не змінюються на місці, лише замінюються.
+
+    Кожна зміна складу (added / removed / expired) отримує наступний `index`
+    і потрапляє в обмежений журнал подій, з якого читають watch-клієнти.
+    Heartbeat існуючого інстансу подією не є.
+
+    При реєстрації інстанс отримує lease_id: далі heartbeat - це просто
+    renew(lease_id) без тіла з моделлю, а release(lease_id) прибирає інстанс одразу.
+    Реєстрація на ту саму адресу з іншим instance_id - це вже новий процес
+    (перезапуск до закінчення TTL старого): старий lease знімається, інстанс додається заново.
+
+    Кожна операція (upsert / renew / release / expire) передається в `listeners`
+    (журнал на диску, реплікація): listener(op, replicated).
+    """
+
+    def __init__(self, ttl: float = INSTANCE_TTL):
+        self.ttl = ttl
+        self.index = 0
+        self._lock = threading.Lock()
+        self._by_heartbeat: "OrderedDict[InstanceKey, ServiceInstance]" = OrderedDict()
+        self._by_service: Dict[str, Dict[InstanceKey, ServiceInstance]] = {}
+        self._live: Dict[str, List[ServiceInstance]] = {}
+        self._service_index: Dict[str, int] = {}
+        self._events: deque = deque(maxlen=EVENT_LOG_SIZE)
+        # Очікувачі змін: {ім'я сервісу або "*": {future: loop}}
+        self._waiters: Dict[str, dict] = {}
+        self._leases: Dict[str, InstanceKey] = {}
+        self._lease_of: Dict[InstanceKey, str] = {}
+        self.listeners: List[Callable[[dict, bool], None]] = []
+
+    def _emit(self, op: dict, replicated: bool):
+        for listener in self.listeners:
+            listener(op, replicated)
+
+    def upsert(self, instance: ServiceInstance, lease_id: Optional[str] = None,
+               replicated: bool = False) -> Tuple[str, bool]:
+        """Повертає (lease_id, чи інстанс новий)"""
+        key = (instance.name, instance.host, instance.port)
+        with self._lock:
+            current = self._by_heartbeat.get(key)
+            if current is not None and instance.instance_id not in (None, current.instance_id):
+                self._remove(key, "removed", replicated)
+                current = None
+            if current is not None:
+                self._touch(key, current)
+                self._emit({"op": "renew", "lease_ids": [self._lease_of[key]]}, replicated)
+                return self._lease_of[key], False
+            lease_id = self._insert(instance, lease_id or uuid.uuid4().hex)
+            self._emit({"op": "upsert", "instance": instance.model_dump(), "lease_id": lease_id}, replicated)
+            return lease_id, True
+
+    def _insert(self, instance: ServiceInstance, lease_id: str) -> str:
+        key = (instance.name, instance.host, instance.port)
+        instance.last_heartbeat = time.time()
+        self._by_heartbeat[key] = instance
+        self._by_service.setdefault(instance.name, {})[key] = instance
+        self._leases[lease_id] = key
+        self._lease_of[key] = lease_id
+        self._changed(instance, "added")
+        return lease_id
+
+    def renew(self, lease_ids: List[str], replicated: bool = False) -> List[str]:
+        """Продовжує lease-и, повертає ті, яких уже немає (інстансу треба перереєструватись)"""
+        unknown = []
+        with self._lock:
+            for lease_id in lease_ids:
+                key = self._leases.get(lease_id)
+                if key is None:
+                    unknown.append(lease_id)
+                else:
+                    self._touch(key, self._by_heartbeat[key])
+            known = [l for l in lease_ids if l not in unknown]
+            if known:
+                self._emit({"op": "renew", "lease_ids": known}, replicated)
+        return unknown
+
+    def _touch(self, key: InstanceKey, instance: ServiceInstance):
+        instance.last_heartbeat = time.time()
+        self._by_heartbeat.move_to_end(key)
+
+    def release(self, lease_id: str, replicated: bool = False) -> bool:
+        with self._lock:
+            key = self._leases.get(lease_id)
+            return key is not None and self._remove(key, "removed", replicated)
+
+    def remove(self, key: InstanceKey) -> bool:
+        with self._lock:
+            return self._remove(key, "removed")
+
+    def _remove(self, key: InstanceKey, event: str, replicated: bool = False) -> bool:
+        instance = self._by_heartbeat.pop(key, None)
+        if instance is None:
+            return False
+        del self._by_service[key[0]][key]
+        lease_id = self._lease_of.pop(key)
+        del self._leases[lease_id]
+        self._changed(instance, event)
+        self._emit({"op": "release" if event == "removed" else "expire", "lease_id": lease_id}, replicated)
+        return True
+
+    def _changed(self, instance: ServiceInstance, event: str):
+        name = instance.name
+        self._live[name] = list(self._by_service[name].values())
+        self.index += 1
+        self._service_index[name] = self.index
+        self._events.append({"index": self.index, "type": event, "instance": instance.model_dump()})
+        for key in (name, "*"):
+            for fut, loop in self._waiters.pop(key, {}).items():
+                loop.call_soon_threadsafe(_wake, fut)
+
+    def reap(self) -> List[InstanceKey]:
+        """Виселяє інстанси без heartbeat довше за TTL"""
+        deadline = time.time() - self.ttl
+        expired = []
+        with self._lock:
+            while self._by_heartbeat:
+                key, oldest = next(iter(self._by_heartbeat.items()))
+                if oldest.last_heartbeat >= deadline:
+                    break
+                self._remove(key, "expired")
+                expired.append(key)
+        return expired
+
+    def known(self, name: str) -> bool:
+        return name in self._live
+
+    def live(self, name: str) -> List[ServiceInstance]:
+        return self._live.get(name, [])
+
+    def service_index(self, name: str) -> int:
+        return self._service_index.get(name, 0)
+
+    def events_since(self, index: int, name: Optional[str] = None) -> Optional[List[dict]]:
+        """Події після `index`; None, якщо журнал вже їх не містить (треба повний знімок)"""
+        events = list(self._events)
+        if events and index < events[0]["index"] - 1:
+            return None
+        return [e for e in events if e["index"] > index and (name is None or e["instance"]["name"] == name)]
+
+    async def wait(self, index: int, name: Optional[str] = None, timeout: float = WATCH_MAX_WAIT) -> bool:
+        """Чекає зміни сервісу `name` (або будь-якої, якщо None) після `index`"""
+        key = name or "*"
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            current = self.index if name is None else self.service_index(name)
+            if current > index:
+                return True
+            self._waiters.setdefault(key, {})[fut] = loop
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            # і при таймауті, і коли клієнт відвалився (запит скасовано) - інакше future лишиться назавжди
+            with self._lock:
+                waiters = self._waiters.get(key)
+                if waiters is not None:
+                    waiters.pop(fut, None)
+                    if not waiters:
+                        del self._waiters[key]
+
+    # --- Персистентність / реплікація ---
+    def dump(self) -> List[dict]:
+        with self._lock:
+            return self._dump()
+
+    def _dump(self) -> List[dict]:
+        return [{"instance": i.model_dump(), "lease_id": self._lease_of[k]} for k, i in self._by_heartbeat.items()]
+
+    def restore(self, entries: List[dict]):
+        """Відновлює інстанси зі знімка/журналу зі свіжим heartbeat; наявні не чіпає"""
+        with self._lock:
+            for entry in entries:
+                instance = ServiceInstance(**entry["instance"])
+                key = (instance.name, instance.host, instance.port)
+                if key not in self._by_heartbeat and entry["lease_id"] not in self._leases:
+                    self._insert(instance, entry["lease_id"])
+
+    def checkpoint(self, rotate: Callable[[], None]) -> List[dict]:
+        """
+        Стан для знімка + rotate() журналу під одним локом: усе, чого немає в стані, піде вже
+        в новий журнал. Сам знімок (з fsync) пише викликач поза локом
+        """
+        with self._lock:
+            rotate()
+            return self._dump()
+
+    def apply(self, op: dict):
+        """Операція, що прийшла від піра"""
+        if op["op"] == "upsert":
+            self.upsert(ServiceInstance(**op["instance"]), op["lease_id"], replicated=True)
+        elif op["op"] == "renew":
+            self.renew(op["lease_ids"], replicated=True)
+        elif op["op"] == "release":
+            self.release(op["lease_id"], replicated=True)
+
+def _wake(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+registry = Registry()
+
+async def reaper(store: Optional[RegistryLog]):
+    while True:
+        await asyncio.sleep(REAP_INTERVAL)
+        for name, host, port in registry.reap():
+            print(f"Expired: {name} at {host}:{port}")
+        if store and store.needs_compaction():
+            await asyncio.to_thread(store.write_snapshot, registry.checkpoint(store.rotate))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = []
+    store = None
+    if DATA_DIR:
+        store = RegistryLog(DATA_DIR)
+        registry.restore(store.load())
+        await asyncio.to_thread(store.write_snapshot, registry.checkpoint(store.rotate))
+        registry.listeners.append(store)
+    if PEERS:
+        replicator = PeerReplicator(PEERS)
+        registry.restore(await replicator.bootstrap())
+        registry.listeners.append(replicator)
+        tasks.append(asyncio.create_task(replicator.run()))
+    tasks.append(asyncio.create_task(reaper(store)))
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if store:
+        store.close()
+
+app = FastAPI(title="Discovery Service", lifespan=lifespan)
+# watch / SSE - довгі запити: у гістограмі їх тривалість - це час очікування змін
+app.add_middleware(MetricsMiddleware, service="discovery")
+
+class LeaseBatch(BaseModel):
+    lease_ids: List[str]
+
+class ReplicationBatch(BaseModel):
+    ops: List[dict]
+
+# Ендпоінти - async: реєстр у пам'яті, журнал - дописування рядка без fsync (heartbeat-и
+# взагалі не пишуться), тож виконуємо прямо в event loop, без переходу в thread pool
 
 @app.post("/register")
-def register(instance: ServiceInstance):
-    # Якщо сервіс ще не в реєстрі, створюємо список
-    if instance.name not in registry:
-        registry[instance.name] = []
-    
-    # Видаляємо старий запис, якщо такий хост:порт вже є (оновлення)
-    registry[instance.name] = [
-        s for s in registry[instance.name] 
-        if not (s.host == instance.host and s.port == instance.port)
-    ]
-    
-    instance.last_heartbeat = time.time()
-    registry[instance.name].append(instance)
-    print(f"Registered: {instance.name} at {instance.host}:{instance.port}")
-    return {"status": "registered"}
+async def register(instance: ServiceInstance):
+    # Повторна реєстрація того ж хост:порт = heartbeat
+    lease_id, created = registry.upsert(instance)
+    if created:
+        print(f"Registered: {instance.name} at {instance.host}:{instance.port} ({instance.instance_id})")
+    return {"status": "registered", "lease_id": lease_id, "ttl": registry.ttl}
+
+@app.put("/leases/{lease_id}")
+async def renew_lease(lease_id: str):
+    if registry.renew([lease_id]):
+        raise HTTPException(status_code=404, detail="Lease not found")
+    return {"status": "renewed"}
+
+@app.post("/leases/renew")
+async def renew_leases(batch: LeaseBatch):
+    """Пакетний heartbeat: один запит на всі інстанси процесу/хоста"""
+    return {"unknown": registry.renew(batch.lease_ids)}
+
+@app.delete("/leases/{lease_id}")
+async def release_lease(lease_id: str):
+    if not registry.release(lease_id):
+        raise HTTPException(status_code=404, detail="Lease not found")
+    return {"status": "deregistered"}
+
+@app.post("/replicate")
+async def replicate(batch: ReplicationBatch):
+    for op in batch.ops:
+        registry.apply(op)
+    return {"status": "ok", "applied": len(batch.ops)}
+
+@app.get("/replicate/snapshot")
+async def replication_snapshot():
+    return registry.dump()
 
 @app.get("/services/{name}")
-def get_service(name: str):
-    # Повертаємо тільки "живі" сервіси (тайм-аут 30 сек)
-    current_time = time.time()
-    if name not in registry:
+async def get_service(name: str):
+    # Повертаємо тільки "живі" сервіси (прострочені прибирає reaper)
+    if not registry.known(name):
         raise HTTPException(status_code=404, detail="Service not found")
     
-    alive_instances = [
-        s for s in registry[name] 
-        if current_time - s.last_heartbeat < 30
-    ]
-    
+    alive_instances = registry.live(name)
     if not alive_instances:
         raise HTTPException(status_code=503, detail="No instances available")
         
     return alive_instances
 
+@app.get("/services/{name}/watch")
+async def watch_service(name: str, index: int = 0, wait: float = 30.0):
+    """
+    Long-poll: відповідає, щойно склад сервісу зміниться після `index`
+    (або через `wait` секунд без змін). Клієнт передає отриманий `index` у наступний виклик.
+    """
+    await registry.wait(index, name, min(wait, WATCH_MAX_WAIT))
+    return {
+        "index": registry.service_index(name),
+        "instances": registry.live(name),
+        "events": registry.events_since(index, name),
+    }
+
+@app.get("/watch")
+async def watch_all(request: Request):
+    """SSE-потік усіх змін реєстру; відновлення з `Last-Event-ID`"""
+    last = int(request.headers.get("last-event-id", registry.index))
+
+    async def stream():
+        nonlocal last
+        while True:
+            if not await registry.wait(last, timeout=SSE_KEEPALIVE):
+                yield ": keep-alive\n\n"
+                continue
+            events = registry.events_since(last)
+            if events is None:
+                # Клієнт відстав більше, ніж тримає журнал -> нехай перечитає знімки
+                yield f"id: {registry.index}\nevent: resync\ndata: {{}}\n\n"
+                last = registry.index
+                continue
+            for e in events:
+                yield f"id: {e['index']}\nevent: {e['type']}\ndata: {json.dumps(e['instance'])}\n\n"
+                last = e["index"]
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Discovery Service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--data-dir", help="зберігати реєстр на диску (журнал + знімки)")
+    parser.add_argument("--peers", default="", help="інші вузли через кому, напр. http://127.0.0.1:8010")
+    args = parser.parse_args()
+    DATA_DIR = args.data_dir
+    PEERS = [p.strip().rstrip("/") for p in args.peers.split(",") if p.strip()]
+    uvicorn.run(app, host=args.host, port=args.port)
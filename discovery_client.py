@@ -0,0 +1,220 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from cache import Coalescer
+from metrics import DISCOVERY_LOOKUP
+
+
+class ServiceUnavailable(Exception):
+    """Немає жодного відомого інстансу сервісу (і Discovery не відповів)"""
+
+
+WATCH_WAIT = 30.0       # секунд long-poll на один watch-запит
+WATCH_MAX_BACKOFF = 10.0
+# Інстанс, що не відповів, не береться стільки секунд: Discovery показує його, поки не
+# спливе lease (INSTANCE_TTL = 30 с), і свіжий знімок інакше одразу повертав би його
+EXCLUDE_TTL = 30.0
+
+
+def split_urls(value) -> List[str]:
+    """DISCOVERY_URL може містити кілька вузлів через кому"""
+    if isinstance(value, str):
+        value = value.split(",")
+    return [u.strip().rstrip("/") for u in value if u.strip()]
+
+
+class _Snapshot:
+    def __init__(self, instances: List[dict]):
+        self.instances = instances
+        self.fetched_at = time.monotonic()
+        self.stale = False
+        self.watched = False  # оновлюється watch-ом -> TTL не застосовується
+
+
+class ServiceCache:
+    """
+    Локальний знімок інстансів з Discovery.
+    - знімок живе `ttl` секунд, потім оновлюється (у фоні або при зверненні)
+    - якщо Discovery недоступний, віддаємо останній вдалий знімок
+    - invalidate() прибирає інстанс, який не відповів, і позначає знімок застарілим;
+      на EXCLUDE_TTL секунд (host, port) відсіюється і з нових знімків
+    - з watch=True на кожен сервіс тримається long-poll до /services/{name}/watch:
+      знімок оновлюється лише коли склад змінився, і поки watch живий, не протухає
+    - кілька вузлів Discovery (через кому): при помилці переходимо на наступний
+    """
+
+    def __init__(self, discovery_url: str, ttl: float = 5.0, client: Optional[httpx.AsyncClient] = None,
+                 watch: bool = True):
+        self.discovery_url = discovery_url
+        self.ttl = ttl
+        self.watch = watch
+        self._client = client
+        self._own_client = client is None
+        self._snapshots: Dict[str, _Snapshot] = {}
+        self._refreshes = Coalescer()
+        self._task: Optional[asyncio.Task] = None
+        self._watchers: Dict[str, asyncio.Task] = {}
+        self._excluded: Dict[str, Dict[Tuple[str, int], float]] = {}  # сервіс -> (host, port) -> до коли
+        self.hits = self.misses = 0  # звернення, обслужені знімком / запитом до Discovery
+
+    @property
+    def discovery_url(self) -> str:
+        return self._urls[self._current]
+
+    @discovery_url.setter
+    def discovery_url(self, value):
+        self._urls = split_urls(value)
+        self._current = 0
+
+    def _failover(self):
+        self._current = (self._current + 1) % len(self._urls)
+
+    # --- Життєвий цикл ---
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=2.0)
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        for task in self._watchers.values():
+            task.cancel()
+        await asyncio.gather(*self._watchers.values(), return_exceptions=True)
+        self._watchers.clear()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._own_client and self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def _refresh_loop(self):
+        # Фонове оновлення всіх відомих сервісів до того, як їх знімок протухне
+        while True:
+            await asyncio.sleep(self.ttl / 2)
+            for name, snap in list(self._snapshots.items()):
+                if snap.watched:
+                    continue
+                try:
+                    await self.refresh(name)
+                except ServiceUnavailable:
+                    pass
+
+    # --- Доступ до знімка ---
+    async def get_instances(self, name: str) -> List[dict]:
+        self._ensure_watch(name)
+        snap = self._snapshots.get(name)
+        if snap and not snap.stale and (snap.watched or time.monotonic() - snap.fetched_at < self.ttl):
+            self.hits += 1
+            return self._live(name, snap.instances)
+        self.misses += 1
+        try:
+            return self._live(name, await self.refresh(name))
+        except ServiceUnavailable:
+            # Discovery лежить -> працюємо з останнім відомим знімком
+            if snap and snap.instances:
+                return self._live(name, snap.instances)
+            raise
+
+    def _live(self, name: str, instances: List[dict]) -> List[dict]:
+        """Без інстансів, що нещодавно не відповіли (якщо лишився хоч один інший)"""
+        excluded = self._excluded.get(name)
+        if not excluded:
+            return instances
+        now = time.monotonic()
+        for addr in [addr for addr, until in excluded.items() if until <= now]:
+            del excluded[addr]
+        live = [i for i in instances if (i["host"], i["port"]) not in excluded]
+        return live or instances
+
+    async def refresh(self, name: str) -> List[dict]:
+        """
+        Один запит до Discovery на сервіс, навіть якщо звернень багато одночасно.
+        Лідера скасували (таймаут частини view) чи він впав -> очікувачі не зависають
+        """
+        return await self._refreshes.run(name, lambda: self._refresh(name))
+
+    async def _refresh(self, name: str) -> List[dict]:
+        instances = await self._fetch(name)
+        self.apply(name, instances)
+        return instances
+
+    async def _fetch(self, name: str) -> List[dict]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=2.0)
+        for _ in range(len(self._urls)):
+            started = time.perf_counter()
+            try:
+                resp = await self._client.get(f"{self.discovery_url}/services/{name}")
+            except httpx.RequestError:
+                DISCOVERY_LOOKUP.observe(time.perf_counter() - started, name, "error")
+                self._failover()
+                continue
+            DISCOVERY_LOOKUP.observe(time.perf_counter() - started, name, str(resp.status_code))
+            if resp.status_code != 200:
+                raise ServiceUnavailable(f"Service '{name}' unavailable")
+            try:
+                return resp.json()
+            except ValueError:
+                raise ServiceUnavailable(f"Invalid response from Discovery for '{name}'")
+        raise ServiceUnavailable("Discovery Service unavailable")
+
+    def apply(self, name: str, instances: List[dict], watched: bool = False):
+        """Записує свіжий список інстансів (з відповіді Discovery або з watch-події)"""
+        old = self._snapshots.get(name)
+        snap = self._snapshots[name] = _Snapshot(instances)
+        # Звичайний refresh не скасовує живий watch
+        snap.watched = watched or (old is not None and old.watched)
+
+    # --- Watch ---
+    def _ensure_watch(self, name: str):
+        if not self.watch or self._task is None or name in self._watchers:
+            return
+        self._watchers[name] = asyncio.create_task(self._watch_loop(name))
+
+    async def _watch_loop(self, name: str):
+        index = 0
+        backoff = 1.0
+        while True:
+            try:
+                resp = await self._client.get(
+                    f"{self.discovery_url}/services/{name}/watch",
+                    params={"index": index, "wait": WATCH_WAIT},
+                    timeout=WATCH_WAIT + 5.0,
+                )
+                resp.raise_for_status()
+                data = resp.json()
+                new_index, instances = data["index"], data["instances"]
+            except (httpx.HTTPError, ValueError, KeyError, TypeError):
+                # Watch недоступний -> знімок знову живе за TTL, пробуємо пізніше
+                snap = self._snapshots.get(name)
+                if snap:
+                    snap.watched = False
+                index = 0  # інший вузол / перезапуск Discovery -> своя нумерація
+                self._failover()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, WATCH_MAX_BACKOFF)
+                continue
+            backoff = 1.0
+            if new_index != index or name not in self._snapshots or not self._snapshots[name].watched:
+                self.apply(name, instances, watched=True)
+            index = new_index
+
+    def invalidate(self, name: str, host: Optional[str] = None, port: Optional[int] = None):
+        snap = self._snapshots.get(name)
+        if not snap:
+            return
+        if host is not None:
+            self._excluded.setdefault(name, {})[(host, port)] = time.monotonic() + EXCLUDE_TTL
+            rest = [i for i in snap.instances if not (i["host"] == host and i["port"] == port)]
+            # Останній інстанс не викидаємо: краще спробувати його ще раз, ніж 503
+            if rest:
+                snap.instances = rest
+        snap.stale = True
+        snap.watched = False
@@ -1,26 +1,504 @@
 import uvicorn
-from fastapi import FastAPI, Request, HTTPException, Response
+from fastapi import FastAPI, Request, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple, Union
+import asyncio
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import time
 import httpx
-import random
 
-app = FastAPI(title="API Gateway")
+from admission import AdaptiveLimit, RateLimiter
+from cache import Coalescer
+from discovery_client import ServiceCache, ServiceUnavailable
+from http_cache import CACHE_CONTROL, CachedResponse, ResponseCache, etag_matches, not_modified
+from listing import NEXT_CURSOR_HEADER
+from load_balancer import StatsRegistry, instance_key, make_balancer
+from metrics import ROUTE_SCOPE_KEY, UPSTREAM_DURATION, MetricsMiddleware, gauge_callback, trace_headers, watch_cache
+from resilience import RetryBudget
 
-DISCOVERY_URL = "http://127.0.0.1:8000"
+# Адреса і кількість воркерів - з оточення (launcher.py)
+GATEWAY_HOST = os.environ.get("GATEWAY_HOST", "127.0.0.1")
+GATEWAY_PORT = int(os.environ.get("GATEWAY_PORT", 8080))
+# >1 -> воркери uvicorn на одному порту; кеші, breaker-и і rate limit у кожного свої
+GATEWAY_WORKERS = int(os.environ.get("GATEWAY_WORKERS", 1))
+DISCOVERY_URL = os.environ.get("DISCOVERY_URL", "http://127.0.0.1:8000")
+DISCOVERY_CACHE_TTL = 5.0  # секунд, скільки живе локальний знімок інстансів
 
-async def get_service_url(service_name: str) -> str:
-    """Запитує у Discovery адресу сервісу"""
-    async with httpx.AsyncClient() as client:
+# --- Пул з'єднань до бекендів ---
+POOL_MAX_CONNECTIONS = 200      # на один upstream-сервіс
+POOL_MAX_KEEPALIVE = 50         # скільки простоюючих з'єднань тримаємо відкритими
+KEEPALIVE_EXPIRY = 30.0         # секунд до закриття простоюючого з'єднання
+HTTP2 = False                   # потребує пакета h2 (pip install "httpx[http2]") і TLS на бекенді
+CONNECT_TIMEOUT = 2.0
+DEFAULT_TIMEOUT = 10.0
+# schedule-service сам ходить у class-service, тому йому даємо більше часу
+UPSTREAM_TIMEOUTS = {
+    "class-service": 5.0,
+    "teacher-service": 5.0,
+    "schedule-service": 10.0,
+}
+
+# Повтори на іншому інстансі: лише GET (єдиний безпечний метод, який приймає proxy) і в межах бюджету маршруту
+RETRY_ATTEMPTS = 2                      # усього спроб на запит (1 = без повторів)
+RETRY_METHODS = frozenset({"GET"})
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+# Admission control:
+# - token bucket на маршрут (`rate_limit` у service_map) і на клієнта -> 429 + Retry-After
+# - адаптивний (AIMD) ліміт одночасних запитів до кожного upstream-сервісу -> швидкий 503
+RATE_LIMITING = True
+CLIENT_RATE_LIMIT = (50.0, 100.0)       # (запитів/с, burst) на одного клієнта в межах маршруту
+# Клієнт = IP з'єднання. X-Client-Id вирішує сам клієнт (новий ID - нове відро), тож
+# йому віримо лише за явним дозволом:
+# - GATEWAY_TRUST_CLIENT_ID=1 - від усіх (gateway лише за довіреним проксі, бенчмарк)
+# - GATEWAY_TRUSTED_PROXIES=ip1,ip2 - лише від цих адрес: наші фронтенди, за якими багато
+#   користувачів з однією IP. Напр. сервер дашборда (web_client.py шле ID сесії Streamlit):
+#   без цього всі його користувачі ділили б одне відро CLIENT_RATE_LIMIT
+# GET /views/school списує з відра клієнта один запит на весь view, а не по одному на частину
+CLIENT_ID_HEADER = "x-client-id"
+TRUST_CLIENT_ID = os.environ.get("GATEWAY_TRUST_CLIENT_ID", "").lower() in ("1", "true", "yes")
+TRUSTED_PROXIES = frozenset(a.strip() for a in os.environ.get("GATEWAY_TRUSTED_PROXIES", "").split(",") if a.strip())
+CONCURRENCY_LIMITS = True
+
+# Зведений GET /views/school: частини запитуються паралельно, кожна - зі своїм таймаутом
+VIEW_PART_TIMEOUT = 2.0                 # секунд; не встигла -> часткова відповідь без цієї частини
+VIEW_MAX_TIMEOUT = 10.0
+
+# Стрімінг тіл запиту/відповіді без буферизації (False -> старий режим)
+STREAMING = True
+
+# Кеш відповідей GET (LRU з лімітом пам'яті):
+# - маршрут з `cache_ttl` -> копія віддається без бекенду, поки свіжа
+# - інші маршрути -> копія з ETag, яку кожного разу перепитуємо через If-None-Match;
+#   на 304 тіло віддається з пам'яті - бекенд нічого не серіалізує і не шле
+# POST/PUT/DELETE через gateway скидають копії свого маршруту
+RESPONSE_CACHE = True
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_MAX_ENTRIES = 10000
+RESPONSE_CACHE_MAX_BODY = 1024 * 1024  # байт; більші відповіді просто стрімимо
+
+# Заголовки, які стосуються лише одного з'єднання і не мають йти далі (RFC 9110, 7.6.1)
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "proxy-connection", "te", "trailer", "transfer-encoding", "upgrade",
+})
+
+# Мапинг шляхів до імен сервісів в Discovery і стратегії балансування:
+#   round_robin | least_outstanding | p2c_ewma | consistent_hash
+# Для consistent_hash ключ береться з заголовка `hash_header` (або IP клієнта)
+# `cache_ttl` - секунд, скільки GET-відповідь маршруту береться з кешу gateway
+# `rate_limit` - (запитів/с, burst) на весь маршрут
+service_map = {
+    "classes": {"service": "class-service", "balancer": "p2c_ewma", "cache_ttl": 5.0, "rate_limit": (2000, 4000)},
+    "teachers": {"service": "teacher-service", "balancer": "p2c_ewma", "cache_ttl": 5.0, "rate_limit": (2000, 4000)},
+    "schedules": {"service": "schedule-service", "balancer": "least_outstanding", "rate_limit": (1000, 2000)},
+}
+
+service_cache = ServiceCache(DISCOVERY_URL, ttl=DISCOVERY_CACHE_TTL)
+upstream_clients: Dict[str, httpx.AsyncClient] = {}
+# Власна статистика gateway по кожному інстансу (спільна для всіх маршрутів)
+instance_stats = StatsRegistry()
+balancers = {
+    route: make_balancer(cfg["balancer"], instance_stats) for route, cfg in service_map.items()
+}
+retry_budgets = {route: RetryBudget() for route in service_map}
+rate_limiters = {route: RateLimiter(cfg.get("rate_limit"), CLIENT_RATE_LIMIT) for route, cfg in service_map.items()}
+view_rate_limiter = RateLimiter(None, CLIENT_RATE_LIMIT)  # GET /views/school: клієнт один раз на view
+
+def all_rate_limiters() -> Dict[str, RateLimiter]:
+    return {**rate_limiters, "views/school": view_rate_limiter}
+concurrency_limits = {cfg["service"]: AdaptiveLimit() for cfg in service_map.values()}
+# (маршрут, шлях, query, accept-encoding) -> CachedResponse
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRIES)
+coalescer = Coalescer()
+
+def make_upstream_client(service_name: str) -> httpx.AsyncClient:
+    """Довгоживучий клієнт з keep-alive пулом для одного upstream-сервісу"""
+    timeout = UPSTREAM_TIMEOUTS.get(service_name, DEFAULT_TIMEOUT)
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+        http2=HTTP2 and importlib.util.find_spec("h2") is not None,
+    )
+
+def get_upstream_client(service_name: str) -> httpx.AsyncClient:
+    client = upstream_clients.get(service_name)
+    if client is None:
+        client = upstream_clients[service_name] = make_upstream_client(service_name)
+    return client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for service_name in {cfg["service"] for cfg in service_map.values()}:
+        get_upstream_client(service_name)
+    await service_cache.start()
+    yield
+    await service_cache.stop()
+    for client in upstream_clients.values():
+        await client.aclose()
+    upstream_clients.clear()
+
+app = FastAPI(title="API Gateway", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware, service="gateway")
+
+watch_cache("gateway_response", lambda: (response_cache.hits, response_cache.misses + response_cache.revalidated))
+watch_cache("discovery_snapshot", lambda: (service_cache.hits, service_cache.misses))
+gauge_callback("upstream_in_flight", "Запити gateway, що зараз чекають на інстанс", ("instance",),
+               lambda: {(k, ): v["outstanding"] for k, v in instance_stats.snapshot().items()})
+gauge_callback("upstream_concurrency_limit", "Поточний адаптивний ліміт конкурентності", ("upstream",),
+               lambda: {(name, ): limit.limit for name, limit in concurrency_limits.items()})
+gauge_callback("upstream_shed_total", "Відмови 503 через ліміт конкурентності", ("upstream",),
+               lambda: {(name, ): limit.shed for name, limit in concurrency_limits.items()}, kind="counter")
+gauge_callback("gateway_rate_limited_total", "Відмови 429 через rate limit", ("route",),
+               lambda: {(route, ): limiter.rejected for route, limiter in all_rate_limiters().items()}, kind="counter")
+gauge_callback("gateway_retries_total", "Повтори на інший інстанс", ("route",),
+               lambda: {(route, ): budget.retries for route, budget in retry_budgets.items()}, kind="counter")
+
+async def pick_instance(route: str, key: Optional[str] = None, exclude: frozenset = frozenset()) -> Optional[dict]:
+    """
+    Бере інстанс з локального знімка Discovery за стратегією маршруту.
+    `exclude` - уже спробувані інстанси (для повтору); якщо інших немає -> None
+    """
+    service_name = service_map[route]["service"]
+    try:
+        instances = await service_cache.get_instances(service_name)
+    except ServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not instances:
+        raise HTTPException(status_code=503, detail=f"Service '{service_name}' unavailable")
+    if exclude:
+        instances = [i for i in instances if instance_key(i) not in exclude]
+        if not instances:
+            return None
+    return balancers[route].choose(instances, key)
+
+def balance_key(route: str, request: Request) -> Optional[str]:
+    cfg = service_map[route]
+    if cfg["balancer"] != "consistent_hash":
+        return None
+    header = cfg.get("hash_header")
+    if header and header in request.headers:
+        return request.headers[header]
+    return request.client.host if request.client else None
+
+def client_id(request: Request) -> str:
+    host = request.client.host if request.client else "-"
+    if (TRUST_CLIENT_ID or host in TRUSTED_PROXIES) and request.headers.get(CLIENT_ID_HEADER):
+        return request.headers[CLIENT_ID_HEADER]
+    return host
+
+def filter_headers(headers, drop=()) -> list:
+    """Прибирає hop-by-hop заголовки, у т.ч. перелічені в самому `Connection`"""
+    connection = {t.strip().lower() for t in headers.get("connection", "").split(",") if t.strip()}
+    skip = HOP_BY_HOP_HEADERS | connection | set(drop)
+    items = headers.multi_items() if hasattr(headers, "multi_items") else headers.items()
+    return [(k, v) for k, v in items if k.lower() not in skip]
+
+async def request_content(request: Request):
+    """Тіло для upstream: async-ітератор у режимі стрімінгу, інакше bytes"""
+    if not STREAMING:
+        return await request.body()
+    if "content-length" in request.headers or "transfer-encoding" in request.headers:
+        return request.stream()
+    return None
+
+async def relay(upstream_resp: httpx.Response, call):
+    """Сирі чанки upstream як є; запит "в польоті", поки тіло не віддане (або клієнт не відвалився)"""
+    try:
+        async for chunk in upstream_resp.aiter_raw():
+            yield chunk
+    finally:
+        await upstream_resp.aclose()
+        call.end()
+
+def passthrough_response(upstream_resp: httpx.Response, call) -> Response:
+    """Відповідь upstream повз кеш: стрімом (або цілим тілом, якщо STREAMING вимкнено)"""
+    if not STREAMING:
+        call.end()
+        # .content вже розпакований, тому довжину і кодування рахує Response
+        return Response(
+            content=upstream_resp.content,
+            status_code=upstream_resp.status_code,
+            headers=dict(filter_headers(upstream_resp.headers, drop=("content-length", "content-encoding", "date", "server")))
+        )
+
+    # Віддаємо чанки без розпакування, з'єднання повертається в пул після відповіді
+    response = StreamingResponse(relay(upstream_resp, call), status_code=upstream_resp.status_code)
+    # date/server додає сам uvicorn gateway, інакше вони задублюються
+    response.raw_headers = [
+        (k.encode("latin-1"), v.encode("latin-1"))
+        for k, v in filter_headers(upstream_resp.headers, drop=("date", "server"))
+    ]
+    return response
+
+def response_cache_key(root_path: str, path: str, request: Request) -> Optional[tuple]:
+    if not RESPONSE_CACHE or request.method != "GET":
+        return None
+    # тіло зберігаємо як є (можливо стиснене), тож кодування - частина ключа
+    return (root_path, path, request.url.query, request.headers.get("accept-encoding", ""))
+
+def storable(upstream_resp: httpx.Response) -> bool:
+    length = upstream_resp.headers.get("content-length")
+    return upstream_resp.status_code == 200 and length is not None and int(length) <= RESPONSE_CACHE_MAX_BODY
+
+def with_etag(headers: list, etag: Optional[str]) -> list:
+    """Тег клієнта прибираємо (його перевіряємо самі), замість нього - тег нашої копії"""
+    headers = [(k, v) for k, v in headers if k.lower() != "if-none-match"]
+    return headers + [("if-none-match", etag)] if etag else headers
+
+async def read_entry(upstream_resp: httpx.Response, call, ttl: float = 0.0) -> CachedResponse:
+    try:
+        body = b"".join([chunk async for chunk in upstream_resp.aiter_raw()]) if STREAMING else upstream_resp.content
+    finally:
+        await upstream_resp.aclose()
+        call.end()
+    drop = ("content-length", "date", "server") + (() if STREAMING else ("content-encoding",))
+    return CachedResponse(upstream_resp.status_code, filter_headers(upstream_resp.headers, drop=drop), body,
+                          upstream_resp.headers.get("etag"), ttl)
+
+async def send_upstream(root_path: str, path: str, headers: list, method: str = "GET",
+                        params=None, content=None, key: Optional[str] = None):
+    """
+    Інстанс за стратегією маршруту (`key` - для consistent_hash) + запит через спільний пул з'єднань
+    -> (відповідь, call). Помилка з'єднання чи 502/503/504 на GET -> ще одна спроба на іншому інстансі,
+    якщо дозволяє бюджет повторів маршруту. Хворі інстанси відсікає circuit breaker у балансувальнику.
+    """
+    service_name = service_map[root_path]["service"]
+    client = get_upstream_client(service_name)
+    budget = retry_budgets[root_path]
+    budget.deposit()
+    retryable = method in RETRY_METHODS
+    tried = set()
+    while True:
+        instance = await pick_instance(root_path, key, exclude=frozenset(tried))
+        if instance is None:  # поки чекали, інші інстанси зникли зі знімка
+            raise HTTPException(status_code=502, detail="Bad Gateway: Failed to connect to backend service")
+        tried.add(instance_key(instance))
+        limit = concurrency_limits[service_name] if CONCURRENCY_LIMITS else None
+        if limit is not None and not limit.try_acquire():
+            # Бекенд уже на межі: швидка відмова замість черги, що лише росте
+            raise HTTPException(status_code=503, detail=f"Service '{service_name}' overloaded",
+                                headers={"Retry-After": "1"})
+        upstream_req = client.build_request(
+            method=method,
+            url=f"http://{instance['host']}:{instance['port']}/{path}",
+            headers=headers,
+            content=content,
+            params=params
+        )
+        call = instance_stats.begin(instance)
+        started = time.perf_counter()
+        overloaded = False
         try:
-            resp = await client.get(f"{DISCOVERY_URL}/services/{service_name}")
-            if resp.status_code != 200:
-                raise HTTPException(status_code=503, detail=f"Service '{service_name}' unavailable")
-            
-            instances = resp.json()
-            # Простий Load Balancing (Random)
-            target = random.choice(instances)
-            return f"http://{target['host']}:{target['port']}"
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Discovery Service unavailable")
+            upstream_resp = await client.send(upstream_req, stream=STREAMING)
+            overloaded = upstream_resp.status_code == 503
+            UPSTREAM_DURATION.observe(time.perf_counter() - started, service_name, str(upstream_resp.status_code))
+        except httpx.RequestError as e:
+            overloaded = isinstance(e, httpx.TimeoutException)
+            UPSTREAM_DURATION.observe(time.perf_counter() - started, service_name, "error")
+            call.record(ok=False)
+            call.end()
+            # Інстанс не відповідає -> прибираємо його з локального знімка
+            service_cache.invalidate(service_name, instance["host"], instance["port"])
+            if await can_retry(root_path, retryable, tried):
+                continue
+            raise HTTPException(status_code=502, detail="Bad Gateway: Failed to connect to backend service")
+        except asyncio.CancelledError:
+            call.end()  # таймаут частини view / клієнт пішов: інакше запит лишиться "в польоті" назавжди
+            raise
+        finally:
+            if limit is not None:
+                limit.release(time.perf_counter() - started, overloaded)
+        call.record(ok=upstream_resp.status_code < 500)
+        if upstream_resp.status_code in RETRY_STATUSES and await can_retry(root_path, retryable, tried):
+            await upstream_resp.aclose()
+            call.end()
+            continue
+        return upstream_resp, call
+
+async def can_retry(root_path: str, retryable: bool, tried: set) -> bool:
+    if not retryable or len(tried) >= RETRY_ATTEMPTS:
+        return False
+    # Повтор лише на інший інстанс: якщо його немає, бюджет не витрачаємо
+    instances = await service_cache.get_instances(service_map[root_path]["service"])
+    if all(instance_key(i) in tried for i in instances):
+        return False
+    return retry_budgets[root_path].try_withdraw()
+
+async def get_cached(root_path: str, path: str, params, headers: list, key: tuple,
+                     balance: Optional[str] = None) -> Union[CachedResponse, tuple]:
+    """
+    GET маршруту з `cache_ttl`: свіжа копія - без бекенду, промахи по одному ключу об'єднуються.
+    Тіло більше за RESPONSE_CACHE_MAX_BODY не кешується -> (відповідь, call) для стрімінгу, як без кешу
+    """
+    cached = response_cache.get(key)
+    if cached is not None and cached.fresh():
+        response_cache.hits += 1
+        return cached
+    passthrough: list = []
+    entry = await coalescer.run(key, lambda: fetch_fresh(root_path, path, params, headers, key, cached, balance,
+                                                         passthrough))
+    if entry is not None:
+        return entry
+    if passthrough:
+        return passthrough[0]  # лідер стрімить свою відповідь
+    # чекали на лідера, а його тіло в кеш не лягло -> свій запит повз кеш
+    return await send_upstream(root_path, path, with_etag(headers, None), params=params, key=balance)
+
+async def fetch_fresh(root_path: str, path: str, params, headers: list, key: tuple,
+                      stale: Optional[CachedResponse], balance: Optional[str] = None,
+                      passthrough: Optional[list] = None) -> Optional[CachedResponse]:
+    """
+    Промах TTL-кешу; через Coalescer на один ключ іде лише один такий запит.
+    Завелика відповідь не буферизується: (відповідь, call) -> `passthrough`, результат None
+    """
+    ttl = service_map[root_path]["cache_ttl"]
+    generation = response_cache.generation(root_path)
+    upstream_resp, call = await send_upstream(root_path, path, with_etag(headers, stale and stale.etag),
+                                              params=params, key=balance)
+    if stale is not None and upstream_resp.status_code == 304:
+        await upstream_resp.aclose()
+        call.end()
+        stale.refresh(ttl)
+        response_cache.revalidated += 1
+        return stale
+    response_cache.misses += 1
+    if upstream_resp.status_code == 200 and not storable(upstream_resp):
+        passthrough.append((upstream_resp, call))
+        return None
+    entry = await read_entry(upstream_resp, call, ttl)
+    if entry.status == 200:
+        response_cache.set(key, entry, generation)
+    return entry
+
+@app.get("/_gateway/cache")
+def cache_stats():
+    return {**response_cache.stats(), "coalesced": coalescer.coalesced}
+
+@app.get("/_gateway/instances")
+def upstream_stats():
+    """Стан інстансів (breaker-и), бюджети повторів, ліміти конкурентності і rate limiting"""
+    return {
+        "instances": instance_stats.snapshot(),
+        "retry_budgets": {route: budget.snapshot() for route, budget in retry_budgets.items()},
+        "concurrency_limits": {name: limit.snapshot() for name, limit in concurrency_limits.items()},
+        "rate_limited": {route: limiter.rejected for route, limiter in all_rate_limiters().items()},
+    }
+
+async def fetch_part(root_path: str, params: dict, headers: list) -> Tuple[list, Optional[str], Optional[str]]:
+    """
+    Один список для view -> (записи, курсор наступної сторінки, ETag); іде тим самим шляхом, що й proxy:
+    TTL-кеш або збережена копія, яку перепитуємо в бекенду через If-None-Match
+    """
+    query = httpx.QueryParams(params)
+    key = (root_path, root_path, str(query), "identity") if RESPONSE_CACHE else None
+    if key is not None and service_map[root_path].get("cache_ttl"):
+        entry = await get_cached(root_path, root_path, query, headers, key)
+        if not isinstance(entry, CachedResponse):
+            entry = await read_entry(*entry)  # view однаково потрібне все тіло; у кеш не кладемо
+    else:
+        cached = response_cache.get(key) if key else None
+        generation = response_cache.generation(root_path)
+        upstream_resp, call = await send_upstream(root_path, root_path, with_etag(headers, cached and cached.etag),
+                                                  params=query)
+        if cached is not None and upstream_resp.status_code == 304:
+            await upstream_resp.aclose()
+            call.end()
+            response_cache.revalidated += 1
+            entry = cached
+        else:
+            cacheable = key is not None and "etag" in upstream_resp.headers and storable(upstream_resp)
+            entry = await read_entry(upstream_resp, call)
+            if cacheable:
+                response_cache.misses += 1
+                response_cache.set(key, entry, generation)
+    if entry.status != 200:
+        raise HTTPException(status_code=502, detail=f"upstream status {entry.status}")
+    return json.loads(entry.body), httpx.Headers(entry.headers).get(NEXT_CURSOR_HEADER), entry.etag
+
+def view_etag(name: str, params: dict, etags: List[Optional[str]]) -> Optional[str]:
+    """ETag зібраної відповіді - з ETag частин і параметрів запиту; хоч одна частина без тегу -> None"""
+    if not all(etags):
+        return None
+    digest = hashlib.sha1(json.dumps([sorted(params.items()), etags]).encode()).hexdigest()[:16]
+    return f'"{name}-{digest}"'
+
+def describe_error(error: BaseException) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, HTTPException):
+        return f"{error.status_code}: {error.detail}"
+    return repr(error)
+
+@app.get("/views/school")
+async def school_view(
+    request: Request,
+    classId: Optional[int] = None,
+    day: Optional[str] = None,
+    limit: Optional[int] = None,
+    after: Optional[int] = None,
+    timeout: float = Query(VIEW_PART_TIMEOUT, gt=0, le=VIEW_MAX_TIMEOUT),
+):
+    """
+    Усе для екрана дашборда одним запитом: класи, вчителі і сторінка розкладу
+    (фільтри і курсор - як у GET /schedules). Частини йдуть паралельно, кожна зі своїм
+    таймаутом, тож час відповіді - найповільніша частина, а не сума всіх.
+    className у розкладі береться зі щойно отриманих класів (join на боці gateway).
+    Частина не встигла / впала -> її поле null, причина в `errors`; впали всі -> 503.
+    Повна відповідь має ETag, зібраний з ETag частин: If-None-Match з ним -> 304.
+    """
+    headers = [("accept-encoding", "identity"), *trace_headers().items()]
+    schedule_params = {k: v for k, v in {"classId": classId, "day": day, "limit": limit, "after": after}.items()
+                       if v is not None}
+    parts = {"classes": {}, "teachers": {}, "schedules": schedule_params}
+    if RATE_LIMITING:
+        retry_after = view_rate_limiter.check(client_id(request))
+        if retry_after is not None:
+            raise HTTPException(status_code=429, detail="Too Many Requests",
+                                headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    async def part(root_path: str, params: dict):
+        # клієнта вже списано за весь view, частини - лише бакети маршрутів
+        if RATE_LIMITING and rate_limiters[root_path].check(None) is not None:
+            raise HTTPException(status_code=429, detail="Too Many Requests")
+        return await asyncio.wait_for(fetch_part(root_path, params, headers), timeout)
+
+    results = await asyncio.gather(*(part(r, p) for r, p in parts.items()), return_exceptions=True)
+    view: Dict[str, Optional[List[dict]]] = {}
+    errors: Dict[str, str] = {}
+    etags: List[Optional[str]] = []
+    next_cursor = None
+    for name, result in zip(parts, results):
+        if isinstance(result, BaseException):
+            view[name] = None
+            errors[name] = describe_error(result)
+            etags.append(None)
+        else:
+            view[name], cursor, etag = result
+            etags.append(etag)
+            if name == "schedules" and cursor is not None:
+                next_cursor = int(cursor)
+    # Частини не змінились -> клієнт отримує 304 замість тіла (часткова відповідь тегу не має)
+    etag = view_etag("school", schedule_params, etags)
+    if etag is not None and etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    if view["classes"] is not None and view["schedules"] is not None:
+        names = {c["id"]: c["name"] for c in view["classes"]}
+        for schedule in view["schedules"]:
+            schedule["className"] = names.get(schedule["classId"], schedule.get("className"))
+    status = 503 if len(errors) == len(parts) else 200
+    return JSONResponse({**view, "next_cursor": next_cursor, "partial": bool(errors), "errors": errors},
+                        status_code=status,
+                        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL} if etag is not None else None)
 
 @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
 async def proxy(path: str, request: Request):
@@ -36,37 +514,51 @@ async def proxy(path: str, request: Request):
     
     root_path = path_parts[0] # classes, teachers або schedules
     
-    # Мапинг шляхів до імен сервісів в Discovery
-    service_map = {
-        "classes": "class-service",
-        "teachers": "teacher-service",
-        "schedules": "schedule-service"
-    }
-    
-    service_name = service_map.get(root_path)
-    if not service_name:
+    route = service_map.get(root_path)
+    if not route:
         raise HTTPException(status_code=404, detail="Service route not found")
-        
-    base_url = await get_service_url(service_name)
-    target_url = f"{base_url}/{path}"
-    
-    # Проксування запиту
-    async with httpx.AsyncClient() as client:
-        try:
-            proxy_req = await client.request(
-                method=request.method,
-                url=target_url,
-                headers=request.headers, # Можна фільтрувати заголовки при потребі
-                content=await request.body(),
-                params=request.query_params
-            )
-            return Response(
-                content=proxy_req.content,
-                status_code=proxy_req.status_code,
-                headers=proxy_req.headers
-            )
-        except httpx.RequestError:
-             raise HTTPException(status_code=502, detail="Bad Gateway: Failed to connect to backend service")
+    request.scope[ROUTE_SCOPE_KEY] = f"/{root_path}"
+    if RATE_LIMITING:
+        retry_after = rate_limiters[root_path].check(client_id(request))
+        if retry_after is not None:
+            raise HTTPException(status_code=429, detail="Too Many Requests",
+                                headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    headers = filter_headers(request.headers, drop=("host",))
+    client_etag = request.headers.get("if-none-match")
+    key = response_cache_key(root_path, path, request)
+    balance = balance_key(root_path, request)
+    if key is not None and route.get("cache_ttl"):
+        entry = await get_cached(root_path, path, request.query_params, headers, key, balance)
+        if isinstance(entry, CachedResponse):
+            return entry.to_response(client_etag)
+        return passthrough_response(*entry)
+    cached = response_cache.get(key) if key else None
+    if cached is not None:
+        headers = with_etag(headers, cached.etag)
+
+    generation = response_cache.generation(root_path)
+    try:
+        upstream_resp, call = await send_upstream(root_path, path, headers, request.method, request.query_params,
+                                                  await request_content(request), balance)
+    finally:
+        # Запис через gateway -> копії цього маршруту вже можуть бути неактуальні
+        if request.method != "GET":
+            response_cache.invalidate(root_path)
+
+    if cached is not None and upstream_resp.status_code == 304:
+        await upstream_resp.aclose()
+        call.end()
+        response_cache.revalidated += 1
+        return cached.to_response(client_etag)
+    if key is not None and "etag" in upstream_resp.headers and storable(upstream_resp):
+        response_cache.misses += 1
+        entry = await read_entry(upstream_resp, call)
+        response_cache.set(key, entry, generation)
+        return entry.to_response(client_etag)
+    return passthrough_response(upstream_resp, call)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8080)
\ No newline at end of file
+    # кільком воркерам uvicorn потрібен шлях до app, щоб кожен імпортував модуль сам
+    uvicorn.run("gateway:app" if GATEWAY_WORKERS > 1 else app, host=GATEWAY_HOST, port=GATEWAY_PORT,
+                workers=GATEWAY_WORKERS)
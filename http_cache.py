@@ -0,0 +1,128 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from fastapi import Response
+
+# Клієнт може тримати копію, але перед використанням має перепитати (If-None-Match)
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(collection: str, version: int, epoch: str = "") -> str:
+    """epoch - коли version не переживає перезапуск процесу (memory), інакше та сама версія = інші дані"""
+    return f'"{collection}-{epoch}-{version}"' if epoch else f'"{collection}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match: "*" або список тегів через кому; порівняння слабке (RFC 9110, 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+class CachedResponse:
+    """Збережена відповідь upstream: тіло як є + заголовки (без hop-by-hop, date, server, content-length)"""
+
+    __slots__ = ("status", "headers", "body", "etag", "expires", "size")
+
+    def __init__(self, status: int, headers: List[Tuple[str, str]], body: bytes,
+                 etag: Optional[str], ttl: float = 0.0):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.expires = time.monotonic() + ttl
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers) + 200  # +накладні витрати
+
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires
+
+    def refresh(self, ttl: float):
+        """Бекенд підтвердив (304), що копія актуальна"""
+        self.expires = time.monotonic() + ttl
+
+    def to_response(self, if_none_match: Optional[str] = None) -> Response:
+        """304, якщо в клієнта та сама версія, інакше збережене тіло"""
+        raw_headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in self.headers]
+        if self.etag and self.status == 200 and etag_matches(if_none_match, self.etag):
+            response = Response(status_code=304)
+        else:
+            response = Response(content=self.body, status_code=self.status)
+            raw_headers.append((b"content-length", str(len(self.body)).encode()))
+        response.raw_headers = raw_headers
+        return response
+
+
+class ResponseCache:
+    """
+    LRU-кеш відповідей gateway з лімітом за розміром (байти), ключ - (маршрут, ...).
+    - invalidate(route) скидає всі записи маршруту (після POST/PUT/DELETE через gateway)
+    - generation(route) - лічильник інвалідацій: GET, що почався до запису,
+      не має права покласти в кеш свою (можливо, вже застарілу) відповідь
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int = 10000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.bytes = 0
+        self._data: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+        self._generations: Dict[Hashable, int] = {}
+        self.hits = self.misses = self.revalidated = self.invalidations = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key: tuple, entry: CachedResponse, generation: Optional[int] = None):
+        if generation is not None and generation != self.generation(key[0]):
+            return
+        if entry.size > self.max_bytes:
+            return
+        self.pop(key)
+        self._data[key] = entry
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes or len(self._data) > self.max_entries:
+            _, old = self._data.popitem(last=False)
+            self.bytes -= old.size
+            self.evictions += 1
+
+    def pop(self, key: tuple):
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.bytes -= old.size
+
+    def generation(self, route: Hashable) -> int:
+        return self._generations.get(route, 0)
+
+    def invalidate(self, route: Hashable):
+        self._generations[route] = self.generation(route) + 1
+        self.invalidations += 1
+        for key in [k for k in self._data if k[0] == route]:
+            self.pop(key)
+
+    def stats(self) -> dict:
+        """hits - віддано без бекенду, revalidated - після 304 від бекенду, misses - тіло з бекенду"""
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "revalidated": self.revalidated,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,168 @@
+"""
+Запуск усієї системи з кількома інстансами сервісів:
+
+    python launcher.py --instances class_service=2,schedule_service=3 --gateway-workers 2
+
+- Discovery і gateway - на звичних портах (8000 / 8080)
+- кожен інстанс сервісу - окремий процес (тобто окреме ядро) на своєму порту:
+  базовий порт сервісу + PORT_STRIDE * номер інстансу (8001, 8101, 8201, ...)
+- інстанс сам реєструється в Discovery з унікальним instance_id, а gateway
+  розподіляє між інстансами навантаження своїм балансувальником
+- інстанси одного сервісу бачать ті самі дані лише через спільне сховище, тож
+  для кількох інстансів STORAGE_BACKEND за замовчуванням sqlite (memory дало б
+  кожному процесу свою копію); конфіг передається через змінні оточення
+- інстанси schedule_service тримають кожен свої індекси розкладу (Timetable) і після
+  чужого запису дочитують лише змінені записи (storage changes_since): повне
+  перечитування - лише на старті інстансу або якщо він відстав більше ніж на
+  storage.CHANGES_KEEP версій
+- процес, що впав, перезапускається з паузою, що росте; Ctrl+C - зупинка всіх
+  (сервіси при цьому знімають свою реєстрацію)
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SERVICES = {"class_service": 8001, "teacher_service": 8002, "schedule_service": 8003}  # модуль -> базовий порт
+PORT_STRIDE = 100
+READY_TIMEOUT = 30.0
+MAX_RESTART_DELAY = 30.0
+STABLE_AFTER = 60.0   # стільки пропрацював -> пауза перед наступним перезапуском знову мінімальна
+
+
+class Process:
+    def __init__(self, name: str, args: List[str], env: Dict[str, str], port: int):
+        self.name = name
+        self.args = args
+        self.env = env
+        self.port = port
+        self.proc: Optional[subprocess.Popen] = None
+        self.started = 0.0
+        self.restart_at: Optional[float] = None
+        self.delay = 1.0
+
+    def start(self):
+        self.proc = subprocess.Popen([sys.executable, *self.args], cwd=ROOT, env=self.env)
+        self.started = time.monotonic()
+        self.restart_at = None
+
+    def check(self):
+        """Впав -> планує перезапуск; час настав -> перезапускає"""
+        now = time.monotonic()
+        if self.restart_at is not None:
+            if now >= self.restart_at:
+                print(f"[launcher] restarting {self.name}")
+                self.start()
+            return
+        code = self.proc.poll()
+        if code is None:
+            return
+        if now - self.started >= STABLE_AFTER:
+            self.delay = 1.0
+        print(f"[launcher] {self.name} exited with code {code}, restart in {self.delay:.0f}s")
+        self.restart_at = now + self.delay
+        self.delay = min(self.delay * 2, MAX_RESTART_DELAY)
+
+
+def wait_port(host: str, port: int, timeout: float = READY_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex((host, port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"{host}:{port} did not open in {timeout:.0f}s")
+
+
+def parse_instances(value: str) -> Dict[str, int]:
+    counts = dict.fromkeys(SERVICES, 1)
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        module, _, count = part.partition("=")
+        if module not in SERVICES or not count.isdigit():
+            raise argparse.ArgumentTypeError(f"expected <service>=<count>, service one of {', '.join(SERVICES)}")
+        counts[module] = int(count)
+    return counts
+
+
+def plan(args) -> List[Process]:
+    discovery_url = f"http://{args.host}:{args.discovery_port}"
+    env = {**os.environ, "DISCOVERY_URL": discovery_url}
+    if args.storage:
+        env["STORAGE_BACKEND"] = args.storage
+    if args.data_dir:
+        env["STORAGE_DIR"] = args.data_dir
+
+    processes = [Process("discovery", ["discovery.py", "--host", args.host, "--port", str(args.discovery_port)],
+                         env, args.discovery_port)]
+    for module, count in args.instances.items():
+        for i in range(count):
+            port = SERVICES[module] + PORT_STRIDE * i
+            service_env = {**env, "SERVICE_HOST": args.host, "SERVICE_PORT": str(port)}
+            processes.append(Process(f"{module}#{i + 1}", [f"{module}.py"], service_env, port))
+    gateway_env = {**env, "GATEWAY_HOST": args.host, "GATEWAY_PORT": str(args.gateway_port),
+                   "GATEWAY_WORKERS": str(args.gateway_workers)}
+    processes.append(Process("gateway", ["gateway.py"], gateway_env, args.gateway_port))
+    return processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discovery + gateway + N інстансів кожного сервісу")
+    parser.add_argument("--instances", type=parse_instances, default=parse_instances(""),
+                        help="напр. class_service=2,schedule_service=3 (решта - по одному)")
+    parser.add_argument("--gateway-workers", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--discovery-port", type=int, default=8000)
+    parser.add_argument("--gateway-port", type=int, default=8080)
+    parser.add_argument("--storage", choices=("memory", "sqlite", "log"),
+                        help="за замовчуванням - STORAGE_BACKEND з оточення, а для кількох інстансів sqlite")
+    parser.add_argument("--data-dir", help="каталог сховища (STORAGE_DIR)")
+    args = parser.parse_args()
+
+    scaled = [m for m, n in args.instances.items() if n > 1]
+    backend = args.storage or os.environ.get("STORAGE_BACKEND", "memory")
+    if scaled and backend == "memory":
+        if args.storage:
+            parser.error(f"memory storage is per process; {', '.join(scaled)} would not share data")
+        args.storage = "sqlite"
+        print("[launcher] several instances -> STORAGE_BACKEND=sqlite (shared between processes)")
+
+    processes = plan(args)
+    stopping = False
+
+    def shutdown(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        # Discovery - першим: інші процеси реєструються/читають з нього на старті
+        for process in processes:
+            if stopping:
+                break
+            process.start()
+            wait_port(args.host, process.port)
+            print(f"[launcher] {process.name} on {args.host}:{process.port} (pid {process.proc.pid})")
+        while not stopping:
+            for process in processes:
+                process.check()
+            time.sleep(0.5)
+    finally:
+        # у зворотному порядку: спершу gateway, Discovery - останнім (сервіси знімають реєстрацію)
+        for process in reversed(processes):
+            if process.proc and process.proc.poll() is None:
+                process.proc.send_signal(signal.SIGINT)
+                try:
+                    process.proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.proc.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import threading
+from typing import Callable, Hashable, List, Optional, Sequence, Set, Tuple, Type
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
+
+from cache import TTLCache
+from http_cache import CACHE_CONTROL, etag_matches, make_etag, not_modified
+
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+CACHED_RESPONSES = 64   # скільки різних списків (сторінка/фільтр/fields) тримаємо на одну версію
+
+
+def parse_fields(model: Type[BaseModel], fields: Optional[str]) -> Optional[Set[str]]:
+    """fields=id,name -> {"id", "name"}; невідоме поле -> 422"""
+    if not fields:
+        return None
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return wanted
+
+
+class ListCache:
+    """
+    Швидкий шлях для списків повз response_model.
+    Записи в репозиторії вже провалідовані, тож FastAPI не треба валідувати їх
+    вдруге: тіло серіалізується одним викликом pydantic-core (TypeAdapter.dump_json),
+    а готові байти кешуються за (версія колекції, параметри запиту).
+    Будь-який запис змінює version -> кеш скидається.
+    Версія (з epoch сховища) іде в ETag: якщо клієнт уже має цю версію (If-None-Match) -> 304 без тіла.
+    """
+
+    def __init__(self, model: Type[BaseModel], repo, maxsize: int = CACHED_RESPONSES):
+        self.model = model
+        self.repo = repo
+        self.collection = model.__name__.lower()
+        self._adapter = TypeAdapter(List[model])
+        self._cache = TTLCache(maxsize, ttl=float("inf"))
+        self._lock = threading.Lock()  # з файловим сховищем respond викликається з потоків (to_thread)
+        self._version = None
+
+    def stats(self) -> Tuple[int, int]:
+        """(hits, misses) кешу готових тіл"""
+        return self._cache.hits, self._cache.misses
+
+    def dump(self, items: Sequence[BaseModel], include: Optional[Set[str]] = None) -> bytes:
+        return self._adapter.dump_json(list(items), include={"__all__": include} if include else None)
+
+    def respond(self, key: Optional[Hashable], produce: Callable[[], Tuple[Sequence[BaseModel], Optional[int]]],
+                fields: Optional[str], if_none_match: Optional[str] = None) -> Response:
+        """
+        `produce()` -> (записи, курсор) викликається лише при промаху.
+        key=None - не кешувати (напр. довільні набори ids).
+        Тіло - список; курсор наступної сторінки - в заголовку X-Next-Cursor;
+        з `fields` лишаються тільки вибрані поля.
+        """
+        include = parse_fields(self.model, fields)
+        version = self.repo.version
+        etag = make_etag(self.collection, version, self.repo.epoch)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        entry = None
+        if key is not None:
+            cache_key = (key, frozenset(include) if include else None)
+            with self._lock:
+                if version != self._version:
+                    self._cache.clear()
+                    self._version = version
+                entry = self._cache.get(cache_key)
+        if entry is None:
+            items, next_cursor = produce()
+            entry = (self.dump(items, include), next_cursor)
+            if key is not None:
+                with self._lock:
+                    if version == self._version:
+                        self._cache.set(cache_key, entry)
+        body, next_cursor = entry
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if next_cursor is not None:
+            headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+        return Response(body, media_type="application/json", headers=headers)
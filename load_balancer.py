@@ -0,0 +1,195 @@
+import bisect
+import hashlib
+import itertools
+import math
+import random
+import time
+from typing import Dict, List, Optional, Sequence
+
+from resilience import CircuitBreaker
+
+# --- Налаштування ---
+EWMA_DECAY = 10.0             # секунд: наскільки швидко "забувається" стара латентність
+FAILURE_PENALTY = 1.0         # секунд: латентність, яку записуємо за невдалий запит
+VIRTUAL_NODES = 100           # точок на кільці на один інстанс (consistent hashing)
+
+
+def instance_key(instance: dict) -> str:
+    return f"{instance['host']}:{instance['port']}"
+
+
+class InstanceStats:
+    """Статистика gateway по одному інстансу: запити в польоті, EWMA латентності, помилки, breaker"""
+
+    __slots__ = ("outstanding", "ewma", "updated_at", "successes", "failures", "breaker")
+
+    def __init__(self):
+        self.outstanding = 0
+        self.ewma = 0.0
+        self.updated_at = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.breaker = CircuitBreaker()
+
+    def observe(self, latency: float, ok: bool):
+        now = time.monotonic()
+        if not ok:
+            latency = max(latency, FAILURE_PENALTY)
+        if self.updated_at == 0.0:
+            self.ewma = latency
+        else:
+            # Вага старого значення залежить від часу, що минув, а не від кількості запитів
+            w = math.exp(-(now - self.updated_at) / EWMA_DECAY)
+            self.ewma = self.ewma * w + latency * (1 - w)
+        self.updated_at = now
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+        self.breaker.record(ok)
+
+    def healthy(self) -> bool:
+        return self.breaker.available()
+
+
+class Call:
+    """Один запит до інстансу: begin -> record(ok) -> end"""
+
+    __slots__ = ("stats", "started", "recorded")
+
+    def __init__(self, stats: InstanceStats):
+        self.stats = stats
+        self.started = time.perf_counter()
+        self.recorded = False
+        stats.outstanding += 1
+        stats.breaker.on_begin()
+
+    def record(self, ok: bool):
+        """Латентність до першого байта відповіді (або до помилки)"""
+        if not self.recorded:
+            self.recorded = True
+            self.stats.observe(time.perf_counter() - self.started, ok)
+
+    def end(self):
+        self.stats.outstanding -= 1
+        if not self.recorded:
+            self.stats.breaker.release()
+
+
+class StatsRegistry:
+    def __init__(self):
+        self._stats: Dict[str, InstanceStats] = {}
+
+    def get(self, instance: dict) -> InstanceStats:
+        key = instance_key(instance)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = InstanceStats()
+        return stats
+
+    def begin(self, instance: dict) -> Call:
+        return Call(self.get(instance))
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {
+            k: {**{s: getattr(v, s) for s in InstanceStats.__slots__ if s != "breaker"}, "breaker": v.breaker.snapshot()}
+            for k, v in self._stats.items()
+        }
+
+
+class LoadBalancer:
+    """Базовий клас: відсікає нездорові інстанси, вибір робить підклас"""
+
+    def __init__(self, stats: StatsRegistry):
+        self.stats = stats
+
+    def choose(self, instances: Sequence[dict], key: Optional[str] = None) -> dict:
+        if not instances:
+            raise ValueError("no instances to choose from")
+        healthy = [i for i in instances if self.stats.get(i).healthy()]
+        # Якщо нездорові всі, краще спробувати хоч когось, ніж одразу 503
+        return self._choose(healthy or list(instances), key)
+
+    def _choose(self, instances: List[dict], key: Optional[str]) -> dict:
+        raise NotImplementedError
+
+
+class RoundRobin(LoadBalancer):
+    def __init__(self, stats: StatsRegistry):
+        super().__init__(stats)
+        self._counter = itertools.count()
+
+    def _choose(self, instances, key):
+        return instances[next(self._counter) % len(instances)]
+
+
+class LeastOutstanding(LoadBalancer):
+    def _choose(self, instances, key):
+        # random як tie-breaker, щоб при рівних значеннях не бити завжди в перший
+        return min(instances, key=lambda i: (self.stats.get(i).outstanding, random.random()))
+
+
+class PowerOfTwoEWMA(LoadBalancer):
+    """Два випадкові кандидати, перемагає менша EWMA * (запити в польоті + 1)"""
+
+    def _cost(self, instance: dict) -> float:
+        stats = self.stats.get(instance)
+        if stats.updated_at == 0.0:
+            # ще не пробували -> даємо шанс одному запиту; поки він не повернувся,
+            # рахуємо песимістично, щоб завислий інстанс не зібрав на себе весь трафік
+            return 0.0 if stats.outstanding == 0 else FAILURE_PENALTY * (stats.outstanding + 1)
+        return stats.ewma * (stats.outstanding + 1)
+
+    def _choose(self, instances, key):
+        if len(instances) == 1:
+            return instances[0]
+        a, b = random.sample(instances, 2)
+        return a if self._cost(a) <= self._cost(b) else b
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class ConsistentHash(LoadBalancer):
+    """Один і той самий ключ потрапляє на той самий інстанс, поки набір інстансів не зміниться"""
+
+    def __init__(self, stats: StatsRegistry, virtual_nodes: int = VIRTUAL_NODES):
+        super().__init__(stats)
+        self.virtual_nodes = virtual_nodes
+        self._ring_for: tuple = ()
+        self._points: List[int] = []
+        self._owners: List[dict] = []
+
+    def _build(self, instances: List[dict]):
+        ring = sorted(
+            (_hash(f"{instance_key(i)}#{n}"), idx)
+            for idx, i in enumerate(instances) for n in range(self.virtual_nodes)
+        )
+        self._points = [p for p, _ in ring]
+        self._owners = [instances[idx] for _, idx in ring]
+
+    def _choose(self, instances, key):
+        if key is None:
+            return random.choice(instances)
+        ring_for = tuple(sorted(instance_key(i) for i in instances))
+        if ring_for != self._ring_for:
+            self._build(instances)
+            self._ring_for = ring_for
+        idx = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[idx]
+
+
+STRATEGIES = {
+    "round_robin": RoundRobin,
+    "least_outstanding": LeastOutstanding,
+    "p2c_ewma": PowerOfTwoEWMA,
+    "consistent_hash": ConsistentHash,
+}
+
+
+def make_balancer(name: str, stats: StatsRegistry) -> LoadBalancer:
+    try:
+        return STRATEGIES[name](stats)
+    except KeyError:
+        raise ValueError(f"Unknown load balancing strategy '{name}'")
@@ -0,0 +1,239 @@
+"""
+Спільна інструментація для всіх застосунків (gateway, discovery, сервіси).
+
+    app.add_middleware(MetricsMiddleware, service=SERVICE_NAME)
+
+- гістограма тривалості запитів по маршруту (шаблон шляху, а не сам шлях) і статусу
+- кількість запитів у польоті
+- тривалість викликів upstream-ів і запитів до Discovery (observe з коду клієнтів)
+- частка влучань у кеші (watch_cache)
+- GET /metrics - усе це в текстовому форматі Prometheus
+- trace ID: береться з X-Request-Id (або генерується), доступний через trace_id /
+  trace_headers() для вихідних запитів і повертається клієнту в тому ж заголовку
+"""
+import bisect
+import os
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+TRACE_HEADER = "x-request-id"
+METRICS_PATH = "/metrics"
+ROUTE_SCOPE_KEY = "metrics.route"  # обробник може уточнити мітку route (gateway: маршрут замість catch-all)
+MAX_TRACE_ID = 128             # довші ID від клієнта ігноруємо і генеруємо свій
+TRACE_LOG = os.environ.get("TRACE_LOG") == "1"  # друкувати кожен запит з trace ID і тривалістю
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+
+def trace_headers() -> Dict[str, str]:
+    """Заголовки для вихідного запиту в межах поточного trace"""
+    value = trace_id.get()
+    return {TRACE_HEADER: value} if value else {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(name: str, labels: Sequence[str], values: Sequence[str], value: float) -> str:
+    if labels:
+        pairs = ",".join(f'{k}="{_escape(str(v))}"' for k, v in zip(labels, values))
+        return f"{name}{{{pairs}}} {value:g}"
+    return f"{name} {value:g}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict = {}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in self._items():
+            lines.append(_format(self.name, self.labels, values, value))
+        return lines
+
+    def _items(self):
+        return list(self._values.items())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Callback(Metric):
+    """Значення рахує сам компонент; fn() -> {(значення міток): число}, читається при скрейпі"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], fn: Callable[[], dict], kind: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.fn = fn
+        self.kind = kind
+
+    def _items(self):
+        return list(self.fn().items())
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        entry = self._values.get(labels)
+        if entry is None:
+            # [кількість у кожному кошику (+Inf останній), сума, кількість]
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        labels = self.labels + ("le",)
+        for values, (counts, total, count) in self._items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(_format(f"{self.name}_bucket", labels, values + (le,), cumulative))
+            lines.append(_format(f"{self.name}_sum", self.labels, values, total))
+            lines.append(_format(f"{self.name}_count", self.labels, values, count))
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        # повторна реєстрація (перезавантаження модуля, кілька app в одному процесі) замінює стару
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+default_registry = MetricsRegistry()
+
+REQUEST_DURATION = default_registry.register(Histogram(
+    "http_request_duration_seconds", "Тривалість обробки вхідних запитів", ("method", "route", "status")))
+IN_FLIGHT = default_registry.register(Gauge("http_requests_in_flight", "Вхідні запити, що зараз обробляються"))
+UPSTREAM_DURATION = default_registry.register(Histogram(
+    "upstream_request_duration_seconds", "Тривалість запитів до інших сервісів (до заголовків відповіді)",
+    ("upstream", "status")))
+DISCOVERY_LOOKUP = default_registry.register(Histogram(
+    "discovery_lookup_duration_seconds", "Тривалість запитів до Discovery за списком інстансів",
+    ("service", "result")))
+
+# назва кешу -> fn() -> (hits, misses)
+_caches: Dict[str, Callable[[], Tuple[int, int]]] = {}
+
+
+def watch_cache(name: str, stats: Callable[[], Tuple[int, int]]):
+    """Додає кеш у /metrics: cache_hits_total, cache_misses_total, cache_hit_ratio"""
+    _caches[name] = stats
+
+
+def _cache_values(pick: Callable[[int, int], float]) -> Callable[[], dict]:
+    return lambda: {(name, ): pick(*stats()) for name, stats in _caches.items()}
+
+
+default_registry.register(Callback("cache_hits_total", "Влучання в кеш", ("cache",),
+                                   _cache_values(lambda h, m: h), kind="counter"))
+default_registry.register(Callback("cache_misses_total", "Промахи кешу", ("cache",),
+                                   _cache_values(lambda h, m: m), kind="counter"))
+default_registry.register(Callback("cache_hit_ratio", "Частка влучань від усіх звернень", ("cache",),
+                                   _cache_values(lambda h, m: round(h / (h + m), 4) if h + m else 0.0)))
+
+
+def gauge_callback(name: str, help: str, labels: Sequence[str], fn: Callable[[], dict], kind: str = "gauge"):
+    """Метрика, значення якої читаються зі стану компонента при кожному скрейпі"""
+    default_registry.register(Callback(name, help, labels, fn, kind))
+
+
+class MetricsMiddleware:
+    """
+    Чистий ASGI-middleware (без BaseHTTPMiddleware, щоб не ламати стрімінг):
+    час рахується до кінця відповіді, включно з тілом, що стрімиться.
+    /metrics обслуговується тут же, до маршрутизації (у gateway є catch-all маршрут).
+    """
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["path"] == METRICS_PATH and scope["method"] == "GET":
+            await self._metrics(send)
+            return
+
+        raw = dict(scope["headers"]).get(TRACE_HEADER.encode())
+        if raw and len(raw) <= MAX_TRACE_ID:
+            current = raw.decode("latin-1")
+        else:
+            current = uuid.uuid4().hex
+            # кладемо згенерований ID у заголовки запиту, щоб gateway передав його далі як є
+            headers = [(k, v) for k, v in scope["headers"] if k != TRACE_HEADER.encode()]
+            scope = {**scope, "headers": headers + [(TRACE_HEADER.encode(), current.encode())]}
+        token = trace_id.set(current)
+        status = 500
+
+        async def send_traced(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # upstream міг повернути свій ID (або кешована відповідь - чужий) -> завжди наш
+                headers = [(k, v) for k, v in message.get("headers", ()) if k.lower() != TRACE_HEADER.encode()]
+                headers.append((TRACE_HEADER.encode(), current.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        started = time.perf_counter()
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            IN_FLIGHT.dec()
+            elapsed = time.perf_counter() - started
+            route = scope.get(ROUTE_SCOPE_KEY) or getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_DURATION.observe(elapsed, scope["method"], route, str(status))
+            if TRACE_LOG:
+                print(f"trace={current} {self.service} {scope['method']} {scope['path']} {status} {elapsed * 1000:.1f}ms")
+            trace_id.reset(token)
+
+    async def _metrics(self, send):
+        body = default_registry.render().encode()
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/plain; version=0.0.4; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,107 @@
+import asyncio
+import random
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from discovery_client import split_urls
+
+HEARTBEAT_INTERVAL = 10.0   # секунд між продовженнями lease (TTL у Discovery - 30 с)
+MAX_BACKOFF = 30.0          # стеля для паузи, коли Discovery недоступний
+
+
+class RegistrationAgent:
+    """
+    Реєструє інстанси процесу в Discovery і тримає їх lease-и живими.
+    - один пакетний запит /leases/renew на всі інстанси
+    - lease зник (Discovery перезапустився, інстанс прострочився) -> перереєстрація
+    - Discovery недоступний -> експоненційна пауза з jitter
+    - stop() знімає реєстрацію, щоб gateway одразу перестав слати сюди трафік
+    - кілька вузлів Discovery (через кому): при помилці переходимо на наступний,
+      lease-и між вузлами реплікуються
+    """
+
+    def __init__(self, discovery_url: str, interval: float = HEARTBEAT_INTERVAL):
+        self._urls = split_urls(discovery_url)
+        self._current = 0
+        self.interval = interval
+        self._instances: List[dict] = []
+        self._leases: Dict[Tuple[str, str, int], str] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def discovery_url(self) -> str:
+        return self._urls[self._current]
+
+    def add(self, name: str, host: str, port: int, instance_id: Optional[str] = None):
+        # ID унікальний для кожного запуску: Discovery відрізняє перезапущений процес на тому ж порту
+        instance_id = instance_id or f"{name}-{uuid.uuid4().hex[:12]}"
+        self._instances.append({"name": name, "host": host, "port": port, "instance_id": instance_id})
+
+    async def start(self):
+        self._client = httpx.AsyncClient(timeout=5.0)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client:
+            for lease_id in list(self._leases.values()):
+                try:
+                    await self._client.delete(f"{self.discovery_url}/leases/{lease_id}", timeout=1.0)
+                except httpx.HTTPError:
+                    pass  # Discovery сам прибере після TTL
+            self._leases.clear()
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        failures = 0
+        while True:
+            try:
+                fresh = await self._register_missing()
+                await self._renew(exclude=fresh)
+                failures = 0
+                # невеликий jitter, щоб інстанси, запущені разом, не били в Discovery синхронно
+                delay = self.interval * random.uniform(0.9, 1.1)
+            except Exception as e:
+                # не лише HTTPError: відповідь не JSON чи без полів теж не має тихо зупинити задачу,
+                # інакше heartbeat-ів більше не буде, а сервіс працюватиме далі (CancelledError - не Exception)
+                if failures == 0:
+                    print(f"Discovery unavailable ({e!r}), retrying with back-off")
+                failures += 1
+                self._current = (self._current + 1) % len(self._urls)
+                # "full jitter": випадкова пауза до поточної стелі
+                delay = random.uniform(0, min(MAX_BACKOFF, 2 ** failures))
+            await asyncio.sleep(delay)
+
+    async def _register_missing(self) -> set:
+        fresh = set()
+        for inst in self._instances:
+            key = (inst["name"], inst["host"], inst["port"])
+            if key in self._leases:
+                continue
+            resp = await self._client.post(f"{self.discovery_url}/register", json=inst)
+            resp.raise_for_status()
+            self._leases[key] = resp.json()["lease_id"]
+            fresh.add(key)
+        return fresh
+
+    async def _renew(self, exclude: set = frozenset()):
+        lease_ids = [v for k, v in self._leases.items() if k not in exclude]
+        if not lease_ids:
+            return
+        resp = await self._client.post(f"{self.discovery_url}/leases/renew", json={"lease_ids": lease_ids})
+        resp.raise_for_status()
+        unknown = set(resp.json()["unknown"])
+        if unknown:
+            # Ці lease-и Discovery вже забув -> перереєструємо одразу, не чекаючи інтервалу
+            self._leases = {k: v for k, v in self._leases.items() if v not in unknown}
+            await self._register_missing()
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Dict, List, Optional
+
+import httpx
+
+COMPACT_EVERY = 1000          # записів у журналі, після яких пишемо новий знімок
+REPLICATION_INTERVAL = 0.2    # секунд між пакетами реплікації
+REPLICATION_BACKLOG = 10000   # скільки операцій тримаємо для недоступного піра
+REPLICATION_BATCH = 500
+
+
+class RegistryLog:
+    """
+    Персистентність реєстру: append-only журнал операцій + періодичний знімок.
+    registry.snapshot.json - стан на момент компактизації,
+    registry.log           - JSON-рядки операцій після нього (upsert / release / expire).
+    Heartbeat-и (renew) не пишемо: після рестарту всі відновлені інстанси
+    отримують свіжий heartbeat, а мертві просто протухнуть через TTL.
+    Компактизація у два кроки, щоб fsync не йшов під локом реєстру в event loop:
+    rotate() під локом разом зі знімком стану лише перейменовує журнал у registry.log.1,
+    а write_snapshot() поза локом (у потоці) пише знімок з fsync і тоді видаляє registry.log.1.
+    Впали посередині -> load() дочитує і registry.log.1: повтор його операцій поверх знімка,
+    що вже їх містить, дає той самий стан.
+    """
+
+    def __init__(self, directory: str, compact_every: int = COMPACT_EVERY):
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, "registry.snapshot.json")
+        self.log_path = os.path.join(directory, "registry.log")
+        self.rotated_path = self.log_path + ".1"
+        self.compact_every = compact_every
+        self._file = None
+        self._lines = 0
+
+    def load(self) -> List[dict]:
+        """Знімок + журнал -> список {"instance": ..., "lease_id": ...}"""
+        state: Dict[str, dict] = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                for entry in json.load(f):
+                    state[entry["lease_id"]] = entry
+        for path in (self.rotated_path, self.log_path):
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break  # обірваний останній запис після падіння
+                    if op["op"] == "upsert":
+                        state[op["lease_id"]] = {"instance": op["instance"], "lease_id": op["lease_id"]}
+                    else:
+                        state.pop(op["lease_id"], None)
+        return list(state.values())
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __call__(self, op: dict, replicated: bool):
+        if op["op"] == "renew" or self._file is None:
+            return
+        self._file.write(json.dumps(op) + "\n")
+        self._file.flush()
+        self._lines += 1
+
+    def needs_compaction(self) -> bool:
+        return self._lines >= self.compact_every
+
+    def rotate(self):
+        """Під локом реєстру, разом зі знімком стану: далі операції пишуться в новий журнал"""
+        self.close()
+        if os.path.exists(self.log_path):
+            if os.path.exists(self.rotated_path):
+                # попередня компактизація не дійшла до кінця (падіння) - обидва журнали ще потрібні
+                with open(self.log_path) as src, open(self.rotated_path, "a") as dst:
+                    dst.write(src.read())
+                os.remove(self.log_path)
+            else:
+                os.replace(self.log_path, self.rotated_path)
+        self._file = open(self.log_path, "a")
+        self._lines = 0
+
+    def write_snapshot(self, state: List[dict]):
+        """Поза локом (asyncio.to_thread): атомарно пише знімок, після чого старий журнал не потрібен"""
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+
+class PeerReplicator:
+    """
+    Проста реплікація між вузлами Discovery: кожна локальна операція
+    (upsert / renew / release) пакетами розсилається всім пірам.
+    Прострочення кожен вузол рахує сам - renew реплікуються, тож TTL збігаються.
+    """
+
+    def __init__(self, peers: List[str], interval: float = REPLICATION_INTERVAL):
+        self.peers = peers
+        self.interval = interval
+        self._queues = {peer: deque(maxlen=REPLICATION_BACKLOG) for peer in peers}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def __call__(self, op: dict, replicated: bool):
+        # Чужі операції не пересилаємо далі, інакше вони ходитимуть по колу
+        if replicated or op["op"] == "expire":
+            return
+        for queue in self._queues.values():
+            queue.append(op)
+
+    async def bootstrap(self) -> List[dict]:
+        """Стан першого доступного піра - щоб новий вузол не стартував порожнім"""
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            for peer in self.peers:
+                try:
+                    resp = await client.get(f"{peer}/replicate/snapshot")
+                    resp.raise_for_status()
+                    return resp.json()
+                except httpx.HTTPError:
+                    continue
+        return []
+
+    async def run(self):
+        self._client = httpx.AsyncClient(timeout=2.0)
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                await asyncio.gather(*(self._flush(peer) for peer in self.peers))
+        finally:
+            await self._client.aclose()
+
+    async def _flush(self, peer: str):
+        queue = self._queues[peer]
+        while queue:
+            batch = [queue.popleft() for _ in range(min(len(queue), REPLICATION_BATCH))]
+            try:
+                resp = await self._client.post(f"{peer}/replicate", json={"ops": batch})
+                resp.raise_for_status()
+            except httpx.HTTPError:
+                # Пір недоступний -> повертаємо пакет у чергу і пробуємо наступного разу
+                queue.extendleft(reversed(batch))
+                return
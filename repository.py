@@ -0,0 +1,160 @@
+import bisect
+import threading
+import uuid
+from typing import Dict, Generic, Hashable, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class Repository(Generic[T]):
+    """
+    In-memory сховище моделей з полем `id`:
+    - словник id -> запис: get / add / update / delete за O(1)
+    - монотонний лічильник ID (видалені ID повторно не видаються)
+    - вторинні індекси по полях (`indexes`): значення -> {id: запис}
+    - відсортований список id підтримується на кожен запис: ID монотонні, тож новий
+      просто дописується в кінець, видалений прибирається через bisect, оновлений лишається на місці
+    - page() - курсорна пагінація (after=id, limit) поверх цього списку або індексу:
+      bisect + зріз на limit записів, без копіювання всієї колекції
+    - all() віддає незмінний знімок (tuple за id), який збирається лише після запису
+    - version - лічильник змін колекції (росте на кожен запис, ключ для кешів відповідей);
+      після перезапуску він починається знову, тому поруч `epoch` - ID цього екземпляра
+      (іде в ETag разом з version, як ChangeFeed.epoch у журналі змін)
+    Хто викликає (storage.AsyncRepository): для memory - async-ендпоінти прямо в event loop,
+    тож кожен виклик має бути коротким (O(log N + limit), без I/O); LogRepository (теж
+    Repository) працює з asyncio.to_thread, і тоді записи з кількох потоків і дочитування
+    журналу йдуть паралельно - тому threading.Lock лишається (у loop він без конкуренції і дешевий).
+    """
+
+    def __init__(self, items: Iterable[T] = (), indexes: Sequence[str] = ()):
+        self._lock = threading.Lock()
+        self._items: Dict[int, T] = {}
+        self._indexes: Dict[str, Dict[Hashable, Dict[int, T]]] = {field: {} for field in indexes}
+        self._next_id = 1
+        self._ids: List[int] = []
+        self._snapshot: Optional[Tuple[T, ...]] = None
+        self._version = 0
+        self.epoch = uuid.uuid4().hex[:8]
+        for item in items:
+            self._insert(item)
+            self._next_id = max(self._next_id, item.id + 1)
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    # --- Читання ---
+    def get(self, id: int) -> Optional[T]:
+        return self._items.get(id)
+
+    def all(self) -> Tuple[T, ...]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot = tuple(self._items[i] for i in self._ids)
+        return snapshot
+
+    def page(self, after: Optional[int] = None, limit: Optional[int] = None,
+             **filters) -> Tuple[List[T], Optional[int]]:
+        """
+        Записи з id > after (не більше limit) + курсор наступної сторінки (або None).
+        Фільтри зі значенням None ігноруються; решта йде через індекси.
+        """
+        filters = {k: v for k, v in filters.items() if v is not None}
+        if filters:
+            matches = self.find(**filters)
+            start = bisect.bisect_right([item.id for item in matches], after) if after is not None else 0
+            page = matches[start:] if limit is None else matches[start:start + limit + 1]
+        else:
+            with self._lock:  # O(log N + limit): зріз списку id під локом, щоб не побачити видалений запис
+                start = bisect.bisect_right(self._ids, after) if after is not None else 0
+                ids = self._ids[start:] if limit is None else self._ids[start:start + limit + 1]
+                page = [self._items[i] for i in ids]
+        if limit is None:
+            return page, None
+        if len(page) > limit:
+            return page[:limit], page[limit - 1].id
+        return page, None
+
+    def find(self, **filters) -> List[T]:
+        """Пошук по індексованих полях (результат за зростанням id); кілька умов -> перетин з найменшого"""
+        buckets = []
+        for field, value in filters.items():
+            if field not in self._indexes:
+                raise KeyError(f"Field '{field}' is not indexed")
+            buckets.append(self._indexes[field].get(value, {}))
+        if not buckets:
+            return list(self.all())
+        buckets.sort(key=len)
+        first, rest = dict(buckets[0]), buckets[1:]  # копія: індекс може змінюватись з іншого потоку
+        return [first[id] for id in sorted(first) if all(id in b for b in rest)]
+
+    # --- Запис ---
+    def add(self, item: T) -> T:
+        """Видає новий ID і зберігає запис"""
+        with self._lock:
+            item.id = self._next_id
+            self._next_id += 1
+            self._insert(item)
+        return item
+
+    def add_many(self, items: Sequence[T]) -> Sequence[T]:
+        with self._lock:
+            for item in items:
+                item.id = self._next_id
+                self._next_id += 1
+                self._insert(item)
+        return items
+
+    def update(self, item: T) -> bool:
+        """Замінює запис з тим самим id; False, якщо такого немає"""
+        return self.update_many([item]) == 1
+
+    def update_many(self, items: Sequence[T]) -> int:
+        """Замінює наявні записи (за id), відсутні пропускає; повертає кількість замінених"""
+        updated = 0
+        with self._lock:
+            for item in items:
+                old = self._items.get(item.id)
+                if old is not None:
+                    self._unindex(old)
+                    self._insert(item)
+                    updated += 1
+        return updated
+
+    def delete(self, id: int) -> bool:
+        with self._lock:
+            item = self._items.pop(id, None)
+            if item is None:
+                return False
+            self._unindex(item)
+            i = bisect.bisect_left(self._ids, id)
+            del self._ids[i]
+            self._snapshot = None
+            self._version += 1
+            return True
+
+    def _unindex(self, item: T):
+        for field, index in self._indexes.items():
+            bucket = index.get(getattr(item, field))
+            if bucket is not None:
+                bucket.pop(item.id, None)
+                if not bucket:
+                    del index[getattr(item, field)]
+
+    def _insert(self, item: T):
+        if item.id not in self._items:  # новий запис, а не заміна наявного
+            if not self._ids or item.id > self._ids[-1]:
+                self._ids.append(item.id)
+            else:
+                bisect.insort(self._ids, item.id)  # seed / чужий журнал не обов'язково за зростанням
+        self._items[item.id] = item
+        for field, index in self._indexes.items():
+            index.setdefault(getattr(item, field), {})[item.id] = item
+        self._snapshot = None
+        self._version += 1
@@ -0,0 +1,135 @@
+import time
+
+# --- Circuit breaker / outlier ejection (на інстанс) ---
+BREAKER_FAILURES = 5           # помилок поспіль -> інстанс виключаємо
+BREAKER_OPEN_TIME = 5.0        # секунд виключення; кожне повторне - вдвічі довше
+BREAKER_MAX_OPEN_TIME = 60.0
+OUTLIER_WINDOW = 10.0          # секунд: вікно, в якому рахуємо частку помилок
+OUTLIER_MIN_REQUESTS = 20      # менше запитів у вікні -> частку не оцінюємо
+OUTLIER_ERROR_RATE = 0.5       # частка помилок у вікні, після якої інстанс виключаємо
+
+# --- Бюджет повторів (на маршрут) ---
+RETRY_BUDGET_RATIO = 0.2       # повторів на один звичайний запит (не більше 20% зверху)
+RETRY_MIN_PER_SECOND = 3.0     # мінімум повторів/с навіть при малому трафіку
+RETRY_BUDGET_CAP = 100.0       # стеля накопичених токенів
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """
+    closed    - трафік іде; BREAKER_FAILURES помилок поспіль або частка помилок
+                у вікні >= OUTLIER_ERROR_RATE -> open
+    open      - інстанс не отримує трафік open_time секунд
+    half_open - пропускаємо один пробний запит: успіх -> closed, помилка -> open на вдвічі довше
+    """
+
+    __slots__ = ("state", "opened_at", "open_time", "consecutive_failures", "window_start",
+                 "window_requests", "window_failures", "probe_in_flight", "ejections")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.open_time = BREAKER_OPEN_TIME
+        self.consecutive_failures = 0
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.window_failures = 0
+        self.probe_in_flight = False
+        self.ejections = 0
+
+    def available(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_time:
+                return False
+            self.state = HALF_OPEN
+        return not self.probe_in_flight
+
+    def on_begin(self):
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = True
+
+    def release(self):
+        """Запит завершився без результату (скасований) - проба знову вільна"""
+        self.probe_in_flight = False
+
+    def record(self, ok: bool):
+        now = time.monotonic()
+        if now - self.window_start > OUTLIER_WINDOW:
+            self._reset_window(now)
+        self.window_requests += 1
+        self.probe_in_flight = False
+        if ok:
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.open_time = BREAKER_OPEN_TIME
+                self._reset_window(now)
+            return
+        self.window_failures += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            self._open(now, self.open_time * 2)
+        elif self.state == CLOSED and (
+            self.consecutive_failures >= BREAKER_FAILURES
+            or (self.window_requests >= OUTLIER_MIN_REQUESTS
+                and self.window_failures / self.window_requests >= OUTLIER_ERROR_RATE)
+        ):
+            self._open(now, self.open_time)
+
+    def _open(self, now: float, open_time: float):
+        self.state = OPEN
+        self.opened_at = now
+        self.open_time = min(open_time, BREAKER_MAX_OPEN_TIME)
+        self.ejections += 1
+        self._reset_window(now)
+
+    def _reset_window(self, now: float):
+        self.window_start = now
+        self.window_requests = 0
+        self.window_failures = 0
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "ejections": self.ejections,
+                "consecutive_failures": self.consecutive_failures, "open_time": self.open_time}
+
+
+class RetryBudget:
+    """
+    Повтори не більше RETRY_BUDGET_RATIO від звичайних запитів (+ невеликий резерв на секунду),
+    щоб під час масового збою повтори не подвоїли навантаження на і так хворі бекенди.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_per_second: float = RETRY_MIN_PER_SECOND,
+                 cap: float = RETRY_BUDGET_CAP):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.cap = cap
+        self._tokens = 0.0
+        self._reserve = min_per_second
+        self._updated = time.monotonic()
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self):
+        """Кожен звичайний запит додає `ratio` токена"""
+        self._tokens = min(self.cap, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        now = time.monotonic()
+        self._reserve = min(self.min_per_second, self._reserve + (now - self._updated) * self.min_per_second)
+        self._updated = now
+        if self._tokens >= 1 - 1e-9:  # 5 * 0.2 у float трохи менше за 1
+            self._tokens -= 1
+        elif self._reserve >= 1:
+            self._reserve -= 1
+        else:
+            self.exhausted += 1
+            return False
+        self.retries += 1
+        return True
+
+    def snapshot(self) -> dict:
+        return {"tokens": round(self._tokens, 2), "retries": self.retries, "exhausted": self.exhausted}
@@ -1,87 +1,276 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import Iterable, List, Optional, Union
+from contextlib import asynccontextmanager
 import uvicorn
-import httpx
-import threading
-import time
-import random
+import json
+import os
 
-app = FastAPI(title="Schedule Service")
+from change_feed import ChangeFollower
+from class_resolver import CLASS_SERVICE, ClassNameResolver
+from discovery_client import ServiceCache
+from load_balancer import StatsRegistry, PowerOfTwoEWMA
+from registration import RegistrationAgent
+from listing import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, ListCache
+from metrics import MetricsMiddleware, watch_cache
+from storage import open_async_repository, open_lock
+from timetable import MAX_SLOTS, SCHOOL_DAYS, Timetable
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await agent.start()
+    await service_cache.start()
+    await class_names.start()
+    await class_changes.start()
+    yield
+    await agent.stop()
+    await class_changes.stop()
+    await class_names.stop()
+    await service_cache.stop()
+
+app = FastAPI(title="Schedule Service", lifespan=lifespan)
 
 SERVICE_NAME = "schedule-service"
-SERVICE_PORT = 8003
-DISCOVERY_URL = "http://127.0.0.1:8000"
+# Адреса - з оточення: launcher.py піднімає кілька інстансів на різних портах
+SERVICE_HOST = os.environ.get("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("SERVICE_PORT", 8003))
+DISCOVERY_URL = os.environ.get("DISCOVERY_URL", "http://127.0.0.1:8000")
+LESSONS_PAGE_SIZE = 100  # /schedules/lessons без limit; курсор - "scheduleId:slot" останнього уроку
 
-def register_in_discovery():
-    while True:
-        try:
-            with httpx.Client() as client:
-                client.post(f"{DISCOVERY_URL}/register", json={
-                    "name": SERVICE_NAME, "host": "127.0.0.1", "port": SERVICE_PORT
-                })
-        except: pass
-        time.sleep(10)
+agent = RegistrationAgent(DISCOVERY_URL)
+agent.add(SERVICE_NAME, SERVICE_HOST, SERVICE_PORT)
+
+app.add_middleware(MetricsMiddleware, service=SERVICE_NAME)
 
-@app.on_event("startup")
-async def startup_event():
-    threading.Thread(target=register_in_discovery, daemon=True).start()
+# Адреси class-service беремо з локального знімка, а не з Discovery на кожен запит
+service_cache = ServiceCache(DISCOVERY_URL)
+instance_stats = StatsRegistry()
+class_balancer = PowerOfTwoEWMA(instance_stats)
+class_names = ClassNameResolver(service_cache, class_balancer, instance_stats)
+watch_cache("class_names", lambda: (class_names.cache.hits, class_names.cache.misses))
+watch_cache("discovery_snapshot", lambda: (service_cache.hits, service_cache.misses))
+
+class Lesson(BaseModel):
+    slot: int = Field(ge=1, le=MAX_SLOTS)  # номер уроку в дні
+    subject: str
+    teacherId: Optional[int] = None
 
 class ScheduleBase(BaseModel):
     classId: int
     day: str
-    lessons: List[str]
+    lessons: List[Lesson]
+
+    @field_validator("lessons", mode="before")
+    @classmethod
+    def legacy_lessons(cls, value):
+        # Старий формат - список назв предметів: позиція в списку і є слотом
+        if isinstance(value, list):
+            return [{"slot": i + 1, "subject": v} if isinstance(v, str) else v for i, v in enumerate(value)]
+        return value
+
+    @field_validator("lessons")
+    @classmethod
+    def unique_slots(cls, value: List[Lesson]):
+        if len({lesson.slot for lesson in value}) != len(value):
+            raise ValueError("Each slot can hold only one lesson")
+        return value
 
 class Schedule(ScheduleBase):
     id: int
     className: Optional[str] = None 
 
-db = []
+db = open_async_repository("schedules", Schedule, indexes=("classId", "day"))
+schedules_json = ListCache(Schedule, db.sync)
+watch_cache("schedule_list", schedules_json.stats)
+# перевірка конфліктів + запис - під локом, спільним для всіх інстансів сервісу.
+# Секції під writing() синхронні й цілі йдуть через db.run: з memory - прямо в
+# event loop, з файловим сховищем - у потік (лок між процесами там може чекати)
+timetable = Timetable(db.sync, write_lock=open_lock("schedules"))
 
 async def get_class_name(class_id: int) -> str:
-    async with httpx.AsyncClient() as client:
-        try:
-            disc_resp = await client.get(f"{DISCOVERY_URL}/services/class-service")
-            if disc_resp.status_code != 200: return "Unknown (Service Down)"
-            
-            instances = disc_resp.json()
-            if not instances: return "Unknown (No Instances)"
-            
-            target = random.choice(instances)
-            url = f"http://{target['host']}:{target['port']}/classes"
-            
-            # Отримуємо всі класи і шукаємо потрібний (спрощена логіка)
-            classes_resp = await client.get(url)
-            if classes_resp.status_code == 200:
-                classes = classes_resp.json()
-                for c in classes:
-                    if c['id'] == class_id:
-                        return c['name']
-            return "Unknown Class"
-        except:
-            return "Error Connecting"
+    # Кеш + пакетні запити /classes?ids=... замість завантаження всіх класів
+    return await class_names.resolve(class_id)
+
+# --- className у збережених розкладах тримаємо свіжим за журналом змін class-service ---
+async def refresh_class_names(class_ids: Iterable[int]):
+    """
+    Перечитує назви класів одним пакетним запитом і виправляє className лише
+    в розкладах цих класів (через індекс classId). Подію використовуємо як підказку,
+    а назву беремо поточну: події різних інстансів class-service можуть прийти не по порядку.
+    """
+    names = await class_names.refresh(class_ids)
+    stale = [
+        s.model_copy(update={"className": name})
+        for class_id, name in names.items() for s in await db.find(classId=class_id) if s.className != name
+    ]
+    if stale:
+        await db.run(save_class_names, stale)
+
+def save_class_names(stale: List[Schedule]):
+    with timetable.writing():
+        db.sync.update_many(stale)
+        timetable.replace(stale)
+
+async def on_class_events(events: List[dict]):
+    await refresh_class_names({e["id"] for e in events})
+
+async def on_class_reset():
+    # Могли пропустити події -> звіряємо всі класи, на які є розклади
+    await refresh_class_names({s.classId for s in await db.all()})
+
+class_changes = ChangeFollower(service_cache, CLASS_SERVICE, "/classes/changes", on_class_events, on_class_reset)
 
 @app.get("/schedules", response_model=List[Schedule])
-def get_all(): return db
+async def get_all(
+    classId: Optional[int] = None,
+    day: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    return await db.run(schedules_json.respond, (classId, day, after, limit),
+                        lambda: db.sync.page(after=after, limit=limit, classId=classId, day=day), fields, if_none_match)
+
+# --- Запити по розкладу (інвертовані індекси Timetable) ---
+@app.get("/schedules/lessons")
+async def find_lessons(
+    response: Response,
+    day: Optional[str] = None,
+    slot: Optional[int] = Query(None, ge=1, le=MAX_SLOTS),
+    subject: Optional[str] = None,
+    teacherId: Optional[int] = None,
+    classId: Optional[int] = None,
+    limit: int = Query(LESSONS_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, pattern=r"^\d+:\d+$"),
+):
+    """
+    Уроки за фільтрами, напр. ?subject=History&day=Monday - які класи мають історію в понеділок.
+    Посторінково, як інші списки: наступна сторінка - ?after=<X-Next-Cursor>
+    """
+    cursor = tuple(map(int, after.split(":"))) if after else None
+    try:
+        found, next_key = await db.run(timetable.lessons, day=day, slot=slot, subject=subject,
+                                       teacherId=teacherId, classId=classId, after=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if next_key is not None:
+        response.headers[NEXT_CURSOR_HEADER] = f"{next_key[0]}:{next_key[1]}"
+    return found
+
+@app.get("/schedules/free-slots")
+async def free_slots(classId: Optional[int] = None, teacherId: Optional[int] = None, day: Optional[str] = None):
+    """Вільні слоти класу та/або вчителя: день -> номери уроків"""
+    if classId is None and teacherId is None:
+        raise HTTPException(status_code=422, detail="classId or teacherId is required")
+    return await db.run(timetable.free_slots, classId=classId, teacherId=teacherId, days=[day] if day else SCHOOL_DAYS)
+
+@app.get("/schedules/conflicts")
+async def conflicts(type: Optional[str] = Query(None, pattern="^(teacher|class)$")):
+    """Подвійні бронювання: вчитель чи клас у двох розкладах в одному слоті"""
+    return await db.run(timetable.double_booked, type)
 
 @app.post("/schedules", response_model=Schedule)
 async def create(data: ScheduleBase):
     class_name = await get_class_name(data.classId)
-    # FIX: Правильний автоінкремент
-    new_id = max([s.id for s in db], default=0) + 1
-    
-    new_obj = Schedule(id=new_id, className=class_name, **data.dict())
-    db.append(new_obj)
+    new_obj = Schedule(id=0, className=class_name, **data.model_dump())
+
+    def save():
+        with timetable.writing():
+            found = timetable.conflicts([new_obj])[0]
+            if found:
+                raise HTTPException(status_code=409, detail={"conflicts": found})
+            # ID видає репозиторій (монотонний лічильник)
+            db.sync.add(new_obj)
+            timetable.add([new_obj])
+
+    await db.run(save)
     return new_obj
 
+async def read_bulk_items(request: Request) -> List[Union[ScheduleBase, list, str]]:
+    """JSON-масив або NDJSON -> ScheduleBase чи опис помилки для кожного елемента"""
+    def parse(raw) -> Union[ScheduleBase, list]:
+        try:
+            return ScheduleBase.model_validate(raw)
+        except ValidationError as e:
+            return e.errors(include_url=False, include_context=False, include_input=False)
+
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        # Рядок за рядком, не тримаючи все тіло в пам'яті
+        items, tail = [], b""
+        async for chunk in request.stream():
+            *lines, tail = (tail + chunk).split(b"\n")
+            items.extend(parse_line(line, parse) for line in lines if line.strip())
+        if tail.strip():
+            items.append(parse_line(tail, parse))
+        return items
+
+    try:
+        raw = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(raw, list):
+        raise HTTPException(status_code=422, detail="Body must be a JSON array or NDJSON")
+    return [parse(item) for item in raw]
+
+def parse_line(line: bytes, parse):
+    try:
+        return parse(json.loads(line))
+    except ValueError:
+        return "Invalid JSON"
+
+@app.post("/schedules/bulk")
+async def bulk_create(request: Request):
+    """
+    Масовий імпорт розкладу: JSON-масив ScheduleBase або NDJSON
+    (Content-Type: application/x-ndjson). Усі classId резолвляться пакетно,
+    ID видаються одним кроком. Повертає результат для кожного елемента;
+    елементи, що конфліктують зі збереженим розкладом чи між собою, не створюються.
+    """
+    items = await read_bulk_items(request)
+    valid = [item for item in items if isinstance(item, ScheduleBase)]
+    names = await class_names.resolve_many(item.classId for item in valid)
+
+    candidates = [
+        Schedule(id=0, className=names[item.classId], **item.model_dump()) for item in valid
+    ]
+
+    def save():
+        with timetable.writing():
+            found = timetable.conflicts(candidates)
+            created = [new_obj for new_obj, conflicts in zip(candidates, found) if not conflicts]
+            # ID для всього пакета видаються за один захід
+            db.sync.add_many(created)
+            timetable.add(created)
+        return found, created
+
+    found, created = await db.run(save)
+
+    # конфлікт усередині пакета посилається на позицію кандидата -> переводимо в індекс запиту
+    positions = [index for index, item in enumerate(items) if isinstance(item, ScheduleBase)]
+    results, outcomes = [], iter(zip(candidates, found))
+    for index, item in enumerate(items):
+        if isinstance(item, ScheduleBase):
+            new_obj, conflicts = next(outcomes)
+            if conflicts:
+                conflicts = [{**c, "index": positions[c["index"]]} if "index" in c else c for c in conflicts]
+                results.append({"index": index, "status": "conflict", "conflicts": conflicts})
+            else:
+                results.append({"index": index, "status": "created", "id": new_obj.id, "className": new_obj.className})
+        else:
+            results.append({"index": index, "status": "error", "detail": item})
+    return {"created": len(created), "failed": len(items) - len(created), "items": results}
+
 @app.delete("/schedules/{id}")
-def delete_schedule(id: int):
-    global db
-    initial_len = len(db)
-    db = [s for s in db if s.id != id]
-    if len(db) == initial_len:
-        raise HTTPException(status_code=404, detail="Not found")
+async def delete_schedule(id: int):
+    def remove():
+        with timetable.writing():
+            if not db.sync.delete(id):
+                raise HTTPException(status_code=404, detail="Not found")
+            timetable.remove(id)
+
+    await db.run(remove)
     return {"status": "deleted"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=SERVICE_PORT)
\ No newline at end of file
+    uvicorn.run(app, host=SERVICE_HOST, port=SERVICE_PORT)
\ No newline at end of file
@@ -0,0 +1,476 @@
+"""
+Сховища для сервісів (вибір через змінні оточення, щоб їх успадковували всі воркери):
+    STORAGE_BACKEND = memory | sqlite | log   (за замовчуванням memory)
+    STORAGE_DIR     = каталог для файлів        (за замовчуванням ./data)
+
+- memory: repository.Repository, дані живуть у процесі
+- sqlite: один файл на колекцію, WAL, кілька процесів читають/пишуть одночасно
+- log:    append-only журнал, який кожен процес читає через mmap і тримає
+          in-memory копію з індексами; запис - під файловим локом
+Усі три мають однаковий інтерфейс: get / all / page / find / add / add_many / update / update_many / delete
+і `version` - лічильник змін, спільний для всіх процесів, що працюють з одним файлом.
+open_lock(name) - лок для складених операцій (перевірка + запис), спільний для тих самих процесів.
+open_async_repository(...) - те саме сховище для `async def` ендпоінтів (AsyncRepository).
+"""
+import asyncio
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Generic, Iterable, List, Optional, Sequence, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+from repository import Repository
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+T = TypeVar("T", bound=BaseModel)
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "memory")
+STORAGE_DIR = os.environ.get("STORAGE_DIR", "data")
+CHANGES_KEEP = 10000  # версій, для яких пам'ятаємо змінені id (changes_since); старіші -> повне перечитування
+
+
+def open_repository(name: str, model: Type[T], seed: Iterable[T] = (), indexes: Sequence[str] = (),
+                    backend: Optional[str] = None, directory: Optional[str] = None):
+    """Сховище колекції `name`; `seed` записується лише в порожнє сховище"""
+    backend = backend or STORAGE_BACKEND
+    directory = directory or STORAGE_DIR
+    if backend == "memory":
+        return Repository(seed, indexes=indexes)
+    os.makedirs(directory, exist_ok=True)
+    if backend == "sqlite":
+        return SQLiteRepository(os.path.join(directory, f"{name}.sqlite3"), model, seed, indexes)
+    if backend == "log":
+        return LogRepository(os.path.join(directory, f"{name}.log"), model, seed, indexes)
+    raise ValueError(f"Unknown storage backend '{backend}'")
+
+
+def open_async_repository(name: str, model: Type[T], seed: Iterable[T] = (), indexes: Sequence[str] = (),
+                          backend: Optional[str] = None, directory: Optional[str] = None) -> "AsyncRepository[T]":
+    backend = backend or STORAGE_BACKEND
+    repo = open_repository(name, model, seed, indexes, backend, directory)
+    return AsyncRepository(repo, offload=backend != "memory")
+
+
+class AsyncRepository(Generic[T]):
+    """
+    Інтерфейс репозиторію для `async def` ендпоінтів:
+    - memory: операції - мікросекунди в пам'яті без I/O, тож виконуються прямо в event loop,
+      без переходу в thread pool і без контенції потоків за локи
+    - sqlite / log: диск і flock блокують -> asyncio.to_thread, щоб не зупиняти loop
+    run(fn, ...) - так само для складеної операції над репозиторієм (ListCache.respond, Timetable).
+    Сам синхронний репозиторій - у `.sync`.
+    """
+
+    def __init__(self, repo, offload: bool):
+        self.sync = repo
+        self.offload = offload
+
+    @property
+    def version(self) -> int:
+        return self.sync.version
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        if self.offload:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def get(self, id: int) -> Optional[T]:
+        return await self.run(self.sync.get, id)
+
+    async def all(self) -> Tuple[T, ...]:
+        return await self.run(self.sync.all)
+
+    async def page(self, after: Optional[int] = None, limit: Optional[int] = None,
+                   **filters) -> Tuple[List[T], Optional[int]]:
+        return await self.run(self.sync.page, after, limit, **filters)
+
+    async def find(self, **filters) -> List[T]:
+        return await self.run(self.sync.find, **filters)
+
+    async def add(self, item: T) -> T:
+        return await self.run(self.sync.add, item)
+
+    async def add_many(self, items: Sequence[T]) -> Sequence[T]:
+        return await self.run(self.sync.add_many, items)
+
+    async def update(self, item: T) -> bool:
+        return await self.run(self.sync.update, item)
+
+    async def update_many(self, items: Sequence[T]) -> int:
+        return await self.run(self.sync.update_many, items)
+
+    async def delete(self, id: int) -> bool:
+        return await self.run(self.sync.delete, id)
+
+
+def open_lock(name: str, backend: Optional[str] = None, directory: Optional[str] = None):
+    """Лок для "прочитати, перевірити, записати" над колекцією `name` - між потоками і процесами"""
+    backend = backend or STORAGE_BACKEND
+    directory = directory or STORAGE_DIR
+    if backend == "memory" or fcntl is None:
+        return threading.RLock()  # дані в одному процесі - досить локу між потоками
+    os.makedirs(directory, exist_ok=True)
+    return FileLock(os.path.join(directory, f"{name}.lock"))
+
+
+class FileLock:
+    """flock на окремому файлі + RLock між потоками; повторний вхід з того ж потоку дозволений"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+
+class SQLiteRepository(Generic[T]):
+    """
+    Таблиця (id, data JSON, <індексовані поля>) з B-tree індексами по полях.
+    - WAL: читачі не блокують писача, інші процеси бачать закомічене
+    - SQL-рядки сталі, тож sqlite3 бере підготовлені statement-и зі свого кешу
+    - add_many - одна транзакція і executemany на весь пакет
+    - ID видаються під BEGIN IMMEDIATE з sqlite_sequence: монотонні між процесами
+    - version лежить у таблиці meta і росте в тій самій транзакції, що й запис;
+      таблиця changes (version, id) - які записи змінила кожна з останніх CHANGES_KEEP версій
+    З'єднання - своє на кожен потік (sync-ендпоінти працюють у thread pool).
+    """
+
+    TABLE = "items"
+    epoch = ""  # version зберігається в meta і спільна для всіх процесів - окремий epoch не потрібен
+
+    def __init__(self, path: str, model: Type[T], seed: Iterable[T] = (), indexes: Sequence[str] = ()):
+        self.path = path
+        self.model = model
+        self.indexes = tuple(indexes)
+        self._local = threading.local()
+        cols = "".join(f', "{f}"' for f in self.indexes)
+        marks = ", ?" * len(self.indexes)
+        self._insert_sql = f'INSERT INTO {self.TABLE} (id, data{cols}) VALUES (?, ?{marks})'
+        sets = "".join(f', "{f}" = ?' for f in self.indexes)
+        self._update_sql = f'UPDATE {self.TABLE} SET data = ?{sets} WHERE id = ?'
+        db = self._conn()
+        db.execute(f"CREATE TABLE IF NOT EXISTS {self.TABLE} (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL{cols})")
+        for field in self.indexes:
+            db.execute(f'CREATE INDEX IF NOT EXISTS "idx_{field}" ON {self.TABLE} ("{field}", id)')
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        db.execute("INSERT OR IGNORE INTO meta VALUES ('version', 0)")
+        db.execute("CREATE TABLE IF NOT EXISTS changes (version INTEGER NOT NULL, id INTEGER NOT NULL, "
+                   "PRIMARY KEY (version, id)) WITHOUT ROWID")
+        # сховище старіше за таблицю changes: історія є лише від поточної версії
+        db.execute("INSERT OR IGNORE INTO meta SELECT 'changes_from', value FROM meta WHERE key = 'version'")
+        seed = list(seed)
+        if seed:
+            with self._write() as db:
+                if db.execute(f"SELECT 1 FROM {self.TABLE} LIMIT 1").fetchone() is None:
+                    db.executemany(self._insert_sql, [self._row(item) for item in seed])
+                    self._bump(db, [item.id for item in seed])
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=256)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")  # у WAL це все ще стійко до падіння процесу
+            db.execute("PRAGMA busy_timeout=5000")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _write(self):
+        """Транзакція запису; IMMEDIATE одразу бере лок, тож ID не перетнуться з іншим процесом"""
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _row(self, item: T) -> tuple:
+        return (item.id, item.model_dump_json(), *(getattr(item, f) for f in self.indexes))
+
+    def _load(self, rows) -> List[T]:
+        return [self.model.model_validate_json(data) for (data,) in rows]
+
+    def _next_id(self, db) -> int:
+        row = db.execute(f"SELECT seq FROM sqlite_sequence WHERE name = '{self.TABLE}'").fetchone()
+        return (row[0] if row else 0) + 1
+
+    def _bump(self, db, ids: Iterable[int]):
+        (version,) = db.execute("UPDATE meta SET value = value + 1 WHERE key = 'version' RETURNING value").fetchone()
+        db.executemany("INSERT OR IGNORE INTO changes VALUES (?, ?)", [(version, id) for id in ids])
+        db.execute("DELETE FROM changes WHERE version <= ?", (version - CHANGES_KEEP,))
+
+    def __len__(self):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+
+    @property
+    def version(self) -> int:
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def changes_since(self, version: int) -> Optional[Tuple[int, List[T], List[int]]]:
+        """
+        (поточна версія, змінені/додані записи, id видалених) після `version` - O(змін),
+        а не O(колекції); None, якщо історії вже немає (треба перечитати все).
+        """
+        db = self._conn()
+        db.execute("BEGIN")  # версія і зміни - з одного знімка WAL
+        try:
+            meta = dict(db.execute("SELECT key, value FROM meta"))
+            current = meta["version"]
+            if not max(meta["changes_from"], current - CHANGES_KEEP) <= version <= current:
+                return None
+            rows = db.execute(
+                f"SELECT c.id, i.data FROM (SELECT DISTINCT id FROM changes WHERE version > ?) c "
+                f"LEFT JOIN {self.TABLE} i ON i.id = c.id ORDER BY c.id", (version,)).fetchall()
+        finally:
+            db.execute("COMMIT")
+        changed = [self.model.model_validate_json(data) for _, data in rows if data is not None]
+        return current, changed, [id for id, data in rows if data is None]
+
+    # --- Читання ---
+    def get(self, id: int) -> Optional[T]:
+        row = self._conn().execute(f"SELECT data FROM {self.TABLE} WHERE id = ?", (id,)).fetchone()
+        return self.model.model_validate_json(row[0]) if row else None
+
+    def all(self) -> Tuple[T, ...]:
+        return tuple(self._load(self._conn().execute(f"SELECT data FROM {self.TABLE} ORDER BY id")))
+
+    def page(self, after: Optional[int] = None, limit: Optional[int] = None,
+             **filters) -> Tuple[List[T], Optional[int]]:
+        filters = {k: v for k, v in filters.items() if v is not None}
+        for field in filters:
+            if field not in self.indexes:
+                raise KeyError(f"Field '{field}' is not indexed")
+        where = [f'"{f}" = ?' for f in filters] + (["id > ?"] if after is not None else [])
+        params = list(filters.values()) + ([after] if after is not None else [])
+        sql = f"SELECT data FROM {self.TABLE}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        items = self._load(self._conn().execute(sql, params))
+        if limit is not None and len(items) > limit:
+            return items[:limit], items[limit - 1].id
+        return items, None
+
+    def find(self, **filters) -> List[T]:
+        return self.page(**filters)[0]
+
+    # --- Запис ---
+    def add(self, item: T) -> T:
+        return self.add_many([item])[0]
+
+    def add_many(self, items: Sequence[T]) -> Sequence[T]:
+        with self._write() as db:
+            next_id = self._next_id(db)
+            for item in items:
+                item.id = next_id
+                next_id += 1
+            db.executemany(self._insert_sql, [self._row(item) for item in items])
+            self._bump(db, [item.id for item in items])
+        return items
+
+    def update(self, item: T) -> bool:
+        return self.update_many([item]) == 1
+
+    def update_many(self, items: Sequence[T]) -> int:
+        with self._write() as db:
+            updated = [item.id for item in items
+                       if db.execute(self._update_sql, (*self._row(item)[1:], item.id)).rowcount]
+            if updated:
+                self._bump(db, updated)
+        return len(updated)
+
+    def delete(self, id: int) -> bool:
+        with self._write() as db:
+            if db.execute(f"DELETE FROM {self.TABLE} WHERE id = ?", (id,)).rowcount == 0:
+                return False
+            self._bump(db, [id])
+            return True
+
+
+# Запис журналу: 4 байти довжини + JSON {"put": {...}} або {"del": id}
+_HEADER = struct.Struct("<I")
+
+
+class LogRepository(Repository[T]):
+    """
+    In-memory Repository, який синхронізується через спільний append-only файл.
+    Перед кожним читанням процес дочитує (через mmap) записи, додані іншими
+    процесами після його позиції. Запис: flock -> дочитати -> видати ID -> append.
+    Журнал не компактизується: оновлення і видалення - теж записи.
+    version - позиція в журналі: однакова в усіх процесах, що його дочитали.
+    Для changes_since пам'ятаємо (кінець запису, id) останніх CHANGES_KEEP записів.
+    """
+
+    def __init__(self, path: str, model: Type[T], seed: Iterable[T] = (), indexes: Sequence[str] = ()):
+        if fcntl is None:
+            raise RuntimeError("The 'log' storage backend needs fcntl (POSIX only)")
+        super().__init__(indexes=indexes)
+        self.epoch = ""  # version - позиція у спільному файлі, переживає перезапуск
+        self.model = model
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._offset = 0
+        self._changes: deque = deque()
+        self._changes_from = 0  # позиція, до якої історії змін уже немає
+        self._sync_lock = threading.Lock()   # дочитування журналу
+        self._write_lock = threading.Lock()  # flock не розрізняє потоки одного процесу
+        seed = list(seed)
+        if seed:
+            with self._exclusive():
+                if os.fstat(self._fd).st_size == 0:
+                    self._append([{"put": item.model_dump()} for item in seed])
+
+    # --- Синхронізація з файлом ---
+    def _catch_up(self):
+        size = os.fstat(self._fd).st_size
+        if size <= self._offset:
+            return
+        with self._sync_lock:
+            with mmap.mmap(self._fd, size, access=mmap.ACCESS_READ) as mm:
+                pos = self._offset
+                while pos + _HEADER.size <= size:
+                    (length,) = _HEADER.unpack_from(mm, pos)
+                    end = pos + _HEADER.size + length
+                    if end > size:
+                        break  # запис ще дописується іншим процесом
+                    self._apply(json.loads(mm[pos + _HEADER.size:end]), end)
+                    pos = end
+                self._offset = max(self._offset, pos)
+
+    def _apply(self, record: dict, end: int):
+        if "put" in record:
+            item = self.model.model_validate(record["put"])
+            with self._lock:
+                old = self._items.get(item.id)
+                if old is not None:  # оновлення
+                    self._unindex(old)
+                self._insert(item)
+                self._next_id = max(self._next_id, item.id + 1)
+            self._changes.append((end, item.id))
+        else:
+            super().delete(record["del"])
+            self._changes.append((end, record["del"]))
+        if len(self._changes) > CHANGES_KEEP:
+            self._changes_from = self._changes.popleft()[0]
+
+    @contextmanager
+    def _exclusive(self):
+        with self._write_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _append(self, records: List[dict]):
+        """Пише записи одним write() і одразу застосовує їх у пам'яті (викликати під _exclusive)"""
+        buf = bytearray()
+        ends = []
+        for record in records:
+            data = json.dumps(record).encode()
+            buf += _HEADER.pack(len(data)) + data
+            ends.append(self._offset + len(buf))
+        with self._sync_lock:
+            os.write(self._fd, bytes(buf))
+            for record, end in zip(records, ends):
+                self._apply(record, end)
+            self._offset += len(buf)
+
+    # --- Читання: спершу дочитуємо чужі записи ---
+    @property
+    def version(self) -> int:
+        self._catch_up()
+        return self._offset
+
+    def changes_since(self, version: int) -> Optional[Tuple[int, List[T], List[int]]]:
+        """Як SQLiteRepository.changes_since: зміни після позиції `version` у журналі"""
+        self._catch_up()
+        with self._sync_lock:
+            current = self._offset
+            if not self._changes_from <= version <= current:
+                return None
+            ids = set()
+            for end, id in reversed(self._changes):
+                if end <= version:
+                    break
+                ids.add(id)
+            items = {id: self._items.get(id) for id in sorted(ids)}
+        changed = [item for item in items.values() if item is not None]
+        return current, changed, [id for id, item in items.items() if item is None]
+
+    def get(self, id: int) -> Optional[T]:
+        self._catch_up()
+        return super().get(id)
+
+    def all(self) -> Tuple[T, ...]:
+        self._catch_up()
+        return super().all()
+
+    def page(self, *args, **kwargs):
+        self._catch_up()
+        return super().page(*args, **kwargs)
+
+    def find(self, **filters) -> List[T]:
+        self._catch_up()
+        return super().find(**filters)
+
+    # --- Запис ---
+    def add(self, item: T) -> T:
+        return self.add_many([item])[0]
+
+    def add_many(self, items: Sequence[T]) -> Sequence[T]:
+        with self._exclusive():
+            next_id = self._next_id
+            for item in items:
+                item.id = next_id
+                next_id += 1
+            self._append([{"put": item.model_dump()} for item in items])
+        return items
+
+    def update_many(self, items: Sequence[T]) -> int:
+        with self._exclusive():
+            records = []
+            for item in items:
+                if super().get(item.id) is not None:
+                    records.append({"put": item.model_dump()})
+            if records:
+                self._append(records)
+        return len(records)
+
+    def delete(self, id: int) -> bool:
+        with self._exclusive():
+            if super().get(id) is None:
+                return False
+            self._append([{"del": id}])
+            return True
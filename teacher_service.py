@@ -1,57 +1,65 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
 from pydantic import BaseModel
-from typing import List
+from contextlib import asynccontextmanager
+from typing import List, Optional
 import uvicorn
-import httpx
-import threading
-import time
+import os
 
-app = FastAPI(title="Teacher Service")
+from registration import RegistrationAgent
+from listing import MAX_PAGE_SIZE, ListCache
+from metrics import MetricsMiddleware, watch_cache
+from storage import open_async_repository
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await agent.start()
+    yield
+    await agent.stop()
+
+app = FastAPI(title="Teacher Service", lifespan=lifespan)
 
 SERVICE_NAME = "teacher-service"
-SERVICE_PORT = 8002
-DISCOVERY_URL = "http://127.0.0.1:8000"
-
-def register_in_discovery():
-    while True:
-        try:
-            with httpx.Client() as client:
-                client.post(f"{DISCOVERY_URL}/register", json={
-                    "name": SERVICE_NAME, "host": "127.0.0.1", "port": SERVICE_PORT
-                })
-        except: pass
-        time.sleep(10)
-
-@app.on_event("startup")
-async def startup_event():
-    threading.Thread(target=register_in_discovery, daemon=True).start()
+# Адреса - з оточення: launcher.py піднімає кілька інстансів на різних портах
+SERVICE_HOST = os.environ.get("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("SERVICE_PORT", 8002))
+DISCOVERY_URL = os.environ.get("DISCOVERY_URL", "http://127.0.0.1:8000")
+
+agent = RegistrationAgent(DISCOVERY_URL)
+agent.add(SERVICE_NAME, SERVICE_HOST, SERVICE_PORT)
+
+app.add_middleware(MetricsMiddleware, service=SERVICE_NAME)
 
 class Teacher(BaseModel):
     id: int
     fullName: str
     subject: str
 
-db = [Teacher(id=1, fullName="Mr. Johnson", subject="History")]
+db = open_async_repository("teachers", Teacher, seed=[Teacher(id=1, fullName="Mr. Johnson", subject="History")],
+                     indexes=("subject",))
+teachers_json = ListCache(Teacher, db.sync)
+watch_cache("teacher_list", teachers_json.stats)
 
 @app.get("/teachers", response_model=List[Teacher])
-def get_all(): return db
+async def get_all(
+    subject: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    return await db.run(teachers_json.respond, (subject, after, limit),
+                        lambda: db.sync.page(after=after, limit=limit, subject=subject), fields, if_none_match)
 
 @app.post("/teachers", response_model=Teacher)
-def create(data: Teacher):
-    # FIX: Правильний автоінкремент
-    new_id = max([t.id for t in db], default=0) + 1
-    data.id = new_id
-    db.append(data)
-    return data
+async def create(data: Teacher):
+    # ID видає репозиторій (монотонний лічильник)
+    return await db.add(data)
 
 @app.delete("/teachers/{id}")
-def delete_teacher(id: int):
-    global db
-    initial_len = len(db)
-    db = [t for t in db if t.id != id]
-    if len(db) == initial_len:
+async def delete_teacher(id: int):
+    if not await db.delete(id):
         raise HTTPException(status_code=404, detail="Not found")
     return {"status": "deleted"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=SERVICE_PORT)
\ No newline at end of file
+    uvicorn.run(app, host=SERVICE_HOST, port=SERVICE_PORT)
\ No newline at end of file
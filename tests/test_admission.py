@@ -0,0 +1,66 @@
+import heapq
+import random
+import types
+
+import pytest
+
+import admission
+from admission import LIMIT_INITIAL, AdaptiveLimit
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Штучний час: симуляція не чекає справжніх секунд"""
+    now = types.SimpleNamespace(value=0.0)
+    monkeypatch.setattr(admission, "time", types.SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def simulate(limit: AdaptiveLimit, clock, latency_of, clients: int, responses: int) -> int:
+    """
+    `clients` клієнтів шлють запити один за одним; латентність - latency_of(inflight).
+    Відмова (503) -> клієнт повторює через 10 мс. Повертає кількість відмов.
+    """
+    rng = random.Random(1)
+    events = [(clock.value, i, None) for i in range(clients)]  # (коли, клієнт, латентність запиту або None - старт)
+    heapq.heapify(events)
+    rejected = done = 0
+    while done < responses:
+        clock.value, client, latency = heapq.heappop(events)
+        if latency is not None:
+            limit.release(latency)
+            done += 1
+        if limit.try_acquire():
+            latency = latency_of(rng, limit.inflight)
+            heapq.heappush(events, (clock.value + latency, client, latency))
+        else:
+            rejected += 1
+            heapq.heappush(events, (clock.value + 0.01, client, None))
+    # клієнти зупиняються: дочікуємо відповіді, що ще в польоті
+    for clock.value, _, latency in sorted(events):
+        if latency is not None:
+            limit.release(latency)
+    return rejected
+
+
+def test_limit_holds_under_normal_latency_variation(clock):
+    # здоровий бекенд без черги: 10-120 мс незалежно від навантаження; клієнтів рівно на ліміт,
+    # тож він весь час "майже вичерпаний" і від зрізання рятує лише оцінка латентності
+    limit = AdaptiveLimit()
+    rejected = simulate(limit, clock, lambda rng, inflight: rng.uniform(0.010, 0.120),
+                        clients=LIMIT_INITIAL, responses=5000)
+    assert rejected == 0
+    assert limit.limit >= LIMIT_INITIAL
+
+
+def test_limit_drops_when_backend_queues(clock):
+    # бекенд обслуговує 5 запитів одночасно, решта чекає в черзі -> латентність росте з inflight
+    def latency(rng, inflight):
+        return 0.02 * max(1.0, inflight / 5)
+
+    limit = AdaptiveLimit()
+    assert simulate(limit, clock, latency, clients=4, responses=1000) == 0
+    # навантаження виросло вдесятеро
+    rejected = simulate(limit, clock, latency, clients=50, responses=5000)
+    assert limit.limit < LIMIT_INITIAL * 0.75
+    assert rejected > 0
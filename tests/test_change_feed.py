@@ -0,0 +1,21 @@
+import asyncio
+
+from change_feed import ChangeFeed
+
+
+def test_cancelled_waiter_is_removed():
+    async def scenario():
+        feed = ChangeFeed()
+        waiter = asyncio.create_task(feed.wait(0))
+        await asyncio.sleep(0.01)
+        waiter.cancel()  # споживач відвалився посеред long-poll
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert feed._waiters == {}
+
+        waiter = asyncio.create_task(feed.wait(0))
+        await asyncio.sleep(0.01)
+        feed.publish("created", 1)
+        assert await waiter is True
+        assert feed._waiters == {}
+
+    asyncio.run(scenario())
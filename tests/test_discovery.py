@@ -0,0 +1,18 @@
+import asyncio
+
+from discovery import Registry
+
+
+def test_cancelled_watch_is_removed():
+    async def scenario():
+        registry = Registry()
+        watches = [asyncio.create_task(registry.wait(0, name)) for name in ("class-service", None)]
+        await asyncio.sleep(0.01)
+        for watch in watches:
+            watch.cancel()  # клієнт watch відвалився
+        await asyncio.gather(*watches, return_exceptions=True)
+        assert registry._waiters == {}
+        assert await registry.wait(0, "class-service", timeout=0.01) is False
+        assert registry._waiters == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+import pytest
+
+from discovery_client import ServiceCache, ServiceUnavailable
+
+INSTANCES = [{"name": "class-service", "host": "127.0.0.1", "port": 8001}]
+
+
+def make_cache(handler) -> ServiceCache:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return ServiceCache("http://discovery", client=client, watch=False)
+
+
+def test_waiters_survive_cancelled_leader():
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(10)  # перший запит "висить", поки лідера не скасують
+        return httpx.Response(200, json=INSTANCES)
+
+    async def scenario():
+        cache = make_cache(handler)
+        leader = asyncio.create_task(cache.refresh("class-service"))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.refresh("class-service"))
+        await asyncio.sleep(0.01)
+        leader.cancel()  # як asyncio.wait_for у /views/school
+        assert await asyncio.wait_for(waiter, 1.0) == INSTANCES
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_waiters_get_leader_error():
+    gate = None
+
+    async def handler(request):
+        await gate.wait()
+        return httpx.Response(200, content=b"not json")
+
+    async def scenario():
+        nonlocal gate
+        gate = asyncio.Event()
+        cache = make_cache(handler)
+        calls = [asyncio.create_task(cache.refresh("class-service")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        gate.set()
+        results = await asyncio.wait_for(asyncio.gather(*calls, return_exceptions=True), 1.0)
+        assert all(isinstance(r, ServiceUnavailable) for r in results)
+
+    asyncio.run(scenario())
+
+
+def test_failed_instance_stays_out_after_refresh():
+    instances = INSTANCES + [{"name": "class-service", "host": "127.0.0.1", "port": 8101}]
+
+    async def handler(request):
+        return httpx.Response(200, json=instances)  # Discovery ще не виселив мертвий інстанс
+
+    async def scenario():
+        cache = make_cache(handler)
+        assert await cache.get_instances("class-service") == instances
+        cache.invalidate("class-service", "127.0.0.1", 8101)
+        assert await cache.get_instances("class-service") == INSTANCES
+        cache.invalidate("class-service", "127.0.0.1", 8001)  # виключені всі -> краще спробувати, ніж 503
+        assert await cache.get_instances("class-service") == instances
+
+    asyncio.run(scenario())
@@ -0,0 +1,32 @@
+import asyncio
+
+import httpx
+
+import registration
+from registration import RegistrationAgent
+
+
+def test_heartbeat_survives_malformed_responses(monkeypatch):
+    monkeypatch.setattr(registration, "MAX_BACKOFF", 0.01)
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        if len(calls) <= 2:
+            return httpx.Response(200, content=b"<html>proxy error</html>")  # не JSON
+        if request.url.path == "/register":
+            return httpx.Response(200, json={"status": "registered"})  # без lease_id
+        return httpx.Response(200, json={"unknown": []})
+
+    async def scenario():
+        agent = RegistrationAgent("http://discovery", interval=0.01)
+        agent.add("class-service", "127.0.0.1", 8001)
+        await agent.start()
+        real, agent._client = agent._client, httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await real.aclose()
+        await asyncio.sleep(0.3)
+        assert not agent._task.done()
+        assert len(calls) > 3
+        await agent.stop()
+
+    asyncio.run(scenario())
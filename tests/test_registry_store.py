@@ -0,0 +1,32 @@
+import os
+
+from registry_store import RegistryLog
+
+
+def upsert(lease_id: str) -> dict:
+    return {"op": "upsert", "lease_id": lease_id, "instance": {"name": "class-service", "port": 8001}}
+
+
+def leases(store: RegistryLog):
+    return sorted(entry["lease_id"] for entry in store.load())
+
+
+def test_compaction_survives_crash_between_steps(tmp_path):
+    store = RegistryLog(str(tmp_path))
+    store.rotate()
+    store(upsert("a"), False)
+    store(upsert("b"), False)
+    state = store.load()
+
+    store.rotate()                       # крок під локом; знімок так і не записали (падіння)
+    store({"op": "release", "lease_id": "a"}, False)
+    assert leases(store) == ["b"]
+
+    store.rotate()                       # наступна спроба: registry.log.1 ще лежить
+    store(upsert("c"), False)
+    assert leases(store) == ["b", "c"]
+
+    store.write_snapshot([e for e in state if e["lease_id"] == "b"])
+    assert not os.path.exists(store.rotated_path)
+    assert leases(store) == ["b", "c"]
+    store.close()
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+
+from repository import Repository
+
+
+class Item(BaseModel):
+    id: int
+    kind: str
+
+
+def pages(repo: Repository, limit: int):
+    after, ids = None, []
+    while True:
+        page, after = repo.page(after=after, limit=limit)
+        ids += [item.id for item in page]
+        if after is None:
+            return ids
+
+
+def test_page_follows_writes_without_snapshot():
+    repo = Repository([Item(id=i, kind="a") for i in (5, 2, 9)], indexes=("kind",))
+    assert pages(repo, 2) == [2, 5, 9]
+    repo.add(Item(id=0, kind="b"))                      # id 10 - у кінець
+    repo.delete(5)
+    assert repo.update(Item(id=2, kind="b"))            # оновлення не міняє позицію
+    assert repo._snapshot is None                       # сторінки не збирали знімок
+    assert pages(repo, 2) == [2, 9, 10]
+    assert [item.id for item in repo.all()] == [2, 9, 10]
+    assert repo.page(after=2, limit=1) == ([repo.get(9)], 9)
+    assert repo.page(limit=5, kind="b") == ([repo.get(2), repo.get(10)], None)
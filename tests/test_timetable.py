@@ -0,0 +1,74 @@
+import pytest
+
+import storage
+from schedule_service import Schedule
+from repository import Repository
+from storage import LogRepository, SQLiteRepository
+from timetable import Timetable
+
+
+def schedule(class_id: int, day: str, teacher_id: int) -> Schedule:
+    return Schedule(id=0, classId=class_id, day=day, className=f"{class_id}-A",
+                    lessons=[{"slot": 1, "subject": "Math", "teacherId": teacher_id}])
+
+
+def state(timetable: Timetable):
+    # запити синхронізують індекси зі сховищем, тож _items - після них
+    queries = (timetable.double_booked(), timetable.lessons(subject="math"), timetable.free_slots(teacherId=7))
+    return queries, sorted(timetable._items)
+
+
+@pytest.fixture(params=[SQLiteRepository, LogRepository])
+def pair(request, tmp_path):
+    """Два "інстанси" сервісу над одним сховищем, кожен зі своїм Timetable"""
+    path = str(tmp_path / "schedules")
+    repos = [request.param(path, Schedule, indexes=("classId", "day")) for _ in range(2)]
+    return repos, [Timetable(repo) for repo in repos]
+
+
+def test_foreign_writes_applied_incrementally(pair, monkeypatch):
+    (a, b), (_, timetable) = pair
+    a.add_many([schedule(c, "Monday", c) for c in range(1, 6)])
+    timetable.lessons(classId=1)  # перша побудова індексів
+
+    def no_rebuild():
+        raise AssertionError("full rebuild")
+    monkeypatch.setattr(timetable, "_rebuild", no_rebuild)
+
+    a.add(schedule(10, "Monday", 7))          # вчитель 7 тепер зайнятий двічі
+    a.update(schedule(3, "Tuesday", 7).model_copy(update={"id": 3}))
+    a.delete(1)
+    assert state(timetable) == state(Timetable(b))
+    assert timetable.double_booked("teacher") == []
+
+    a.add(schedule(11, "Monday", 7))
+    assert [c["scheduleIds"] for c in timetable.double_booked("teacher")] == [[6, 7]]
+
+
+def test_rebuild_when_history_is_gone(pair, monkeypatch):
+    (a, b), (_, timetable) = pair
+    a.add(schedule(1, "Monday", 1))
+    timetable.lessons(classId=1)
+    monkeypatch.setattr(storage, "CHANGES_KEEP", 2)
+    for c in range(2, 7):
+        a.add(schedule(c, "Monday", c))
+    assert b.changes_since(timetable._version) is None
+    assert state(timetable) == state(Timetable(b))
+
+
+def test_lessons_pages_match_full_result():
+    repo = Repository(indexes=("classId", "day"))
+    timetable = Timetable(repo)
+    repo.add_many([schedule(c, day, c % 3) for c in range(1, 8) for day in ("Monday", "Tuesday")])
+    repo.update(schedule(2, "Friday", 1).model_copy(update={"id": 3}))  # оновлений ключ не в кінці кошика
+    for filters in ({"subject": "math"}, {"teacherId": 1}, {"classId": 2}, {"subject": "Math", "day": "Monday"}):
+        full, cursor = timetable.lessons(**filters)
+        assert cursor is None
+        assert [(e["scheduleId"], e["slot"]) for e in full] == sorted((e["scheduleId"], e["slot"]) for e in full)
+        pages, after = [], None
+        while True:
+            page, after = timetable.lessons(**filters, after=after, limit=2)
+            pages += page
+            if after is None:
+                break
+        assert pages == full
@@ -0,0 +1,279 @@
+import bisect
+import heapq
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+MAX_SLOTS = 8   # уроків на день; слот - номер уроку 1..MAX_SLOTS
+SCHOOL_DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")
+
+Slot = Tuple[str, int]  # (day, slot)
+LessonKey = Tuple[int, int]  # (id розкладу, slot) - порядок уроків у відповіді і курсор сторінки
+
+
+class Bucket(dict):
+    """
+    Кошик індексу - на рівні уроків: (id розкладу, slot) -> (розклад, урок).
+    Поруч ключі за зростанням (`order`), щоб сторінка запиту не сортувала весь кошик:
+    ID розкладів монотонні, тож новий ключ зазвичай просто дописується в кінець.
+    """
+
+    __slots__ = ("order",)
+
+    def __init__(self):
+        super().__init__()
+        self.order: List[LessonKey] = []
+
+    def put(self, key: LessonKey, ref: tuple):
+        if key not in self:
+            if not self.order or key > self.order[-1]:
+                self.order.append(key)
+            else:
+                bisect.insort(self.order, key)
+        self[key] = ref
+
+    def discard(self, key: LessonKey):
+        if self.pop(key, None) is not None:
+            del self.order[bisect.bisect_left(self.order, key)]
+
+    def items_after(self, after: Optional[LessonKey]) -> Iterator[Tuple[LessonKey, tuple]]:
+        order = self.order
+        start = bisect.bisect_right(order, after) if after is not None else 0
+        return ((order[i], self[order[i]]) for i in range(start, len(order)))
+
+
+@lru_cache(maxsize=4096)  # предметів небагато, а порівнюються вони на кожному уроці кандидатів
+def _subject_key(subject: str) -> str:
+    return subject.strip().casefold()
+
+
+class Timetable:
+    """
+    Рушій запитів над розкладами (поверх репозиторію, у пам'яті процесу).
+    Інвертовані індекси (кошики - уроки, а не розклади цілком):
+    - (day, slot) -> уроки в цьому слоті
+    - предмет -> день -> уроки цього предмета
+    - teacherId -> (day, slot) -> уроки вчителя
+    - classId -> (day, slot) -> уроки класу
+    Перевірка конфліктів нового розкладу - O(k) по його k уроках, а не O(N) по всіх.
+    Записи (і перевірка перед ними) - у writing() під `write_lock`: так конфлікт не
+    проскочить між потоками, а зі storage.open_lock - і між інстансами зі спільним
+    сховищем. Репозиторій змінив хтось інший (інший процес) -> при наступному
+    зверненні до індексів застосовуються лише змінені з тих пір записи (repo.changes_since);
+    повна перебудова - на старті або коли сховище вже не пам'ятає потрібних змін.
+    """
+
+    def __init__(self, repo, write_lock=None):
+        self.repo = repo
+        self._lock = threading.RLock()  # структури індексів
+        self._write_lock = write_lock or threading.RLock()
+        self._version = None
+        self._items: Dict[int, object] = {}
+        self._by_slot: Dict[Slot, Bucket] = {}
+        self._by_subject: Dict[str, Dict[str, Bucket]] = {}
+        self._by_teacher: Dict[int, Dict[Slot, Bucket]] = {}
+        self._by_class: Dict[int, Dict[Slot, Bucket]] = {}
+        # слоти, зайняті більш ніж одним розкладом: ("teacher" | "class", id, day, slot)
+        self._double_booked: set = set()
+
+    # --- Синхронізація з репозиторієм ---
+    def _sync(self):
+        version = self.repo.version
+        if version == self._version:
+            return
+        changes_since = getattr(self.repo, "changes_since", None)
+        delta = changes_since(self._version) if changes_since and self._version is not None else None
+        if delta is None:
+            self._rebuild()
+            self._version = version
+            return
+        self._version, changed, deleted = delta
+        for id in deleted:
+            self._unindex(id)
+        self.replace(changed)
+
+    def _rebuild(self):
+        for index in (self._items, self._by_slot, self._by_subject, self._by_teacher, self._by_class):
+            index.clear()
+        self._double_booked.clear()
+        for item in self.repo.all():
+            self._index(item)
+
+    @contextmanager
+    def writing(self):
+        """Перевірка + запис у репозиторій + оновлення індексів як одна операція"""
+        with self._write_lock, self._lock:
+            self._sync()
+            yield self
+            self._version = self.repo.version
+
+    # --- Індекси ---
+    def _index(self, item):
+        self._items[item.id] = item
+        for lesson in item.lessons:
+            slot, key, ref = (item.day, lesson.slot), (item.id, lesson.slot), (item, lesson)
+            self._by_slot.setdefault(slot, Bucket()).put(key, ref)
+            self._by_subject.setdefault(_subject_key(lesson.subject), {}).setdefault(item.day, Bucket()).put(key, ref)
+            self._book("class", self._by_class, item.classId, slot, key, ref)
+            if lesson.teacherId is not None:
+                self._book("teacher", self._by_teacher, lesson.teacherId, slot, key, ref)
+
+    def _book(self, kind: str, index: dict, owner: int, slot: Slot, key: LessonKey, ref: tuple):
+        bucket = index.setdefault(owner, {}).setdefault(slot, Bucket())
+        bucket.put(key, ref)
+        if len(bucket) > 1:
+            self._double_booked.add((kind, owner) + slot)
+
+    def _unindex(self, id: int):
+        item = self._items.pop(id, None)
+        if item is None:
+            return
+        for lesson in item.lessons:
+            slot, key = (item.day, lesson.slot), (id, lesson.slot)
+            _discard(self._by_slot, slot, key)
+            days = self._by_subject.get(_subject_key(lesson.subject))
+            if days is not None:
+                _discard(days, item.day, key)
+                if not days:
+                    del self._by_subject[_subject_key(lesson.subject)]
+            self._unbook("class", self._by_class, item.classId, slot, key)
+            if lesson.teacherId is not None:
+                self._unbook("teacher", self._by_teacher, lesson.teacherId, slot, key)
+
+    def _unbook(self, kind: str, index: dict, owner: int, slot: Slot, key: LessonKey):
+        slots = index.get(owner)
+        if slots is None:
+            return
+        _discard(slots, slot, key)
+        if len(slots.get(slot, ())) < 2:
+            self._double_booked.discard((kind, owner) + slot)
+        if not slots:
+            del index[owner]
+
+    # --- Запис (викликати всередині writing()) ---
+    def add(self, items: Iterable):
+        for item in items:
+            self._index(item)
+
+    def replace(self, items: Iterable):
+        for item in items:
+            self._unindex(item.id)
+            self._index(item)
+
+    def remove(self, id: int):
+        self._unindex(id)
+
+    def conflicts(self, candidates: Sequence) -> List[List[dict]]:
+        """
+        Конфлікти для кожного кандидата (ще без id): той самий вчитель чи клас уже
+        зайнятий у цьому слоті - збереженим розкладом ("scheduleId") або попереднім
+        кандидатом з цього ж пакета ("index").
+        """
+        pending: Dict[tuple, int] = {}
+        result = []
+        for index, item in enumerate(candidates):
+            found = []
+            keys = []
+            for lesson in item.lessons:
+                slot = (item.day, lesson.slot)
+                keys.append(("class", self._by_class, item.classId, slot))
+                if lesson.teacherId is not None:
+                    keys.append(("teacher", self._by_teacher, lesson.teacherId, slot))
+            for kind, by_owner, owner, slot in keys:
+                where = {"type": kind, f"{kind}Id": owner, "day": slot[0], "slot": slot[1]}
+                for other, _ in by_owner.get(owner, {}).get(slot, {}):
+                    found.append({**where, "scheduleId": other})
+                if (kind, owner) + slot in pending:
+                    found.append({**where, "index": pending[(kind, owner) + slot]})
+            if not found:
+                for kind, _, owner, slot in keys:
+                    pending[(kind, owner) + slot] = index
+            result.append(found)
+        return result
+
+    # --- Запити ---
+    def lessons(self, day: Optional[str] = None, slot: Optional[int] = None, subject: Optional[str] = None,
+                teacherId: Optional[int] = None, classId: Optional[int] = None,
+                after: Optional[LessonKey] = None, limit: Optional[int] = None,
+                ) -> Tuple[List[dict], Optional[LessonKey]]:
+        """
+        Уроки за будь-якою комбінацією фільтрів (хоча б одним) за зростанням (id розкладу, slot)
+        + курсор наступної сторінки (або None), як Repository.page.
+        Кандидати беруться з найменшого відповідного індексу: його кошики (днів чи слотів)
+        зливаються ліниво по вже відсортованих ключах, починаючи з `after`, і перебір
+        зупиняється, щойно сторінка заповнена; решта умов перевіряється по уроках кандидатів.
+        """
+        with self._lock:
+            self._sync()
+            sources: List[List[Bucket]] = []
+            if day is not None and slot is not None:
+                sources.append([self._by_slot.get((day, slot), Bucket())])
+            if subject is not None:
+                days = self._by_subject.get(_subject_key(subject), {})
+                sources.append([days.get(day, Bucket())] if day is not None else list(days.values()))
+            for owner, index in ((teacherId, self._by_teacher), (classId, self._by_class)):
+                if owner is not None:
+                    slots = index.get(owner, {})
+                    if day is not None and slot is not None:
+                        sources.append([slots.get((day, slot), Bucket())])
+                    else:
+                        sources.append(list(slots.values()))
+            if not sources:
+                raise ValueError("At least one of day+slot, subject, teacherId, classId is required")
+            buckets = min(sources, key=lambda source: sum(map(len, source)))
+            subject_key = _subject_key(subject) if subject is not None else None
+            found = []
+            if len(buckets) == 1:
+                candidates = buckets[0].items_after(after)
+            else:
+                candidates = heapq.merge(*(bucket.items_after(after) for bucket in buckets), key=itemgetter(0))
+            for _, (item, lesson) in candidates:
+                if ((day is None or item.day == day)
+                        and (slot is None or lesson.slot == slot)
+                        and (subject_key is None or _subject_key(lesson.subject) == subject_key)
+                        and (teacherId is None or lesson.teacherId == teacherId)
+                        and (classId is None or item.classId == classId)):
+                    if limit is not None and len(found) == limit:
+                        return found, (found[-1]["scheduleId"], found[-1]["slot"])
+                    found.append(_entry(item, lesson))
+            return found, None
+
+    def free_slots(self, classId: Optional[int] = None, teacherId: Optional[int] = None,
+                   days: Sequence[str] = SCHOOL_DAYS) -> Dict[str, List[int]]:
+        """Вільні слоти класу чи вчителя по днях: O(днів * MAX_SLOTS)"""
+        with self._lock:
+            self._sync()
+            busy = set()
+            for owner, index in ((classId, self._by_class), (teacherId, self._by_teacher)):
+                if owner is not None:
+                    busy.update(index.get(owner, {}))
+            return {day: [s for s in range(1, MAX_SLOTS + 1) if (day, s) not in busy] for day in days}
+
+    def double_booked(self, kind: Optional[str] = None) -> List[dict]:
+        """Слоти, де вчитель (чи клас) стоїть більш ніж в одному розкладі"""
+        with self._lock:
+            self._sync()
+            found = []
+            for key in sorted(self._double_booked, key=repr):
+                if kind is not None and key[0] != kind:
+                    continue
+                owner_kind, owner, day, slot = key
+                index = self._by_teacher if owner_kind == "teacher" else self._by_class
+                found.append({"type": owner_kind, f"{owner_kind}Id": owner, "day": day, "slot": slot,
+                              "scheduleIds": sorted(id for id, _ in index[owner][(day, slot)])})
+            return found
+
+
+def _discard(index: Dict[Hashable, Bucket], at: Hashable, key: LessonKey):
+    bucket = index.get(at)
+    if bucket is not None:
+        bucket.discard(key)
+        if not bucket:
+            del index[at]
+
+
+def _entry(item, lesson) -> dict:
+    return {"scheduleId": item.id, "classId": item.classId, "className": item.className, "day": item.day,
+            "slot": lesson.slot, "subject": lesson.subject, "teacherId": lesson.teacherId}
@@ -2,10 +2,16 @@ import streamlit as st
 import requests
 import pandas as pd
 import time
+import uuid
 
 # --- CONFIG ---
 st.set_page_config(page_title="School Admin Panel", layout="wide", page_icon="🎓")
 GATEWAY_URL = "http://127.0.0.1:8080"
+# Усі користувачі дашборда приходять у gateway з IP цього сервера: ID сесії дає кожному своє
+# відро rate limit (gateway вірить йому, якщо ця адреса є в GATEWAY_TRUSTED_PROXIES)
+SESSION_HEADERS = {"X-Client-Id": st.session_state.setdefault("client_id", uuid.uuid4().hex)}
+SCHEDULE_PAGE_SIZE = 20
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
 
 # --- CSS STYLES ---
 st.markdown("""
@@ -24,21 +30,38 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- API HELPERS ---
-def api_get(endpoint):
+def school_view(params):
+    """
+    Класи, вчителі і сторінка розкладу одним запитом: gateway збирає їх паралельно
+    (GET /views/school). Частина недоступна -> її поле None, причина в `errors`.
+    Streamlit перезапускає скрипт на кожну дію, а дані змінюються рідко, тож копію
+    тримаємо в session_state і перепитуємо з If-None-Match: 304 -> беремо її.
+    """
+    store = st.session_state.setdefault("etag_cache", {})
+    key = tuple(sorted(params.items()))
+    cached = store.get(key)
+    headers = {**SESSION_HEADERS, "If-None-Match": cached[0]} if cached else SESSION_HEADERS
     try:
-        res = requests.get(f"{GATEWAY_URL}{endpoint}")
-        return res.json() if res.status_code == 200 else []
-    except: return []
+        res = requests.get(f"{GATEWAY_URL}/views/school", params=params, headers=headers)
+        if res.status_code == 304 and cached:
+            return cached[1]
+        if res.status_code not in (200, 503):
+            return {}
+        data = res.json()
+        if "ETag" in res.headers:
+            store[key] = (res.headers["ETag"], data)
+        return data
+    except: return {}
 
 def api_post(endpoint, data):
     try:
-        res = requests.post(f"{GATEWAY_URL}{endpoint}", json=data)
+        res = requests.post(f"{GATEWAY_URL}{endpoint}", json=data, headers=SESSION_HEADERS)
         return res.status_code in [200, 201]
     except: return False
 
 def api_delete(endpoint, id):
     try:
-        res = requests.delete(f"{GATEWAY_URL}{endpoint}/{id}")
+        res = requests.delete(f"{GATEWAY_URL}{endpoint}/{id}", headers=SESSION_HEADERS)
         return res.status_code == 200
     except: return False
 
@@ -46,6 +69,30 @@ def api_delete(endpoint, id):
 st.title("🎓 School Microservices Dashboard")
 st.markdown("Система управління розкладом через **API Gateway** та **Discovery Service**.")
 
+# Фільтри розкладу лежать у session_state з минулого запуску скрипта,
+# тож усі дані для екрана беремо одним запитом ще до малювання вкладок.
+# Фільтрує і пагінує сервер; тут лише стек курсорів, щоб ходити назад
+class_filter = st.session_state.get("sch_class_filter", "Всі")
+day_filter = st.session_state.get("sch_day_filter", "Всі")
+if st.session_state.get("sch_filter") != (class_filter, day_filter):
+    st.session_state["sch_filter"] = (class_filter, day_filter)
+    st.session_state["sch_cursors"] = []
+cursors = st.session_state["sch_cursors"]
+
+params = {"limit": SCHEDULE_PAGE_SIZE}
+if class_filter != "Всі": params["classId"] = class_filter
+if day_filter != "Всі": params["day"] = day_filter
+if cursors: params["after"] = cursors[-1]
+
+view = school_view(params)
+if view.get("errors"):
+    st.warning(f"Частина даних недоступна: {', '.join(f'{k} ({v})' for k, v in view['errors'].items())}")
+elif not view:
+    st.error("Gateway недоступний.")
+classes = view.get("classes") or []
+teachers = view.get("teachers") or []
+schedules, next_cursor = view.get("schedules") or [], view.get("next_cursor")
+
 # Tabs for better UX
 tab1, tab2, tab3 = st.tabs(["📚 Класи (Classes)", "👨‍🏫 Вчителі (Teachers)", "📅 Розклад (Schedule)"])
 
@@ -55,7 +102,6 @@ with tab1:
     
     with col1:
         st.subheader("Список Класів")
-        classes = api_get("/classes")
         if classes:
             df = pd.DataFrame(classes)
             st.dataframe(df, use_container_width=True, hide_index=True)
@@ -98,7 +144,6 @@ with tab2:
     
     with col1:
         st.subheader("Список Вчителів")
-        teachers = api_get("/teachers")
         if teachers:
             st.dataframe(pd.DataFrame(teachers), use_container_width=True, hide_index=True)
             
@@ -132,9 +177,8 @@ with tab2:
 with tab3:
     st.subheader("📅 Розклад Занять")
     
-    # Aggregation: Get classes for dropdown
-    classes_list = api_get("/classes")
-    class_map = {f"{c['name']} (ID: {c['id']})": c['id'] for c in classes_list} if classes_list else {}
+    class_map = {f"{c['name']} (ID: {c['id']})": c['id'] for c in classes}
+    class_labels = {id: label for label, id in class_map.items()}
 
     with st.expander("➕ Створити новий розклад", expanded=True):
         if not class_map:
@@ -145,7 +189,7 @@ with tab3:
                 with c1:
                     sel_label = st.selectbox("Клас", list(class_map.keys()))
                     sel_id = class_map[sel_label]
-                    day = st.selectbox("День", ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"])
+                    day = st.selectbox("День", DAYS)
                 with c2:
                     lessons_txt = st.text_area("Уроки (через кому)", "Math, History")
                 
@@ -166,8 +210,15 @@ with tab3:
 
     st.divider()
     st.subheader("Поточний Розклад")
-    
-    schedules = api_get("/schedules")
+
+    f1, f2 = st.columns(2)
+    with f1:
+        # у session_state - сам ID класу: його на наступному запуску бере school_view
+        st.selectbox("Фільтр: клас", ["Всі"] + list(class_labels), key="sch_class_filter",
+                     format_func=lambda v: class_labels.get(v, v))
+    with f2:
+        st.selectbox("Фільтр: день", ["Всі"] + DAYS, key="sch_day_filter")
+
     if schedules:
         for s in schedules:
             c1, c2, c3 = st.columns([1, 4, 1])
@@ -175,7 +226,8 @@ with tab3:
                 st.info(f"ID: {s['id']}")
             with c2:
                 st.markdown(f"**{s.get('className', 'Unknown')}** | {s['day']}")
-                st.caption(f"Уроки: {', '.join(s['lessons'])}")
+                lesson_names = ", ".join(f"{l['slot']}. {l['subject']}" for l in s['lessons'])
+                st.caption(f"Уроки: {lesson_names}")
             with c3:
                 if st.button("🗑️", key=f"del_sch_{s['id']}"):
                     if api_delete("/schedules", s['id']):
@@ -183,5 +235,15 @@ with tab3:
                         time.sleep(0.5)
                         st.rerun()
             st.divider()
+
+        nav1, nav2 = st.columns(2)
+        with nav1:
+            if cursors and st.button("⬅️ Назад", key="sch_prev"):
+                cursors.pop()
+                st.rerun()
+        with nav2:
+            if next_cursor and st.button("Далі ➡️", key="sch_next"):
+                cursors.append(next_cursor)
+                st.rerun()
     else:
         st.info("Розклад порожній.")
\ No newline at end of file